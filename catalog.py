@@ -0,0 +1,245 @@
+import array
+import asyncio
+import logging
+import random
+
+import asyncpg
+from config import CATALOG_POLL_SEC, DATABASE_URL, LISTEN_CHECK_SEC
+
+logger = logging.getLogger(__name__)
+
+# load_words.py が words を更新したときに NOTIFY するチャンネル名
+WORDS_CHANNEL = "words_changed"
+# load_words.py が実際に行を変えたときだけ上げる版（catalog_versions.name）。NOTIFY を取りこぼしてもポーリングで拾う
+WORDS_VERSION_NAME = "words"
+VERSION_SQL = "SELECT version FROM catalog_versions WHERE name=$1"
+
+LOAD_SQL = """
+SELECT word_id, word, jp, pos, example_en, example_ja, synonyms, derived
+FROM words
+ORDER BY word_id
+"""
+
+
+class WordCatalog:
+    """
+    words テーブルのプロセス内キャッシュ（列指向）。
+    word_id は array('i')、その他の列は list で保持し、
+    出題時のランダム抽出を DB に触れず O(k) で行う。
+    """
+
+    __slots__ = ("word_ids", "words", "jp", "pos", "example_en", "example_ja",
+                 "synonyms", "derived", "version", "_pos_by_id", "_lock")
+
+    COLUMNS = ("word", "jp", "pos", "example_en", "example_ja", "synonyms", "derived")
+
+    def __init__(self):
+        self.word_ids = array.array("i")
+        self.words = []
+        self.jp = []
+        self.pos = []
+        self.example_en = []
+        self.example_ja = []
+        self.synonyms = []
+        self.derived = []
+        self.version = None   # 読み込んだ時点の catalog_versions の版（未読み込みは None）
+        self._pos_by_id = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    @property
+    def loaded(self) -> bool:
+        """一度でも読み込んだか（0件のカタログも読み込み済みとして扱う）"""
+        return self.version is not None
+
+    def replace(self, rows):
+        """行（Record / dict）の列から全列を組み直して差し替える"""
+        word_ids = array.array("i")
+        cols = {c: [] for c in self.COLUMNS}
+        for r in rows:
+            word_ids.append(r["word_id"])
+            for c in self.COLUMNS:
+                cols[c].append(r[c])
+
+        # 参照の差し替えだけで済ませ、読み手が中途半端な状態を見ないようにする
+        self.words = cols["word"]
+        self.jp = cols["jp"]
+        self.pos = cols["pos"]
+        self.example_en = cols["example_en"]
+        self.example_ja = cols["example_ja"]
+        self.synonyms = cols["synonyms"]
+        self.derived = cols["derived"]
+        self._pos_by_id = {wid: i for i, wid in enumerate(word_ids)}
+        self.word_ids = word_ids
+
+    async def load(self, pool):
+        """DBから全件読み込む（起動時 / 更新通知時）"""
+        async with self._lock:
+            async with pool.acquire() as con:
+                # 版は行より先に読む（読み込み中に上がった版は次のポーリングで拾い直す）
+                version = await con.fetchval(VERSION_SQL, WORDS_VERSION_NAME) or 0
+                rows = await con.fetch(LOAD_SQL)
+            self.replace(rows)
+            self.version = version
+        logger.info(f"✅ 単語カタログ読み込み完了: {len(self)}件 (version {version})")
+
+    async def reload_if_changed(self, pool) -> bool:
+        """catalog_versions の版が読み込み済みの版と違えば読み直す（1行の SELECT だけで判定）"""
+        async with pool.acquire() as con:
+            version = await con.fetchval(VERSION_SQL, WORDS_VERSION_NAME) or 0
+        if version == self.version:
+            return False
+        await self.load(pool)
+        return True
+
+    def _item(self, i: int) -> dict:
+        return {
+            "word_id": self.word_ids[i],
+            "word": self.words[i],
+            "jp": self.jp[i],
+            "pos": self.pos[i],
+            "example_en": self.example_en[i],
+            "example_ja": self.example_ja[i],
+            "synonyms": self.synonyms[i],
+            "derived": self.derived[i],
+        }
+
+    def get(self, word_id: int) -> dict | None:
+        i = self._pos_by_id.get(word_id)
+        return None if i is None else self._item(i)
+
+    def sample(self, k: int) -> list[dict]:
+        """重複なしで k 件をランダム抽出（全件数より多ければ全件）"""
+        n = len(self.word_ids)
+        idx = random.sample(range(n), min(k, n))
+        return [self._item(i) for i in idx]
+
+
+_catalog = None
+_listen_con = None
+_listen_task = None
+_listeners = {}   # channel -> (callback, reload)。専用接続を張り直したら全部 LISTEN し直す
+_poll_task = None
+
+
+async def get_catalog(pool=None) -> WordCatalog:
+    """
+    プロセス共通のカタログを返す。pool を渡すと未読み込み時にロードする。
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = WordCatalog()
+    if pool is not None and not _catalog.loaded:
+        await _catalog.load(pool)
+    return _catalog
+
+
+async def _connect_listener():
+    con = await asyncpg.connect(DATABASE_URL)
+    for channel, (callback, _) in _listeners.items():
+        await con.add_listener(channel, callback)
+    return con
+
+
+async def _reload(channel, reload):
+    try:
+        await reload()
+    except Exception as e:
+        logger.warning(f"⚠️ {channel} の再読み込みに失敗: {e}")
+
+
+async def _watch_listener(interval: float):
+    """専用接続を interval 秒ごとに往復させて確かめ、切れていれば張り直す（失敗したら間隔を広げて再試行）"""
+    global _listen_con
+    delay = 1.0
+    while True:
+        await asyncio.sleep(interval if _listen_con is not None else delay)
+        con = _listen_con
+        if con is not None:
+            try:
+                # is_closed() だけでは黙って切れた接続に気づけないので、実際に往復させる
+                await con.fetchval("SELECT 1", timeout=10)
+                continue
+            except Exception as e:
+                logger.warning(f"⚠️ 更新通知の専用接続が切れています。張り直します: {e}")
+                _listen_con = None
+                con.terminate()
+        try:
+            _listen_con = await _connect_listener()
+        except Exception as e:
+            delay = min(delay * 2, interval)
+            logger.warning(f"⚠️ 更新通知の再接続に失敗（{delay:.0f}秒後に再試行）: {e}")
+            continue
+        delay = 1.0
+        logger.info(f"✅ 更新通知の専用接続を張り直しました ({', '.join(_listeners)})")
+        # 切れている間の NOTIFY は届いていないので、購読しているものは読み直す
+        for channel, (_, reload) in _listeners.items():
+            asyncio.get_running_loop().create_task(_reload(channel, reload))
+
+
+async def add_listener(channel: str, callback, reload):
+    """
+    専用接続で channel を LISTEN する。接続を張り直したときも LISTEN し直し、
+    切れている間の通知の代わりに reload()（コルーチン関数）を呼ぶ。
+    """
+    _listeners[channel] = (callback, reload)
+    if _listen_con is not None:
+        await _listen_con.add_listener(channel, callback)
+
+
+async def listen_for_changes(pool, interval: float = LISTEN_CHECK_SEC):
+    """
+    words_changed の NOTIFY を購読し、受信したらカタログを再読み込みする。
+    LISTEN は接続に紐づくので、プールの枠を使わない専用接続を1本保持する。
+    接続は interval 秒ごとに確かめ、切れていれば張り直す（最初の接続に失敗しても張り直しは続ける）。
+    """
+    global _listen_con, _listen_task
+    catalog = await get_catalog()
+
+    def _on_notify(con, pid, channel, payload):
+        logger.info(f"🔄 words 更新通知を受信 ({payload or '-'})")
+        asyncio.get_running_loop().create_task(catalog.load(pool))
+
+    await add_listener(WORDS_CHANNEL, _on_notify, lambda: catalog.reload_if_changed(pool))
+    if _listen_task is None and interval > 0:
+        _listen_task = asyncio.get_running_loop().create_task(_watch_listener(interval))
+    if _listen_con is None:
+        _listen_con = await _connect_listener()
+    return _listen_con
+
+
+async def stop_listening():
+    global _listen_con, _listen_task
+    if _listen_task is not None:
+        _listen_task.cancel()
+        _listen_task = None
+    if _listen_con is not None:
+        await _listen_con.close()
+        _listen_con = None
+
+
+async def _poll_version(pool, interval: float):
+    catalog = await get_catalog()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await catalog.reload_if_changed(pool):
+                logger.info(f"🔄 words の版が変わったので再読み込みしました (version {catalog.version})")
+        except Exception as e:
+            logger.warning(f"⚠️ 単語カタログの版の確認に失敗: {e}")
+
+
+def start_version_poll(pool, interval: float = CATALOG_POLL_SEC):
+    """words の版を interval 秒ごとに確認する（0 以下なら何もしない）"""
+    global _poll_task
+    if _poll_task is None and interval > 0:
+        _poll_task = asyncio.get_running_loop().create_task(_poll_version(pool, interval))
+
+
+def stop_version_poll():
+    global _poll_task
+    if _poll_task is not None:
+        _poll_task.cancel()
+        _poll_task = None
@@ -5,6 +5,8 @@ import re
 
 from utils import info_embed
 from cogs.menu import MenuView  # callback付きメインメニュー
+from outbound import get_outbound
+from dify import get_scheduler, get_answer_cache, get_latency
 
 def is_manager():
     """管理用ガード（管理者orManage Channels権限）"""
@@ -175,6 +177,106 @@ class WinglishAdmin(commands.Cog):
         msg = f"words 件数: **{n}**\n" + ("\n".join(lines) if lines else "(サンプルなし)")
         await interaction.followup.send(msg, ephemeral=True)
 
+    @group.command(name="diag_router", description="ボタン/モーダルのハンドラ別の処理回数・所要時間と送信キューの状況を表示")
+    @is_manager()
+    async def diag_router(self, interaction: discord.Interaction):
+        stats = self.bot.router.stats()
+        lines = [
+            f"`{k}`: {v['count']}回 / 平均 {v['avg_ms']} ms / 最大 {v['max_ms']} ms / エラー {v['errors']}"
+            for k, v in stats.items()
+        ]
+        ob = get_outbound().stats
+        lines.append(
+            f"送信キュー: 編集 {ob['edits']}回（上書きで省略 {ob['edits_superseded']}） / "
+            f"送信 {ob['sends']}回（まとめ {ob['sends_batched']}） / 429 {ob['rate_limited']}回"
+        )
+        from cogs.vocab import REST_STATS
+        n = REST_STATS["interactions"]
+        lines.append(
+            f"英単語: {n}回の操作で REST {REST_STATS['rest_calls']}回"
+            f"（1操作あたり {REST_STATS['rest_calls'] / n:.2f}）" if n else "英単語: 操作なし"
+        )
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+    @group.command(name="diag_reading_pool", description="長文読解の作り置きプールの残数・ヒット率・補充時間を表示")
+    @is_manager()
+    async def diag_reading_pool(self, interaction: discord.Interaction):
+        rcog = self.bot.get_cog("ReadingCog")
+        if rcog is None:
+            await interaction.response.send_message("ReadingCog が読み込まれていません。", ephemeral=True)
+            return
+        st = rcog.pool.stats()
+        ready = " / ".join(f"`{k}`: {n}件" for k, n in st["ready"].items()) or "(なし)"
+        msg = (
+            f"残数: {ready}\n"
+            f"ヒット {st['hits']} / ミス {st['misses']}（ヒット率 {st['hit_rate']:.0%}）\n"
+            f"補充 {st['refills']}件（失敗 {st['refill_failures']}） / 平均 {st['refill_avg_ms']} ms / 最大 {st['refill_max_ms']} ms\n"
+            f"補充中: {', '.join(st['refilling']) or '-'}"
+        )
+        await interaction.response.send_message(msg, ephemeral=True)
+
+    @group.command(name="diag_svocm", description="SVOCM インデックスの件数（pattern 別）と出題の内訳を表示")
+    @is_manager()
+    async def diag_svocm(self, interaction: discord.Interaction):
+        scog = self.bot.get_cog("Svocm")
+        if scog is None or scog.selector is None:
+            await interaction.response.send_message("Svocm が読み込まれていません。", ephemeral=True)
+            return
+        st = scog.selector.stats()
+        patterns = " / ".join(f"第{p}文型: {n}件" for p, n in sorted(st["patterns"].items())) or "(なし)"
+        msg = (
+            f"問題 {st['items']}件（{patterns}）\n"
+            f"出題: 復習 {st['due']} / 未学習 {st['unseen']} / 前倒し {st['review_ahead']} / 該当なし {st['empty']}"
+            f"（SRS 状態をメモリに持つ学習者 {st['users']}人）"
+        )
+        await interaction.response.send_message(msg, ephemeral=True)
+
+    @group.command(name="diag_dify", description="Dify 呼び出しの同時実行数・待ち行列・ブレーカー・採点キャッシュ・応答時間の状態を表示")
+    @is_manager()
+    async def diag_dify(self, interaction: discord.Interaction):
+        st = get_scheduler().stats()
+        msg = (
+            f"実行中 {st['running']}/{st['max_concurrency']} / 待ち {st['queued']}件（{st['queued_users']}人、最大 {st['queue_max']}件）\n"
+            f"待ち時間 平均 {st['wait_avg_ms']} ms / 最大 {st['wait_max_ms']} ms\n"
+            f"呼び出し {st['calls']} / 失敗 {st['failures']} / 拒否 {st['rejected']}（うち待ち時間切れ {st['timeouts']}）\n"
+            f"ヘッジ {st['hedges']} / 空き枠が無く見送り {st['hedges_skipped']}\n"
+            f"ブレーカー: **{st['breaker']}**（これまでに {st['breaker_opens']} 回オープン）"
+        )
+        cache = get_answer_cache()
+        if cache is not None:
+            c = cache.stats()
+            msg += (
+                f"\n採点キャッシュ: ヒット率 {c['hit_ratio']:.0%}（メモリ {c['memory_hits']} / PG {c['pg_hits']} / 同時待ち合わせ {c['coalesced']} / ミス {c['misses']}）"
+                f" / 節約 約 {c['saved_sec']} 秒（1回 平均 {c['avg_load_ms']} ms）"
+            )
+        for wf, lt in get_latency().stats().items():
+            msg += (
+                f"\n`{wf}`: p50 {lt['p50']} / p95 {lt['p95']} / p99 {lt['p99']} ms（{lt['samples']}件）"
+                f" / タイムアウト {lt['timeout_sec']}s（発生 {lt['timeouts']}） / ヘッジ {lt['hedges']}（勝ち {lt['hedge_wins']}）"
+            )
+        await interaction.response.send_message(msg, ephemeral=True)
+
+    @group.command(name="diag_jobs", description="ジョブキューの件数（種類・状態別）とこのプロセスの worker の状態を表示")
+    @is_manager()
+    async def diag_jobs(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        from db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            rows = await con.fetch("""
+                SELECT kind, status, count(*) AS n FROM jobs
+                WHERE status IN ('queued', 'running') OR finished_at > now() - interval '1 hour'
+                GROUP BY kind, status ORDER BY kind, status
+            """)
+        st = self.bot.jobs.stats()
+        lines = [f"`{r['kind']}` {r['status']}: {r['n']}件" for r in rows] or ["(直近1時間のジョブなし)"]
+        lines.append(
+            f"このプロセス `{st['worker_id']}`: worker {st['workers']} / 実行中 {st['running']} / "
+            f"完了 {st['done']} / 再試行 {st['retried']} / 失敗 {st['failed']}\n"
+            f"待ち 平均 {st['avg_wait_ms']} ms / 実行 平均 {st['avg_run_ms']} ms"
+        )
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
     @group.command(name="create_channel", description="指定ユーザーの学習鍵チャンネルを作成（ニックネーム名）")
     @app_commands.describe(user="対象ユーザー（@メンション または 検索）")
     async def create_channel(self, interaction: discord.Interaction, user: discord.Member):
@@ -16,16 +16,16 @@ class MenuView(discord.ui.View):
 
     @discord.ui.button(label="長文読解", style=discord.ButtonStyle.primary, custom_id="menu:reading")
     async def reading_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # 1) まずは見た目を「生成中…」に更新
+        # 1) まずは見た目を「準備中…」に更新（作り置きが無ければその場で生成する）
         try:
             await interaction.response.edit_message(
-                embed=info_embed("長文読解", "問題を生成中です…（数秒かかることがあります）"),
+                embed=info_embed("長文読解", "問題を準備しています…"),
                 view=None
             )
         except discord.InteractionResponded:
             try:
                 await interaction.message.edit(
-                    embed=info_embed("長文読解", "問題を生成中です…（数秒かかることがあります）"),
+                    embed=info_embed("長文読解", "問題を準備しています…"),
                     view=None
                 )
             except Exception:
@@ -38,11 +38,9 @@ class MenuView(discord.ui.View):
             await interaction.followup.send("❌ ReadingCog が見つかりませんでした。管理者に連絡してください。", ephemeral=True)
             return
 
-        # command ctx を作って既存実装を再利用
-        ctx = await interaction.client.get_context(interaction.message)
         try:
-            # 既存の !reading コマンドと同じ入口を使う（デフォルトは toeic）
-            await rcog.start_reading(ctx, kind="toeic")
+            # 既存の !reading コマンドと同じ出題処理を、押した本人向けに使う（デフォルトは toeic）
+            await rcog.send_new_question(interaction.channel, interaction.user, kind="toeic")
         except Exception as e:
             await interaction.followup.send(f"❌ 出題に失敗しました: {e}", ephemeral=True)
 
@@ -83,20 +81,18 @@ class ReadingMenuView(discord.ui.View):
 class Menu(commands.Cog):
     def __init__(self, bot): self.bot = bot
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id", "")
-        if cid == "back:main":
-            await interaction.response.edit_message(
-                embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                view=MenuView()
-            )
-        # vocab/svocm/reading のサブメニューイベントを中継
-        elif cid.startswith("vocab:") or cid.startswith("svocm:") or cid.startswith("reading:"):
-            # 他の Cog に処理を任せる（何もしない）
-            pass  # discord.py が自動ルーティングする
+    async def cog_load(self):
+        # vocab/svocm/reading のボタンは各 Cog が自分で登録する
+        self.bot.router.register("back:main", self.back_main, owner=self)
+
+    async def cog_unload(self):
+        self.bot.router.unregister_owner(self)
+
+    async def back_main(self, interaction: discord.Interaction, cid: str):
+        await interaction.response.edit_message(
+            embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+            view=MenuView()
+        )
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Menu(bot))
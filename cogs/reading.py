@@ -1,220 +1,353 @@
-from dify import run_reading_question_async, run_reading_answer_async
+from dify import (
+    run_reading_question_async, run_reading_question_stream, run_reading_question_chat,
+    run_reading_answer_async, reading_chat_enabled,
+)
+import asyncio
+import json
+import time
 import discord
 from discord.ext import commands
+from db import get_pool
+import session_codec
+from sessions import SESSION_TTL_SEC
+from utils import resolve_channel
+from outbound import get_outbound, message_route
+from reading_pool import ReadingPool
+from config import READING_POOL_TARGET, READING_POOL_LOW_WATER, READING_POOL_CONCURRENCY, READING_POOL_KINDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHOICE_KEYS = ("A", "B", "C", "D")
+DEFAULT_SCORE = 50  # 出題時の current_score（プールの level もこの値で分ける）
+STREAM_EDIT_INTERVAL_SEC = 1.5  # 生成途中の本文で Embed を編集する最短間隔
+EMBED_DESC_MAX = 4096
+BUSY_MESSAGE = "⚠️ 問題生成サービスが混み合っているか、一時的に応答していません。少し待ってからもう一度お試しください。"
+
+def parse_question(q: dict) -> dict:
+    """Difyの出題JSONを、出題・採点で使う形に整える"""
+    item = {
+        "passage": q.get("passage", q.get("raw_text", "")),
+        "q1_answer": q.get("question_1_answer"),
+        "q2_answer": q.get("question_2_answer"),
+    }
+    for n in (1, 2):
+        item[f"q{n}_text"] = q.get(f"question_{n}_text", "")
+        item[f"q{n}_choices"] = {k: q.get(f"question_{n}_choice_{k}") for k in CHOICE_KEYS}
+    return item
+
+async def store_item(item: dict, kind: str, level: str | None = None, source: str = "dify",
+                     conversation_id: str | None = None) -> int:
+    """
+    生成した問題を reading_items に保存して item_id を返す（ボタンは item_id だけを持つ）。
+    会話版で出題したものは conversation_id も残し、採点ターンで使う。
+    """
+    questions = {k: item[k] for k in ("q1_text", "q1_choices", "q2_text", "q2_choices")}
+    answer_key = {"q1": item["q1_answer"], "q2": item["q2_answer"]}
+    pool = await get_pool()
+    async with pool.acquire() as con:
+        return await con.fetchval("""
+            INSERT INTO reading_items(skill_tag, level, passage_en, questions, answer_key, source, conversation_id)
+            VALUES($1, $2, $3, $4::jsonb, $5::jsonb, $6, $7)
+            RETURNING item_id
+        """, kind, level, item["passage"], json.dumps(questions), json.dumps(answer_key), source, conversation_id)
+
+async def load_item(item_id: int) -> dict | None:
+    pool = await get_pool()
+    async with pool.acquire() as con:
+        row = await con.fetchrow(
+            "SELECT passage_en, questions, answer_key, conversation_id FROM reading_items WHERE item_id=$1", item_id
+        )
+    if row is None:
+        return None
+    return item_from_row(row)
+
+def item_from_row(row) -> dict:
+    """reading_items の行（passage_en / questions / answer_key）を出題用の dict に戻す"""
+    questions = json.loads(row["questions"])
+    answer_key = json.loads(row["answer_key"])
+    return {
+        "passage": row["passage_en"],
+        **questions,
+        "q1_answer": answer_key.get("q1"),
+        "q2_answer": answer_key.get("q2"),
+        "conversation_id": row.get("conversation_id"),
+    }
+
+async def disable_buttons_only(msg: discord.Message):
+    """直前メッセージのボタンだけを無効化する（Embedは触らない）"""
+    try:
+        disabled = discord.ui.View(timeout=0)
+        for row in msg.components:
+            for comp in getattr(row, "children", []):
+                if isinstance(comp, discord.ui.Button):
+                    b = discord.ui.Button(
+                        label=comp.label, style=comp.style,
+                        custom_id=comp.custom_id, url=getattr(comp, "url", None),
+                        disabled=True
+                    )
+                    disabled.add_item(b)
+        await get_outbound().edit(("msg", msg.id), message_route(msg.channel.id, edit=True), msg.edit, view=disabled)
+    except Exception:
+        pass
+
+def passage_embed(passage: str, generating: bool = False) -> discord.Embed:
+    text = passage + " ▌" if generating else passage
+    if len(text) > EMBED_DESC_MAX:
+        text = text[:EMBED_DESC_MAX - 1] + "…"
+    return discord.Embed(title="📖 Reading Passage", description=text or "…")
+
+class PassageStream:
+    """
+    生成途中の本文を1通の Embed に流し込む。最初のチャンクで送信し、以降は
+    STREAM_EDIT_INTERVAL_SEC ごとに編集する（送信キュー上でも古い編集は上書きされる）。
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.message = None
+        self._sending = None
+        self._last = 0.0
+
+    def update(self, passage: str, complete: bool):
+        if self._sending is None:
+            # あとで embed= で編集するので、他の送信とはまとめない
+            self._sending = get_outbound().send_nowait(self.channel, merge=False, embed=passage_embed(passage, generating=True))
+            self._last = time.monotonic()
+            return
+        if self.message is None:
+            if not self._sending.done() or self._sending.exception() is not None:
+                return
+            self.message = self._sending.result()
+        now = time.monotonic()
+        if not complete and now - self._last < STREAM_EDIT_INTERVAL_SEC:
+            return
+        self._last = now
+        msg = self.message
+        task = asyncio.ensure_future(get_outbound().edit(
+            ("msg", msg.id), message_route(self.channel.id, edit=True), msg.edit, embed=passage_embed(passage, generating=not complete)
+        ))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def finish(self, passage: str) -> bool:
+        """完成した本文で確定させる。途中経過を出していなければ False（呼び出し元が普通に送る）"""
+        if self._sending is None:
+            return False
+        try:
+            msg = self.message or await self._sending
+        except Exception:
+            return False
+        await get_outbound().edit(("msg", msg.id), message_route(self.channel.id, edit=True), msg.edit, embed=passage_embed(passage))
+        return True
+
+    async def abort(self, note: str):
+        """生成が途中で失敗したとき、書きかけの本文に注記して残す（再試行は新しいメッセージで出す）"""
+        if self._sending is None:
+            return
+        try:
+            msg = self.message or await self._sending
+            await get_outbound().edit(("msg", msg.id), message_route(self.channel.id, edit=True), msg.edit,
+                                      embed=discord.Embed(title="📖 Reading Passage", description=note))
+        except Exception:
+            pass
 
 class ReadingCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._live_views = set()   # ★ 参照保持
+        self.pool = ReadingPool(
+            self._generate, store_item,
+            target=READING_POOL_TARGET, low_water=READING_POOL_LOW_WATER,
+            concurrency=READING_POOL_CONCURRENCY,
+        )
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
+    async def cog_load(self):
+        router = self.bot.router
+        router.register("reading:c", self._on_choice, owner=self)
+        router.register("reading:again", self.again, owner=self)
+        router.register("reading:back_main", self.back_main, owner=self)
+        # Dify を呼ぶ出題・採点はジョブにする（再起動を挟んでも続きから、どのプロセスの worker でも実行できる）
+        jobs = self.bot.jobs
+        jobs.register("reading.generate", self._job_generate, on_failure=self._job_generate_failed, max_attempts=3)
+        jobs.register("reading.grade", self._job_grade, on_failure=self._job_grade_failed, max_attempts=4)
+        try:
+            await self.pool.start(keys=[(k, str(DEFAULT_SCORE)) for k in READING_POOL_KINDS])
+        except Exception as e:
+            logger.error(f"❌ 読解プールの起動に失敗（都度生成で動作します）: {e}")
+
+    async def cog_unload(self):
+        self.bot.router.unregister_owner(self)
+        self.bot.jobs.unregister("reading.generate")
+        self.bot.jobs.unregister("reading.grade")
+        await self.pool.stop()
+
+    async def _generate(self, kind: str, level: str) -> dict:
+        """プール補充用に1問生成する（解答キーが取れないものは貯めない）"""
+        q = await run_reading_question_async(
+            user_id="pool",
+            training_type="reading",
+            current_score=int(level),
+            recent_svocm_mistakes="[]",
+            word=""
+        )
+        item = parse_question(q)
+        if not (item["passage"] and item["q1_answer"] and item["q2_answer"]):
+            raise ValueError(f"unexpected question payload: {str(q)[:200]}")
+        return item
+
+    async def again(self, interaction: discord.Interaction, cid: str):
+        # 解説メッセージはそのまま残す → ボタンだけ無効化
+        await disable_buttons_only(interaction.message)
+
+        # 作り置きがあればすぐ出せるので応答だけ返す
+        if self.pool.ready("toeic", str(DEFAULT_SCORE)):
+            await interaction.response.defer()
+            await self.send_new_question(interaction.channel, interaction.user, kind="toeic")
             return
-        cid = interaction.data.get("custom_id", "")
-
-        # 共有: 直前メッセージのボタンを無効化するユーティリティ
-        async def _disable_buttons_only(msg: discord.Message):
-            try:
-                disabled = discord.ui.View(timeout=0)
-                for row in msg.components:
-                    for comp in getattr(row, "children", []):
-                        if isinstance(comp, discord.ui.Button):
-                            b = discord.ui.Button(
-                                label=comp.label, style=comp.style,
-                                custom_id=comp.custom_id, url=getattr(comp, "url", None),
-                                disabled=True
-                            )
-                            disabled.add_item(b)
-                await msg.edit(view=disabled)  # ★ Embedは触らない
-            except Exception:
-                pass
-
-        if cid == "reading:again":
-            # 解説メッセージはそのまま残す → ボタンだけ無効化
-            await _disable_buttons_only(interaction.message)
 
-            # 新規メッセージとして「生成中…」を出し、そこから再出題
-            try:
-                await interaction.response.send_message(
-                    embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
-                    view=None
-                )
-            except discord.InteractionResponded:
-                await interaction.followup.send(
-                    embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
-                    wait=True
-                )
+        # 新規メッセージとして「生成中…」を出し、そこから再出題
+        try:
+            await interaction.response.send_message(
+                embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
+                view=None
+            )
+        except discord.InteractionResponded:
+            await interaction.followup.send(
+                embed=discord.Embed(title="長文読解", description="問題を生成中です…（数十秒かかることがあります）"),
+                wait=True
+            )
 
-            # 新しく出したメッセージから ctx を作って再出題
-            # （直前sendのメッセージは followup の戻り値を拾えないため、チャンネルからctxでOK）
-            ctx = await interaction.client.get_context(interaction.message)
-            await self.start_reading(ctx, kind="toeic")
+        # 押した本人向けに同じチャンネルへ再出題
+        await self.send_new_question(interaction.channel, interaction.user, kind="toeic")
 
-        elif cid == "reading:back_main":
-            # 解説メッセージはそのまま残す → ボタンだけ無効化
-            await _disable_buttons_only(interaction.message)
+    async def back_main(self, interaction: discord.Interaction, cid: str):
+        # 解説メッセージはそのまま残す → ボタンだけ無効化
+        await disable_buttons_only(interaction.message)
 
-            # 新規メッセージとしてメニューを送る
-            from utils import info_embed
-            from cogs.menu import MenuView
-            try:
-                await interaction.response.send_message(
-                    embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                    view=MenuView()
-                )
-            except discord.InteractionResponded:
-                await interaction.followup.send(
-                    embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
-                    view=MenuView(),
-                    wait=True
-                )
+        # 新規メッセージとしてメニューを送る
+        from utils import info_embed
+        from cogs.menu import MenuView
+        try:
+            await interaction.response.send_message(
+                embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+                view=MenuView()
+            )
+        except discord.InteractionResponded:
+            await interaction.followup.send(
+                embed=info_embed("Winglish へようこそ", "学習を開始しましょう👇"),
+                view=MenuView(),
+                wait=True
+            )
 
     @commands.command(name="reading")
     async def start_reading(self, ctx, kind: str = "toeic"):
         """例: !reading toeic"""
-        async with ctx.channel.typing():  # ← 入力中…を維持
-            q = await run_reading_question_async(
-                user_id=ctx.author.id,
-                training_type="reading",
-                current_score=50,
-                recent_svocm_mistakes="[]",
-                word=""
-            )
-
-            passage = q.get("passage", q.get("raw_text", ""))
-            q1_text = q.get("question_1_text", "")
-            q2_text = q.get("question_2_text", "")
-            q1_choices = {
-                "A": q.get("question_1_choice_A"),
-                "B": q.get("question_1_choice_B"),
-                "C": q.get("question_1_choice_C"),
-                "D": q.get("question_1_choice_D"),
-            }
-            q2_choices = {
-                "A": q.get("question_2_choice_A"),
-                "B": q.get("question_2_choice_B"),
-                "C": q.get("question_2_choice_C"),
-                "D": q.get("question_2_choice_D"),
-            }
-            q1_answer = q.get("question_1_answer")
-            q2_answer = q.get("question_2_answer")
-
-            # 本文
-            emb_p = discord.Embed(title="📖 Reading Passage", description=passage)
-            await ctx.send(embed=emb_p)
-
-            # セッション
-            session = {
-                "passage": passage,
-                "q1_text": q1_text, "q1_choices": q1_choices, "q1_answer": q1_answer, "q1_user": None,
-                "q2_text": q2_text, "q2_choices": q2_choices, "q2_answer": q2_answer, "q2_user": None,
-                "author_id": ctx.author.id,
-            }
+        await self.send_new_question(ctx.channel, ctx.author, kind=kind)
+
+    async def send_new_question(self, channel, user, kind: str = "toeic"):
+        """作り置きがあれば本文とQ1をすぐ channel に出し、無ければ生成ジョブに回す（user は解答できる本人）"""
+        level = str(DEFAULT_SCORE)
+        row = await self.pool.pop(kind, level)
+        if row is None:
+            await self.bot.jobs.enqueue("reading.generate", {
+                "channel_id": channel.id, "user_id": user.id, "kind": kind, "level": level,
+            })
+            return
+        item = item_from_row(row)
+        # 本文（送信キュー上で直後のQ1とまとめて1通になることがある）
+        get_outbound().send_nowait(channel, embed=passage_embed(item["passage"]))
+        await self._send_question(channel, user.id, row["item_id"], item, number=1)
+
+    async def _job_generate(self, payload: dict) -> dict:
+        """
+        reading.generate: その場で生成して本文とQ1を出す。本文は生成途中から表示し、設問の生成中も編集で伸ばす。
+        DifyUnavailable などで失敗したらジョブごと再試行される（最後まで駄目なら _job_generate_failed）。
+        """
+        channel = resolve_channel(self.bot, payload["channel_id"])
+        user_id, kind, level = payload["user_id"], payload["kind"], payload["level"]
+        stream = PassageStream(channel)
+        try:
+            item, item_id = await self._generate_streamed(channel, stream, user_id, kind, level)
+        except Exception:
+            await stream.abort("⚠️ 生成が途中で止まりました。")
+            raise
 
+        if not await stream.finish(item["passage"]):
+            get_outbound().send_nowait(channel, embed=passage_embed(item["passage"]))
         # Q1表示（typingの外でOK）
-        await self._send_question(ctx, session, number=1)
+        await self._send_question(channel, user_id, item_id, item, number=1)
+        return {"item_id": item_id}
+
+    async def _generate_streamed(self, channel, stream, user_id, kind: str, level: str):
+        async with channel.typing():  # ← 入力中…を維持
+            conversation_id = None
+            if reading_chat_enabled():
+                # 会話版: 採点ターンでは本文・設問を送り直さずに済む
+                q, conversation_id = await run_reading_question_chat(
+                    user_id=user_id,
+                    on_passage=stream.update,
+                    training_type="reading",
+                    current_score=int(level),
+                    recent_svocm_mistakes="[]",
+                    word=""
+                )
+            else:
+                q = await run_reading_question_stream(
+                    user_id=user_id,
+                    on_passage=stream.update,
+                    training_type="reading",
+                    current_score=int(level),
+                    recent_svocm_mistakes="[]",
+                    word=""
+                )
+            item = parse_question(q)
+            item_id = await store_item(item, kind, level, conversation_id=conversation_id)
+        return item, item_id
+
+    async def _job_generate_failed(self, payload: dict, error: Exception):
+        await get_outbound().send(resolve_channel(self.bot, payload["channel_id"]), content=BUSY_MESSAGE)
 
-    async def _send_question(self, ctx, session, number: int):
-        q_text = session[f"q{number}_text"]; choices = session[f"q{number}_choices"]
+    async def _send_question(self, channel, user_id, item_id: int, item: dict, number: int, q1_user: str | None = None):
+        q_text = item[f"q{number}_text"]; choices = item[f"q{number}_choices"]
         emb_q = discord.Embed(title=f"Q{number}", description=q_text)
 
         # 選択肢本文をEmbedに表示
         lines = []
-        for k in ("A", "B", "C", "D"):
+        for k in CHOICE_KEYS:
             v = choices.get(k)
             if v:
                 lines.append(f"**{k}.** {v}")
         if lines:
             emb_q.add_field(name="Choices", value="\n".join(lines), inline=False)
 
-        # View作成（A/B/C/Dボタン）＋ 参照保持（GC防止）
-        view = ChoiceView(
-            session=session,
-            number=number,
-            on_done=lambda s, n=number: self._on_answer(ctx, s, n),
-            timeout=180
-        )
-        for key in ("A", "B", "C", "D"):
+        # A/B/C/Dボタン：問題ID・設問番号・Q1の解答を custom_id に署名付きで持たせる
+        # （押下はルーター経由で届くので、View は期限付きにして ViewStore に溜めない）
+        view = discord.ui.View(timeout=SESSION_TTL_SEC)
+        q1 = CHOICE_KEYS.index(q1_user) + 1 if q1_user else 0
+        for i, key in enumerate(CHOICE_KEYS, start=1):
             if choices.get(key):
-                view.add_item(ChoiceButton(label=key, custom_id=f"{number}:{key}", key=key))
-        self._live_views.add(view)  # ★ 参照保持
+                cid = session_codec.encode("reading", "c", [item_id, number, q1, i], user_id)
+                view.add_item(discord.ui.Button(label=key, style=discord.ButtonStyle.primary, custom_id=cid))
 
-        await ctx.send(embed=emb_q, view=view)
+        await get_outbound().send(channel, embed=emb_q, view=view)
 
-    async def _on_answer(self, ctx, session, answered_number: int):
-        # Q1の直後→Q2へ、Q2の直後→採点
-        if answered_number == 1:
-            await self._send_question(ctx, session, number=2)
+    async def _on_choice(self, interaction: discord.Interaction, cid: str):
+        try:
+            _, _, (item_id, number, q1, choice) = session_codec.decode(cid, interaction.user.id)
+            key = CHOICE_KEYS[choice - 1]
+        except (ValueError, IndexError):
+            await interaction.response.send_message("このボタンは使えません（期限切れ、または他の人の問題です）。", ephemeral=True)
             return
 
-        # 採点
-        def join_choices(d):
-            return " ".join([f"{k}. {v}" for k, v in d.items() if v])
-
-        # 入力中…インジケータをONにしてからDifyを叩く
-        async with ctx.channel.typing():
-            result = await run_reading_answer_async(
-                user_id=session["author_id"],
-                passage=session["passage"],
-                q1_text=session["q1_text"],
-                q1_choices_str=join_choices(session["q1_choices"]),
-                q1_answer=session["q1_answer"],
-                q1_user=session["q1_user"],
-                q2_text=session["q2_text"],
-                q2_choices_str=join_choices(session["q2_choices"]),
-                q2_answer=session["q2_answer"],
-                q2_user=session["q2_user"],
-            )
-
-        # 解説Embed作成（ユーザーの選択肢も明示）
-        emb_r = discord.Embed(title="🌸 解説 / フィードバック")
-        qs = result.get("questions", [])
-        if len(qs) >= 1:
-            emb_r.add_field(name="Q1 Reason", value=qs[0].get("q1_reason", "-"), inline=False)
-            emb_r.add_field(name="Q1 Feedback", value=qs[0].get("feedback", "-"), inline=False)
-            if session.get("q1_user"):
-                emb_r.add_field(name="Q1 Your choice", value=f"**{session['q1_user']}**", inline=True)
-                emb_r.add_field(name="Q1 Correct", value=f"**{session['q1_answer']}**", inline=True)
-        if len(qs) >= 2:
-            emb_r.add_field(name="Q2 Reason", value=qs[1].get("q2_reason", "-"), inline=False)
-            emb_r.add_field(name="Q2 Feedback", value=qs[1].get("feedback", "-"), inline=False)
-            if session.get("q2_user"):
-                emb_r.add_field(name="Q2 Your choice", value=f"**{session['q2_user']}**", inline=True)
-                emb_r.add_field(name="Q2 Correct", value=f"**{session['q2_answer']}**", inline=True)
-        emb_r.add_field(name="Overall", value=result.get("overall_feedback", "-"), inline=False)
-        await ctx.send(embed=emb_r, view=ReadingEndView())
-
-
-class ChoiceButton(discord.ui.Button):
-    def __init__(self, label, custom_id, key):
-        super().__init__(label=label, style=discord.ButtonStyle.primary, custom_id=custom_id)
-        self.key = key
-
-    async def callback(self, interaction: discord.Interaction):
-        view: ChoiceView = self.view  # type: ignore
-        await view.record_answer(interaction, self.key)
-
-
-class ChoiceView(discord.ui.View):
-    def __init__(self, session, number, on_done, timeout=180):
-        super().__init__(timeout=timeout)
-        self.session = session
-        self.number = number
-        self.on_done = on_done
-
-    async def record_answer(self, interaction: discord.Interaction, key: str):
-        # ユーザーの選択を保存
-        self.session[f"q{self.number}_user"] = key
-
-        # 既存のQカードに「あなたの選択」を追記して示す
+        # 既存のQカードに「あなたの選択」を追記して示す（ボタンは外す）。
+        # 本文と同じメッセージにまとめて送られていることがあるので、Qの Embed を探して他の Embed は残す
         try:
-            emb = interaction.message.embeds[0] if interaction.message.embeds else None
-            if emb is not None:
-                emb = emb.copy()
-                # すでにフィールドがあるなら追加、なければ新規
+            embeds = list(interaction.message.embeds)
+            idx = next((i for i, e in enumerate(embeds) if e.title == f"Q{number}"), None)
+            if idx is not None:
+                emb = embeds[idx].copy()
                 emb.add_field(name="Your choice", value=f"**{key}**", inline=True)
-                await interaction.response.edit_message(embed=emb, view=None)
+                embeds[idx] = emb
+                await interaction.response.edit_message(embeds=embeds, view=None)
             else:
                 await interaction.response.edit_message(view=None)
         except discord.InteractionResponded:
@@ -223,12 +356,111 @@ class ChoiceView(discord.ui.View):
             except Exception:
                 pass
 
-        # 次の処理へ（Q1→Q2 or 採点へ）
-        await self.on_done(self.session, self.number)
+        item = await load_item(item_id)
+        if item is None:
+            await interaction.followup.send("❌ 問題データが見つかりませんでした。もう一度出題してください。", ephemeral=True)
+            return
+
+        # Q1の直後→Q2へ、Q2の直後→採点
+        if number == 1:
+            await self._send_question(interaction.channel, interaction.user.id, item_id, item, number=2, q1_user=key)
+            return
+
+        session = {
+            **item,
+            "item_id": item_id,
+            "q1_user": CHOICE_KEYS[q1 - 1] if q1 else None,
+            "q2_user": key,
+            "author_id": interaction.user.id,
+        }
+        await self._on_answer(interaction.channel, session)
+
+    async def _on_answer(self, channel, session):
+        """正誤とスコアはその場で出し、Dify の解説は採点ジョブが届けしだい同じメッセージに書き足す"""
+        # 解説が届いたら embed= で編集するので、他の送信とはまとめない
+        msg = await get_outbound().send(channel, merge=False, embed=result_embed(session), view=ReadingEndView())
+        await self.bot.jobs.enqueue("reading.grade", {
+            "channel_id": channel.id,
+            "message_id": msg.id,
+            "item_id": session["item_id"],
+            "user_id": session["author_id"],
+            "q1_user": session["q1_user"],
+            "q2_user": session["q2_user"],
+        })
+
+    async def _grade_session(self, payload: dict) -> dict | None:
+        item = await load_item(payload["item_id"])
+        if item is None:
+            return None
+        return {**item, "q1_user": payload["q1_user"], "q2_user": payload["q2_user"], "author_id": payload["user_id"]}
+
+    async def _edit_result(self, payload: dict, emb: discord.Embed):
+        channel = resolve_channel(self.bot, payload["channel_id"])
+        msg = channel.get_partial_message(payload["message_id"])
+        await get_outbound().edit(("msg", msg.id), message_route(channel.id, edit=True), msg.edit, embed=emb)
+
+    async def _job_grade(self, payload: dict) -> None:
+        """reading.grade: Dify の採点（解説）を取り、結果メッセージを編集する"""
+        def join_choices(d):
+            return " ".join([f"{k}. {v}" for k, v in d.items() if v])
+
+        session = await self._grade_session(payload)
+        if session is None:
+            logger.warning(f"⚠️ 採点ジョブの問題が見つかりません: item_id={payload['item_id']}")
+            return
+        result = await run_reading_answer_async(
+            user_id=session["author_id"],
+            passage=session["passage"],
+            q1_text=session["q1_text"],
+            q1_choices_str=join_choices(session["q1_choices"]),
+            q1_answer=session["q1_answer"],
+            q1_user=session["q1_user"],
+            q2_text=session["q2_text"],
+            q2_choices_str=join_choices(session["q2_choices"]),
+            q2_answer=session["q2_answer"],
+            q2_user=session["q2_user"],
+            conversation_id=session.get("conversation_id"),
+        )
+        await self._edit_result(payload, result_embed(session, result))
+
+    async def _job_grade_failed(self, payload: dict, error: Exception):
+        session = await self._grade_session(payload)
+        if session is not None:
+            await self._edit_result(payload, result_embed(session, failed=True))
+
+
+def _is_correct(user, answer) -> bool:
+    return bool(user) and bool(answer) and str(user).strip().upper()[:1] == str(answer).strip().upper()[:1]
+
+def _field_text(v, limit: int = 1024) -> str:
+    v = str(v) if v else "-"
+    return v if len(v) <= limit else v[:limit - 1] + "…"
+
+def result_embed(session: dict, result: dict | None = None, failed: bool = False) -> discord.Embed:
+    """
+    結果 Embed。result が無いうちは手元の解答キーで正誤とスコアだけを出す（解説は生成中の表示）。
+    result（Dify の採点）が来たら Reason / Feedback / Overall を足す。
+    """
+    score = sum(_is_correct(session.get(f"q{n}_user"), session.get(f"q{n}_answer")) for n in (1, 2))
+    emb = discord.Embed(title="🌸 解説 / フィードバック", description=f"スコア: **{score} / 2**")
+    qs = (result or {}).get("questions", [])
+    for n in (1, 2):
+        if len(qs) >= n:
+            emb.add_field(name=f"Q{n} Reason", value=_field_text(qs[n - 1].get(f"q{n}_reason")), inline=False)
+            emb.add_field(name=f"Q{n} Feedback", value=_field_text(qs[n - 1].get("feedback")), inline=False)
+        user = session.get(f"q{n}_user")
+        if user:
+            mark = "✅" if _is_correct(user, session.get(f"q{n}_answer")) else "❌"
+            emb.add_field(name=f"Q{n} Your choice", value=f"{mark} **{user}**", inline=True)
+            emb.add_field(name=f"Q{n} Correct", value=f"**{session.get(f'q{n}_answer')}**", inline=True)
+    if result is not None:
+        emb.add_field(name="Overall", value=_field_text(result.get("overall_feedback")), inline=False)
+    elif failed:
+        emb.add_field(name="解説", value="⚠️ 解説を取得できませんでした（正誤とスコアは上のとおりです）。", inline=False)
+    else:
+        emb.add_field(name="解説", value="⏳ 解説を生成中です…（届きしだいこのメッセージに追記します）", inline=False)
+    return emb
 
-    async def on_timeout(self):
-        # 将来的にメッセージに「タイムアウト」を出すならここで
-        return
 
 class ReadingEndView(discord.ui.View):
     def __init__(self):
@@ -1,75 +1,78 @@
+import json
+import logging
 import discord
 from discord.ext import commands
 from db import get_pool
-from utils import info_embed
+from utils import info_embed, resolve_channel
+from dify import run_svocm_answer_async, svocm_grading_enabled
+from outbound import get_outbound
+from srs import apply_svocm_answer
+from svocm_index import SvocmSelector, get_svocm_index
+import svocm_grader
+import session_codec
+from sessions import SESSION_TTL_SEC
+
+logger = logging.getLogger(__name__)
+
+SLOTS = ("s", "v", "o1", "o2", "c", "m")
 
 class SvocmModal(discord.ui.Modal, title="SVOCM 解答"):
-    s = discord.ui.TextInput(label="S", required=True)
-    v = discord.ui.TextInput(label="V", required=True)
-    o1 = discord.ui.TextInput(label="O1", required=False)
-    o2 = discord.ui.TextInput(label="O2", required=False)
-    c = discord.ui.TextInput(label="C", required=False)
-    m = discord.ui.TextInput(label="M", required=False)
-
-    def __init__(self, sentence_en: str, item_id: int):
-        super().__init__()
-        self.sentence_en = sentence_en
-        self.item_id = item_id
+    """
+    入力欄だけを定義する。custom_id に item_id を署名付きで持たせ、
+    送信は InteractionRouter 経由で Svocm.on_submit が受ける（再起動を挟んでも採点できる）。
+    """
+    s = discord.ui.TextInput(label="S", required=True, custom_id="s")
+    v = discord.ui.TextInput(label="V", required=True, custom_id="v")
+    o1 = discord.ui.TextInput(label="O1", required=False, custom_id="o1")
+    o2 = discord.ui.TextInput(label="O2", required=False, custom_id="o2")
+    c = discord.ui.TextInput(label="C", required=False, custom_id="c")
+    m = discord.ui.TextInput(label="M", required=False, custom_id="m")
 
-    async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer(thinking=True, ephemeral=False)
-
-        payload = {
-            "inputs": {
-                "user_id": str(interaction.user.id),
-                "Question": self.sentence_en,
-                "Answer_S": str(self.s),
-                "Answer_V": str(self.v),
-                "Answer_O1": str(self.o1),
-                "Answer_O2": str(self.o2),
-                "Answer_C": str(self.c),
-                "Answer_M": str(self.m),
-                "question_id": str(self.item_id),
-                "training_type": "SVOCM"
-            },
-            "response_mode": "blocking",
-            "user": str(interaction.user.id)
-        }
-        try:
-            await interaction.response.send_message("（一時）SVOCMのDify採点は未設定です。ローカル採点で継続します。", ephemeral=True)
-        except Exception as e:
-            text = f"採点APIエラー: {e}"
+    def __init__(self, item_id: int, user_id):
+        super().__init__(custom_id=session_codec.encode("svocm", "m", [item_id], user_id))
+        self.item_id = item_id
 
-        # ログ保存
-        pool = await get_pool()
-        async with pool.acquire() as con:
-            await con.execute("""
-              INSERT INTO study_logs(user_id, module, item_id, result)
-              VALUES($1,'svocm',$2,$3::jsonb)
-            """, str(interaction.user.id), int(self.item_id), {"feedback": text})
+def modal_values(interaction: discord.Interaction) -> dict:
+    """モーダル送信の生データから {custom_id: value} を取り出す"""
+    values = {}
+    for row in interaction.data.get("components", []):
+        for comp in row.get("components", []):
+            values[comp.get("custom_id")] = comp.get("value") or ""
+    return values
 
-        await interaction.followup.send(embed=discord.Embed(title="SVOCM 採点", description=text))
+def quality_from_result(result) -> int:
+    """採点結果の score（0〜100）を SM-2 の quality（0〜5）にする。点数が無ければ 3（解いた・明日復習）"""
+    score = result.get("score") if isinstance(result, dict) else None
+    if not isinstance(score, (int, float)):
+        return 3
+    return max(0, min(5, round(score / 20)))
 
 class Svocm(commands.Cog):
-    def __init__(self, bot): self.bot = bot
-
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component: return
-        cid = interaction.data.get("custom_id","")
-        if cid.startswith("svocm:pattern:"):
-            pattern = int(cid.split(":")[-1])
-            await self.show_item(interaction, pattern=pattern)
-        elif cid == "svocm:random":
-            await self.show_item(interaction, pattern=None)
+    def __init__(self, bot):
+        self.bot = bot
+        self.selector = None
+
+    async def cog_load(self):
+        # 出題は svocm_items のプロセス内インデックスと学習者の SRS 状態から選ぶ（クリックごとの ORDER BY random() をやめる）
+        self.selector = SvocmSelector(await get_svocm_index())
+        router = self.bot.router
+        router.register("svocm:pattern", self.on_pattern, owner=self)
+        router.register("svocm:random", lambda i, cid: self.show_item(i, pattern=None), owner=self)
+        router.register("svocm:a", self.open_modal, owner=self)
+        router.register("svocm:m", self.on_submit, owner=self)  # モーダル送信
+        self.bot.jobs.register("svocm.grade", self._job_grade, on_failure=self._job_grade_failed, max_attempts=4)
+
+    async def cog_unload(self):
+        self.bot.router.unregister_owner(self)
+        self.bot.jobs.unregister("svocm.grade")
+
+    async def on_pattern(self, interaction: discord.Interaction, cid: str):
+        pattern = int(cid.split(":")[-1])
+        await self.show_item(interaction, pattern=pattern)
 
     async def show_item(self, interaction: discord.Interaction, pattern: int|None):
         pool = await get_pool()
-        async with pool.acquire() as con:
-            if pattern:
-                row = await con.fetchrow("SELECT * FROM svocm_items WHERE pattern=$1 ORDER BY random() LIMIT 1", pattern)
-            else:
-                row = await con.fetchrow("SELECT * FROM svocm_items ORDER BY random() LIMIT 1")
+        row = await self.selector.pick(str(interaction.user.id), pool, pattern=pattern or None)
         if not row:
             await interaction.response.edit_message(embed=info_embed("英文解釈", "問題がありません（管理者に連絡してください）。"), view=None)
             return
@@ -79,15 +82,105 @@ class Svocm(commands.Cog):
             title="SVOCM 問題",
             description=f"{sentence}\n\n（ヒントは ||スポイラー|| で運用可）"  
         )
-        view = discord.ui.View()
-        modal = SvocmModal(sentence, row["item_id"])
-        # モーダル起動ボタン
-        async def on_answer(i: discord.Interaction):
-            await i.response.send_modal(modal)
-        btn = discord.ui.Button(label="解答する", style=discord.ButtonStyle.primary)
-        btn.callback = on_answer
-        view.add_item(btn)
+        # モーダル起動ボタン（問題IDは custom_id に持たせる）。押下はルーター経由で届くので、
+        # View 自体は期限付きにして discord.py の ViewStore に溜まらないようにする
+        view = discord.ui.View(timeout=SESSION_TTL_SEC)
+        cid = session_codec.encode("svocm", "a", [row["item_id"]], interaction.user.id)
+        view.add_item(discord.ui.Button(label="解答する", style=discord.ButtonStyle.primary, custom_id=cid))
         await interaction.response.edit_message(embed=e, view=view)
 
+    async def open_modal(self, interaction: discord.Interaction, cid: str):
+        try:
+            _, _, (item_id,) = session_codec.decode(cid, interaction.user.id)
+        except ValueError:
+            await interaction.response.send_message("このボタンは使えません（期限切れ、または他の人の問題です）。", ephemeral=True)
+            return
+        await interaction.response.send_modal(SvocmModal(item_id, interaction.user.id))
+
+    async def on_submit(self, interaction: discord.Interaction, cid: str):
+        try:
+            _, _, (item_id,) = session_codec.decode(cid, interaction.user.id)
+        except ValueError:
+            await interaction.response.send_message("この解答は受け付けられません（期限切れ）。", ephemeral=True)
+            return
+
+        answers = modal_values(interaction)
+        item = self.selector.index.get(int(item_id)) if self.selector is not None else None
+        if item and svocm_grader.has_gold(item["gold"]):
+            # 正解データがあればその場で採点して返す（Dify を待たない）
+            result = svocm_grader.grade(item["gold"], answers)
+            await interaction.response.send_message(embed=discord.Embed(title="SVOCM 採点", description=feedback_text(result)))
+            try:
+                await self._record(interaction.user.id, int(item_id), answers, result)
+            except Exception:
+                logger.exception("SVOCM の採点結果の保存に失敗しました")
+            return
+
+        # 正解データが無い問題の採点（Dify）はジョブに回し、結果は同じチャンネルに届ける
+        await self.bot.jobs.enqueue("svocm.grade", {
+            "channel_id": interaction.channel_id,
+            "user_id": interaction.user.id,
+            "item_id": int(item_id),
+            "answers": answers,
+        })
+        await interaction.response.send_message(embed=discord.Embed(title="SVOCM 採点", description="⏳ 採点中です…"))
+
+    async def _record(self, user_id, item_id: int, answers: dict, result) -> None:
+        """採点結果を study_logs に残し、SRS を更新する"""
+        text = feedback_text(result) if result is not None else UNGRADED_TEXT
+        quality = quality_from_result(result)
+        log = {"feedback": text, "answers": answers, "quality": quality}
+        if isinstance(result, dict) and "score" in result:
+            log["score"] = result["score"]
+            log["grader"] = result.get("grader", "dify")
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            async with con.transaction():
+                await con.execute("""
+                  INSERT INTO study_logs(user_id, module, item_id, result)
+                  VALUES($1,'svocm',$2,$3::jsonb)
+                """, str(user_id), int(item_id), json.dumps(log))
+                next_review = await apply_svocm_answer(con, user_id, item_id, quality)
+        if self.selector is not None:
+            self.selector.record(str(user_id), item_id, next_review)
+
+    async def _job_grade(self, payload: dict) -> None:
+        """svocm.grade: 採点してログに残し、結果をチャンネルに送る"""
+        user_id, item_id, answers = payload["user_id"], payload["item_id"], payload["answers"]
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            row = await con.fetchrow("SELECT sentence_en, gold FROM svocm_items WHERE item_id=$1", item_id)
+        sentence = row["sentence_en"] if row else ""
+        gold = json.loads(row["gold"]) if row and row["gold"] else None
+
+        result = None
+        if svocm_grader.has_gold(gold):
+            # インデックスが古くてジョブに回ってきた場合も、正解データがあればローカルで採点する
+            result = svocm_grader.grade(gold, answers)
+        elif svocm_grading_enabled():
+            result = await run_svocm_answer_async(user_id=user_id, item_id=item_id, sentence=sentence, answers=answers)
+
+        await self._record(user_id, item_id, answers, result)
+        text = feedback_text(result) if result is not None else UNGRADED_TEXT
+        channel = resolve_channel(self.bot, payload["channel_id"])
+        await get_outbound().send(channel, embed=discord.Embed(title="SVOCM 採点", description=text))
+
+    async def _job_grade_failed(self, payload: dict, error: Exception):
+        channel = resolve_channel(self.bot, payload["channel_id"])
+        await get_outbound().send(channel, embed=discord.Embed(
+            title="SVOCM 採点", description="⚠️ 採点サービスが応答しませんでした。少し待ってからもう一度お試しください。"
+        ))
+
+UNGRADED_TEXT = "（一時）この問題には正解データが無く、SVOCMのDify採点も未設定です。解答は記録しました。"
+
+def feedback_text(result: dict) -> str:
+    """Dify の採点結果から表示用の文を取り出す（Embed の description 上限に収める）"""
+    if not isinstance(result, dict):
+        text = str(result)
+    else:
+        text = result.get("feedback") or result.get("overall_feedback") or result.get("raw_text") \
+            or json.dumps(result, ensure_ascii=False)
+    return text if len(text) <= 4096 else text[:4095] + "…"
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(Svocm(bot))
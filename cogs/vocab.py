@@ -1,7 +1,12 @@
-import discord, random, uuid
+import asyncio, discord, secrets
 from discord.ext import commands
 from db import get_pool
-from srs import update_srs
+from srs_buffer import SrsWriteBuffer
+from sessions import SessionRegistry, SESSION_TTL_SEC
+from scheduler import VocabScheduler
+from catalog import get_catalog
+import session_codec
+from outbound import get_outbound, interaction_route, message_route
 
 # ------------------------
 # 共通ユーティリティ
@@ -14,22 +19,83 @@ async def ensure_defer(interaction: discord.Interaction):
     except Exception:
         pass
 
-async def safe_edit(interaction: discord.Interaction, **kwargs):
-    """このインタラクションのメッセージを安全に編集する"""
+async def safe_edit(interaction: discord.Interaction, **kwargs) -> int:
+    """このインタラクションのメッセージを安全に編集する（戻り値は実際に投げたRESTの回数）"""
+    calls = 0
     try:
         if not interaction.response.is_done():
+            calls += 1
             await interaction.response.edit_message(**kwargs)
-            return
+            return calls
     except Exception:
         pass
+    # 応答済みの後追い編集は送信キュー経由（同じメッセージへの古い編集は捨てられる）
+    outbound = get_outbound()
+    key = ("msg", interaction.message.id if interaction.message else interaction.id)
     try:
-        await interaction.edit_original_response(**kwargs)
+        calls += 1
+        await outbound.edit(key, interaction_route(interaction), interaction.edit_original_response, **kwargs)
     except Exception:
         # それもダメなら元メッセージを直接編集
         try:
-            await interaction.message.edit(**kwargs)
+            calls += 1
+            await outbound.edit(key, message_route(interaction.channel_id, edit=True), interaction.message.edit, **kwargs)
         except Exception:
             pass
+    return calls
+
+def disabled_copy(message: discord.Message) -> discord.ui.View:
+    """メッセージのボタンを無効化した View を作る（見た目で連打抑止）"""
+    new_view = discord.ui.View(timeout=0)
+    for row in message.components:
+        # Rowの再構築
+        for comp in getattr(row, "children", []):
+            if isinstance(comp, discord.ui.Button):
+                new_view.add_item(discord.ui.Button(
+                    label=comp.label,
+                    style=comp.style,
+                    custom_id=comp.custom_id,
+                    url=comp.url if hasattr(comp, "url") else None,
+                    disabled=True
+                ))
+    return new_view
+
+# REST 呼び出し回数の累計（1インタラクションあたりの平均を見る用）
+REST_STATS = {"interactions": 0, "rest_calls": 0}
+
+class ResponsePlan:
+    """
+    1つのインタラクションに対するメッセージ更新を集め、最後に1回の edit_message で送る。
+    3秒の応答期限に間に合わない恐れがある処理の前だけ slow() で
+    「ボタン無効化」を先に返し、最後の更新を edit_original_response で行う（計2回）。
+    """
+
+    def __init__(self, interaction: discord.Interaction):
+        self.interaction = interaction
+        self.kwargs = {}
+        self.rest_calls = 0
+
+    def edit(self, **kwargs):
+        self.kwargs.update(kwargs)
+
+    async def slow(self):
+        if self.interaction.response.is_done():
+            return
+        try:
+            self.rest_calls += 1
+            await self.interaction.response.edit_message(view=disabled_copy(self.interaction.message))
+        except Exception:
+            pass
+
+    async def commit(self):
+        interaction = self.interaction
+        if self.kwargs:
+            self.rest_calls += await safe_edit(interaction, **self.kwargs)
+        elif not interaction.response.is_done():
+            self.rest_calls += 1
+            await ensure_defer(interaction)
+        REST_STATS["interactions"] += 1
+        REST_STATS["rest_calls"] += self.rest_calls
 
 # ------------------------
 # 完了後や中断時に表示するメニュー View
@@ -37,44 +103,63 @@ async def safe_edit(interaction: discord.Interaction, **kwargs):
 class VocabMenuView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
-
-    @discord.ui.button(label="英単語 10問", style=discord.ButtonStyle.primary, custom_id="vocab:ten")
-    async def ten_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # on_interaction側が拾うのでここでは何もしない
-        pass
-
-    @discord.ui.button(label="前々回テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:prevprev")
-    async def prevprev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pass
-
-    @discord.ui.button(label="苦手テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:weak")
-    async def weak_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pass
-
-    @discord.ui.button(label="戻る", style=discord.ButtonStyle.danger)
-    async def back_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        e = discord.Embed(title="Winglish — 英単語", description="学習メニューを選んでください。")
-        await safe_edit(interaction, embed=e, view=VocabMenuView())
+        # 押下は InteractionRouter 経由で Vocab の各ハンドラへ届く
+        self.add_item(discord.ui.Button(label="英単語 10問", style=discord.ButtonStyle.primary, custom_id="vocab:ten"))
+        self.add_item(discord.ui.Button(label="前々回テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:prevprev"))
+        self.add_item(discord.ui.Button(label="苦手テスト", style=discord.ButtonStyle.secondary, custom_id="vocab:weak"))
+        self.add_item(discord.ui.Button(label="戻る", style=discord.ButtonStyle.danger, custom_id="back:main"))
 
 # ------------------------
 # 10問提示ビュー（1問ごとにEmbed更新）
 # ------------------------
 class VocabSessionView(discord.ui.View):
-    def __init__(self, batch_id, items):
-        super().__init__(timeout=180)
+    """
+    出題中の状態（batch / 何問目 / これまでの解答 / 出題語）はボタンの custom_id に署名付きで埋め込む。
+    どのプロセスでも、再起動後でも、ボタンだけからセッションを再開できる。
+    """
+
+    # answers は1問2ビット: 0=次へ(未解答) 1=覚えた 2=忘れそう
+    ANSWER_KNOWN = 1
+    ANSWER_UNSURE = 2
+
+    def __init__(self, batch_id, items, user_id, index=0, answers=0):
+        super().__init__(timeout=SESSION_TTL_SEC)
         self.batch_id = batch_id
         self.items = items
-        self.index = 0
-        self.busy = False  # 多重クリック防止
-
-    async def send_current(self, interaction: discord.Interaction):
+        self.user_id = user_id
+        self.index = index
+        self.answers = answers
+
+    def custom_id(self, action: str) -> str:
+        fields = [int(self.batch_id, 16), self.index, self.answers, *[w["word_id"] for w in self.items]]
+        return session_codec.encode("vocab", action, fields, self.user_id)
+
+    @classmethod
+    async def from_custom_id(cls, cid: str, user_id):
+        """custom_id からセッションを復元（署名不正・形式不正は InvalidToken / ValueError）"""
+        _, action, fields = session_codec.decode(cid, user_id)
+        batch, index, answers, *word_ids = fields
+        catalog = await get_catalog()  # 起動時に読み込み済み
+        items = [catalog.get(wid) or {"word_id": wid, "word": "-"} for wid in word_ids]
+        return action, cls(f"{batch:016x}", items, user_id, index, answers)
+
+    def record(self, code: int):
+        self.answers |= code << (2 * self.index)
+        self.index += 1
+
+    def known_count(self) -> int:
+        return sum(1 for k in range(len(self.items)) if (self.answers >> (2 * k)) & 3 == self.ANSWER_KNOWN)
+
+    def render(self) -> dict:
+        """現在の問題（または完了画面）の embed / view を返す"""
         if self.index >= len(self.items):
-            await safe_edit(
-                interaction,
-                embed=discord.Embed(title="完了", description="10問が終了しました。メインメニューへ戻れます。"),
+            return dict(
+                embed=discord.Embed(
+                    title="完了",
+                    description=f"10問が終了しました（覚えた：{self.known_count()}/{len(self.items)}）。メインメニューへ戻れます。"
+                ),
                 view=VocabMenuView()
             )
-            return
 
         w = self.items[self.index]
         jp = w.get('jp','-')
@@ -94,10 +179,10 @@ class VocabSessionView(discord.ui.View):
         )
         e = discord.Embed(title=f"Q{self.index+1}/10", description=desc)
         v = discord.ui.View(timeout=180)
-        v.add_item(discord.ui.Button(label="覚えた(◎)", style=discord.ButtonStyle.success, custom_id=f"vocab:known:{w['word_id']}"))
-        v.add_item(discord.ui.Button(label="忘れそう(△)", style=discord.ButtonStyle.secondary, custom_id=f"vocab:unsure:{w['word_id']}"))
-        v.add_item(discord.ui.Button(label="▶ 次へ", style=discord.ButtonStyle.primary, custom_id="vocab:next"))
-        await safe_edit(interaction, embed=e, view=v)
+        v.add_item(discord.ui.Button(label="覚えた(◎)", style=discord.ButtonStyle.success, custom_id=self.custom_id("k")))
+        v.add_item(discord.ui.Button(label="忘れそう(△)", style=discord.ButtonStyle.secondary, custom_id=self.custom_id("u")))
+        v.add_item(discord.ui.Button(label="▶ 次へ", style=discord.ButtonStyle.primary, custom_id=self.custom_id("n")))
+        return dict(embed=e, view=v)
 
 # ------------------------
 # Cog本体
@@ -105,67 +190,55 @@ class VocabSessionView(discord.ui.View):
 class Vocab(commands.Cog):
     def __init__(self, bot): 
         self.bot = bot
-
-    # 直近メッセージのボタンを無効化（見た目で連打抑止）
-    async def _disable_current_buttons(self, interaction: discord.Interaction):
-        try:
-            new_view = discord.ui.View(timeout=0)
-            for row in interaction.message.components:
-                # Rowの再構築
-                for comp in getattr(row, "children", []):
-                    if isinstance(comp, discord.ui.Button):
-                        b = discord.ui.Button(
-                            label=comp.label, 
-                            style=comp.style, 
-                            custom_id=comp.custom_id, 
-                            url=comp.url if hasattr(comp, "url") else None,
-                            disabled=True
-                        )
-                        new_view.add_item(b)
-            await safe_edit(interaction, view=new_view)
-        except Exception:
-            pass
-
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.type != discord.InteractionType.component:
-            return
-        cid = interaction.data.get("custom_id","")
-
-        if cid == "vocab:ten":
-            await self.start_ten(interaction)
-
-        elif cid.startswith("vocab:known:") or cid.startswith("vocab:unsure:"):
-            await self.handle_answer(interaction, cid)
-
-        elif cid == "vocab:next":
-            await self.next_item(interaction)
-
-        elif cid == "vocab:prevprev":
-            await self.prevprev_test(interaction)
-
-        elif cid == "vocab:weak":
-            await self.weak_test(interaction)
+        self.scheduler = VocabScheduler()
+        self.srs_buffer = SrsWriteBuffer()
+        # ユーザーごとの出題中セッション（放置されたら SRS 更新を確定して破棄）
+        # 値は (batch_id, 次に解答すべき index)。同じボタンの連打・古いボタンの判定に使う
+        self.sessions = SessionRegistry(on_evict=self._on_session_evict)
+
+    async def cog_load(self):
+        router = self.bot.router
+        router.register("vocab:ten", lambda i, cid: self.start_ten(i), owner=self)
+        for action in ("k", "u", "n"):
+            router.register(f"vocab:{action}", self.advance, owner=self)
+        router.register("vocab:prevprev", lambda i, cid: self.prevprev_test(i), owner=self)
+        router.register("vocab:weak", lambda i, cid: self.weak_test(i), owner=self)
+        # 更新前に表示したボタン（vocab:known:<id> / vocab:unsure:<id> / vocab:next）は新しく10問を始める
+        for legacy in ("known", "unsure", "next"):
+            router.register(f"vocab:{legacy}", lambda i, cid: self.start_ten(i), owner=self)
+        self.srs_buffer.start()
+        self.sessions.start()
+
+    async def cog_unload(self):
+        self.bot.router.unregister_owner(self)
+        # シャットダウン時に未書き込みのSRS更新を流す
+        self.sessions.stop()
+        await self.srs_buffer.close()
+
+    def _on_session_evict(self, user_id: str, progress):
+        asyncio.get_running_loop().create_task(self.srs_buffer.end_session(user_id))
 
     # 10問スタート
     async def start_ten(self, interaction: discord.Interaction):
         user_id = str(interaction.user.id)
-        await ensure_defer(interaction)
+        plan = ResponsePlan(interaction)
+        # 先読みが間に合っていなければDB往復が増えるので、先にボタンだけ無効化して応答しておく
+        if not self.scheduler.has_ready(user_id):
+            await plan.slow()
 
-        pool = await get_pool()
-        async with pool.acquire() as con:
-            words = await con.fetch("""
-                SELECT word_id, word, jp, pos, example_en, example_ja, synonyms, derived
-                FROM words
-                ORDER BY random()
-                LIMIT 20
-            """)
-        items = [dict(r) for r in words][:10]
-        batch_id = str(uuid.uuid4())
-
-        view = VocabSessionView(batch_id, items)
-        await safe_edit(interaction, embed=discord.Embed(title="英単語 10問"), view=None)
-        await view.send_current(interaction)
+        # 復習期限の語 → 新出語の順で10問（先読み済みなら出題語を決めるDB往復なし）
+        items = await self.scheduler.next_batch(user_id)
+        batch_id = secrets.token_hex(8)  # custom_id に収まるよう 64bit
+
+        # 今回の10語のSRS状態を1回で読み込む。読み込みは応答と並行させ、画面を先に返す
+        # （読み終わる前に押された解答は、シードされていない語として record がDBで直接確定する）
+        seeding = asyncio.ensure_future(self.srs_buffer.seed(user_id, [w["word_id"] for w in items]))
+
+        view = VocabSessionView(batch_id, items, user_id)
+        plan.edit(**view.render())
+        await plan.commit()
+        self.sessions.put(user_id, (batch_id, 0))
+        await seeding
 
         async with (await get_pool()).acquire() as con:
             await con.execute(
@@ -173,75 +246,62 @@ class Vocab(commands.Cog):
                 user_id, "vocab", batch_id
             )
 
-        self.bot._vocab_session = view
+        # 解答中に次の10問を組み立てておく
+        self.scheduler.prefetch(user_id, exclude=[w["word_id"] for w in items])
 
-    # 解答処理（覚えた/忘れそう）
-    async def handle_answer(self, interaction: discord.Interaction, cid: str):
-        await ensure_defer(interaction)
+    # 解答処理（覚えた/忘れそう/次へ）
+    async def advance(self, interaction: discord.Interaction, cid: str):
+        # セッション取得＆多重実行ガード（同じユーザーの連打だけを弾く）
+        user_id = str(interaction.user.id)
+        lock = self.sessions.lock(user_id)
+        if lock.locked():
+            await ensure_defer(interaction)
+            return
+        async with lock:
+            try:
+                action, view = await VocabSessionView.from_custom_id(cid, user_id)
+            except ValueError:
+                # 改ざん・他人のボタン → 新しく10問を始める（更新前の旧形式は cog_load の旧ルートが受ける）
+                await self.start_ten(interaction)
+                return
 
-        # セッション取得＆多重実行ガード
-        view = getattr(self.bot, "_vocab_session", None)
-        if isinstance(view, VocabSessionView):
-            if view.busy:
+            # このプロセスで既に先へ進んだ batch の古いボタンは無視
+            progress = self.sessions.get(user_id)
+            if (progress and progress[0] == view.batch_id and progress[1] > view.index) \
+                    or view.index >= len(view.items):
+                await ensure_defer(interaction)
                 return
-            view.busy = True
-        try:
-            await self._disable_current_buttons(interaction)
-
-            user_id = str(interaction.user.id)
-            quality = 5 if "known" in cid else 2
-            word_id = int(cid.split(":")[-1])
-
-            pool = await get_pool()
-            async with pool.acquire() as con:
-                row = await con.fetchrow(
-                    "SELECT easiness, interval_days, consecutive_correct FROM srs_state WHERE user_id=$1 AND word_id=$2",
-                    user_id, word_id
-                )
-                if row:
-                    e, i, c = row["easiness"], row["interval_days"], row["consecutive_correct"]
-                else:
-                    e, i, c = 2.5, 0, 0
-
-                e, i, c, next_review = update_srs(e, i, c, quality)
-                await con.execute("""
-                    INSERT INTO srs_state(user_id, word_id, easiness, interval_days, consecutive_correct, next_review)
-                    VALUES($1,$2,$3,$4,$5,$6)
-                    ON CONFLICT (user_id, word_id) DO UPDATE
-                    SET easiness=$3, interval_days=$4, consecutive_correct=$5, next_review=$6
-                """, user_id, word_id, e, i, c, next_review)
-
-            # 次へ
-            if isinstance(view, VocabSessionView):
-                view.index += 1
-                await view.send_current(interaction)
+
+            plan = ResponsePlan(interaction)
+            if action == "n":
+                view.record(0)
             else:
-                await self.start_ten(interaction)
-        finally:
-            if isinstance(view, VocabSessionView):
-                view.busy = False
-
-    # 明示的な「次へ」
-    async def next_item(self, interaction: discord.Interaction):
-        await ensure_defer(interaction)
-        view = getattr(self.bot, "_vocab_session", None)
-        if isinstance(view, VocabSessionView):
-            if view.busy:
-                return
-            view.busy = True
-            try:
-                await self._disable_current_buttons(interaction)
-                view.index += 1
-                await view.send_current(interaction)
-            finally:
-                view.busy = False
-        else:
-            await self.start_ten(interaction)
+                quality = 5 if action == "k" else 2
+                word_id = view.items[view.index]["word_id"]
+                # セッション外（再起動後など）の語はDBに1文書くので、先に応答しておく
+                if not self.srs_buffer.is_seeded(user_id, word_id):
+                    await plan.slow()
+                view.record(VocabSessionView.ANSWER_KNOWN if action == "k" else VocabSessionView.ANSWER_UNSURE)
+                # SRS更新はメモリ上で行い、書き込みはバッファがまとめて行う
+                await self.srs_buffer.record(user_id, word_id, quality, view.batch_id, flush=False)
+
+            plan.edit(**view.render())
+            await plan.commit()
+
+            # 画面を返した後で書き込み（セッション終了・上限到達時）
+            if view.index >= len(view.items):
+                self.sessions.pop(user_id)
+                await self.srs_buffer.end_session(user_id)
+            else:
+                self.sessions.put(user_id, (view.batch_id, view.index))
+                await self.srs_buffer.flush_if_full()
 
     # 前々回テスト（プレースホルダ）
     async def prevprev_test(self, interaction: discord.Interaction):
-        await ensure_defer(interaction)
         user_id = str(interaction.user.id)
+        plan = ResponsePlan(interaction)
+        # 履歴はDBから読むので、先にボタンだけ無効化して応答しておく
+        await plan.slow()
         pool = await get_pool()
         async with pool.acquire() as con:
             rows = await con.fetch("""
@@ -252,41 +312,30 @@ class Vocab(commands.Cog):
 
         if len(rows) < 3:
             e = discord.Embed(title="前々回テスト", description="履歴が足りません。")
-            await safe_edit(interaction, embed=e, view=VocabMenuView())
-            return
-
-        target = rows[2]["batch_id"]
-        e = discord.Embed(
-            title="前々回テスト",
-            description=f"batch: {target}\n※4択テストは今後実装（MVP後半）"
-        )
-        await safe_edit(interaction, embed=e, view=VocabMenuView())
+        else:
+            target = rows[2]["batch_id"]
+            e = discord.Embed(
+                title="前々回テスト",
+                description=f"batch: {target}\n※4択テストは今後実装（MVP後半）"
+            )
+        plan.edit(embed=e, view=VocabMenuView())
+        await plan.commit()
 
     # 苦手テスト（候補表示）
     async def weak_test(self, interaction: discord.Interaction):
-        await ensure_defer(interaction)
         user_id = str(interaction.user.id)
-        pool = await get_pool()
-        async with pool.acquire() as con:
-            rows = await con.fetch("""
-                SELECT s.word_id, w.word, w.jp, w.pos
-                FROM srs_state s
-                JOIN words w ON w.word_id=s.word_id
-                WHERE s.user_id=$1 AND (s.next_review <= CURRENT_DATE OR s.consecutive_correct < 2)
-                ORDER BY s.consecutive_correct ASC NULLS FIRST, s.next_review ASC NULLS LAST
-                LIMIT 10
-            """, user_id)
+        plan = ResponsePlan(interaction)
+        # 候補はDBから読むので、先にボタンだけ無効化して応答しておく
+        await plan.slow()
+        rows = await self.scheduler.weak_items(user_id)
 
         if not rows:
-            await safe_edit(interaction,
-                            embed=discord.Embed(title="苦手テスト", description="対象がありません。"),
-                            view=VocabMenuView())
-            return
-
-        words = "\n".join([f"- **{r['word']}**（意味：||{r['jp']}||）" for r in rows])
-        await safe_edit(interaction,
-                        embed=discord.Embed(title="苦手テスト（候補）", description=words),
-                        view=VocabMenuView())
+            e = discord.Embed(title="苦手テスト", description="対象がありません。")
+        else:
+            words = "\n".join([f"- **{r['word']}**（意味：||{r['jp']}||）" for r in rows])
+            e = discord.Embed(title="苦手テスト（候補）", description=words)
+        plan.edit(embed=e, view=VocabMenuView())
+        await plan.commit()
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Vocab(bot))
\ No newline at end of file
@@ -10,3 +10,32 @@ DATABASE_URL = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
 DIFY_API_KEY  = os.getenv("DIFY_API_KEY")
 DIFY_ENDPOINT_RUN  = os.getenv("DIFY_ENDPOINT_RUN", "https://api.dify.ai/v1/workflows/run")
 DIFY_ENDPOINT_CHAT = os.getenv("DIFY_ENDPOINT_CHAT", "https://api.dify.ai/v1/chat-messages")
+
+# SRS書き込み方式: "buffer"（write-behind）/ "direct"（解答ごとに1文で確定）
+SRS_WRITE_MODE = os.getenv("SRS_WRITE_MODE", "buffer")
+
+# custom_id に埋め込むセッション状態の署名鍵（必須。複数プロセスで同じ値にする。未設定なら main.py は起動しない）
+SESSION_SECRET = os.getenv("SESSION_SECRET") or ""
+
+# 長文読解の作り置きプール: 種類ごとに TARGET 件まで貯め、LOW_WATER を下回ったら補充
+READING_POOL_TARGET = int(os.getenv("READING_POOL_TARGET") or 5)
+READING_POOL_LOW_WATER = int(os.getenv("READING_POOL_LOW_WATER") or 2)
+READING_POOL_CONCURRENCY = int(os.getenv("READING_POOL_CONCURRENCY") or 1)
+READING_POOL_KINDS = [k for k in os.getenv("READING_POOL_KINDS", "toeic").split(",") if k]
+
+# 長文読解の採点キャッシュ（同じ本文・設問・解答の組み合わせは Dify を呼ばない）
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE") or 2000)
+GRADING_CACHE_TTL_SEC = float(os.getenv("GRADING_CACHE_TTL_SEC") or 30 * 24 * 3600)
+GRADING_CACHE_PG = os.getenv("GRADING_CACHE_PG", "1") == "1"  # Postgres にも保存して再起動・複数プロセスで共有
+
+# Postgres のジョブキュー（Dify 呼び出しを含む処理を worker で実行する。0 なら enqueue だけして他プロセスに任せる）
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS") or 4)
+JOBS_POLL_SEC = float(os.getenv("JOBS_POLL_SEC") or 5)             # 通知を取りこぼしても、この間隔で見に行く
+JOBS_LEASE_SEC = float(os.getenv("JOBS_LEASE_SEC") or 300)         # 処理中のままこれを過ぎたら落ちたとみなして戻す
+JOBS_BACKOFF_BASE_SEC = float(os.getenv("JOBS_BACKOFF_BASE_SEC") or 2)
+JOBS_BACKOFF_MAX_SEC = float(os.getenv("JOBS_BACKOFF_MAX_SEC") or 120)
+
+# 単語カタログの版（catalog_versions）を確認する間隔。NOTIFY を取りこぼしたときの保険（0 で確認しない）
+CATALOG_POLL_SEC = float(os.getenv("CATALOG_POLL_SEC") or 60)
+# 更新通知（LISTEN）の専用接続が生きているかを確かめる間隔。切れていれば張り直す
+LISTEN_CHECK_SEC = float(os.getenv("LISTEN_CHECK_SEC") or 30)
@@ -2,29 +2,378 @@ from __future__ import annotations
 
 import os
 import json
+import time
+import asyncio
 import logging
+import collections
+import contextlib
 from typing import Any, Dict, Optional
 
 import httpx  # ★ 非同期HTTP
-import requests
 
 logger = logging.getLogger(__name__)
 
 # ==== ENV ====
-DIFY_ENDPOINT_RUN = os.getenv("DIFY_ENDPOINT_RUN", "https://api.dify.ai/v1/workflows/run  ")
+DIFY_ENDPOINT_RUN = os.getenv("DIFY_ENDPOINT_RUN", "https://api.dify.ai/v1/workflows/run").strip()
 
 # 別アプリ（App）で運用している想定：Question用とAnswer用でキーを分離
 DIFY_API_KEY_QUESTION = os.getenv("DIFY_API_KEY_QUESTION")  # app-xxxxxxxx (Winglish_reading_Question)
 DIFY_API_KEY_ANSWER = os.getenv("DIFY_API_KEY_ANSWER")      # app-yyyyyyyy (Winglish_reading_Answer)
+DIFY_API_KEY_SVOCM = os.getenv("DIFY_API_KEY_SVOCM")        # app-wwwwwwww (Winglish_SVOCM_Answer)。未設定なら採点しない
+
+# 会話（チャット）版の読解: 出題ターンで conversation_id を受け取り、採点ターンは解答だけを送る
+DIFY_ENDPOINT_CHAT = os.getenv("DIFY_ENDPOINT_CHAT", "https://api.dify.ai/v1/chat-messages").strip()
+DIFY_API_KEY_CHAT = os.getenv("DIFY_API_KEY_CHAT")          # app-zzzzzzzz (Winglish_reading_Chat)
+DIFY_READING_MODE = os.getenv("DIFY_READING_MODE", "workflow")  # "workflow" / "chat"
 
 DEFAULT_TIMEOUT_SEC = 60
 
+# 共有クライアントの設定（接続を使い回して、呼び出しごとの TCP/TLS ハンドシェイクを省く）
+DIFY_CONNECT_TIMEOUT_SEC = float(os.getenv("DIFY_CONNECT_TIMEOUT_SEC") or 5)
+DIFY_READ_TIMEOUT_SEC = float(os.getenv("DIFY_READ_TIMEOUT_SEC") or DEFAULT_TIMEOUT_SEC)
+DIFY_MAX_CONNECTIONS = int(os.getenv("DIFY_MAX_CONNECTIONS") or 20)
+DIFY_MAX_KEEPALIVE = int(os.getenv("DIFY_MAX_KEEPALIVE") or 10)
+DIFY_KEEPALIVE_EXPIRY_SEC = float(os.getenv("DIFY_KEEPALIVE_EXPIRY_SEC") or 30)
+DIFY_HTTP2 = os.getenv("DIFY_HTTP2", "0") == "1"  # 使うには `pip install httpx[http2]`
+# 出題を SSE（response_mode=streaming）で受け取り、本文を生成途中から表示する
+DIFY_STREAMING = os.getenv("DIFY_STREAMING", "1") == "1"
+
+# 呼び出しスケジューラ: 全体の同時実行数・待ち行列・サーキットブレーカー
+DIFY_MAX_CONCURRENCY = int(os.getenv("DIFY_MAX_CONCURRENCY") or 8)
+DIFY_MAX_QUEUE = int(os.getenv("DIFY_MAX_QUEUE") or 200)
+DIFY_QUEUE_TIMEOUT_SEC = float(os.getenv("DIFY_QUEUE_TIMEOUT_SEC") or 60)
+DIFY_BREAKER_WINDOW_SEC = float(os.getenv("DIFY_BREAKER_WINDOW_SEC") or 60)
+DIFY_BREAKER_MIN_CALLS = int(os.getenv("DIFY_BREAKER_MIN_CALLS") or 5)
+DIFY_BREAKER_FAILURE_RATIO = float(os.getenv("DIFY_BREAKER_FAILURE_RATIO") or 0.5)
+DIFY_BREAKER_COOLDOWN_SEC = float(os.getenv("DIFY_BREAKER_COOLDOWN_SEC") or 30)
+DIFY_SLOW_CALL_SEC = float(os.getenv("DIFY_SLOW_CALL_SEC") or 45)  # これ以上かかった呼び出しは失敗として数える
+
+# ワークフロー別の応答時間（直近 WINDOW 件）から読み取りタイムアウトを決める: p99 × FACTOR を MIN〜DIFY_READ_TIMEOUT_SEC に収める
+DIFY_ADAPTIVE_TIMEOUT = os.getenv("DIFY_ADAPTIVE_TIMEOUT", "1") == "1"
+DIFY_LATENCY_WINDOW = int(os.getenv("DIFY_LATENCY_WINDOW") or 200)
+DIFY_LATENCY_MIN_SAMPLES = int(os.getenv("DIFY_LATENCY_MIN_SAMPLES") or 20)  # これ未満のうちは固定タイムアウト
+DIFY_TIMEOUT_P99_FACTOR = float(os.getenv("DIFY_TIMEOUT_P99_FACTOR") or 3)
+DIFY_TIMEOUT_MIN_SEC = float(os.getenv("DIFY_TIMEOUT_MIN_SEC") or 10)
+# ヘッジ: 応答が p95 を過ぎても返らなければ同じリクエストをもう1本送り、先に成功した方を使う（もう片方は切る）
+DIFY_HEDGE = os.getenv("DIFY_HEDGE", "0") == "1"
+DIFY_HEDGE_QUANTILE = float(os.getenv("DIFY_HEDGE_QUANTILE") or 0.95)
+DIFY_HEDGE_MAX_RATIO = float(os.getenv("DIFY_HEDGE_MAX_RATIO") or 0.1)  # 追加で送るのは呼び出し数のこの割合まで
+
 
 # ===== Exceptions =====
 class DifyError(RuntimeError):
     pass
 
 
+class DifyUnavailable(DifyError):
+    """ブレーカーが開いている・待ち行列が満杯・待ち時間切れで、呼び出さずに諦めた"""
+    pass
+
+
+# ===== Scheduler =====
+class CircuitBreaker:
+    """
+    直近 window 秒の呼び出し結果（失敗 or 遅すぎ）の割合が failure_ratio 以上になったら開き、
+    cooldown 秒は即失敗させる。その後は1件だけ試し（half_open）、成功なら閉じ、失敗なら再び開く。
+    """
+
+    def __init__(self, window: float, min_calls: int, failure_ratio: float, slow_sec: float, cooldown: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_sec = slow_sec
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opens = 0
+        self._samples = collections.deque()  # (monotonic, bad)
+        self._bad = 0                         # _samples のうち bad の件数（毎回数え直さない）
+        self._opened_at = 0.0
+        self._trial = False
+
+    def _refresh(self, now: float):
+        if self.state == "open" and now - self._opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._trial = False
+
+    def is_open(self) -> bool:
+        self._refresh(time.monotonic())
+        return self.state == "open" or (self.state == "half_open" and self._trial)
+
+    def acquire(self) -> bool:
+        """呼び出してよければ True（half_open では試行枠を1件だけ取る）"""
+        self._refresh(time.monotonic())
+        if self.state == "open":
+            return False
+        if self.state == "half_open":
+            if self._trial:
+                return False
+            self._trial = True
+        return True
+
+    def release_trial(self):
+        """試行が結果を残さずに終わった（キャンセル等）ときに枠を戻す"""
+        self._trial = False
+
+    def record(self, ok: bool, elapsed: float):
+        now = time.monotonic()
+        bad = not ok or elapsed >= self.slow_sec
+        if self.state == "half_open":
+            if bad:
+                self._open(now)
+            else:
+                self.state = "closed"
+                self._samples.clear()
+                self._bad = 0
+            self._trial = False
+            return
+        self._samples.append((now, bad))
+        self._bad += bad
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._bad -= self._samples.popleft()[1]
+        n = len(self._samples)
+        if n >= self.min_calls and self._bad / n >= self.failure_ratio:
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = "open"
+        self._opened_at = now
+        self._samples.clear()
+        self._bad = 0
+        self.opens += 1
+        logger.warning(f"⚠️ Dify サーキットブレーカーを開きました（{self.cooldown:.0f}s は即失敗させます）")
+
+
+class DifyScheduler:
+    """
+    Dify 呼び出しの出入口。
+    ・全体の同時実行数を max_concurrency に抑える
+    ・1ユーザーにつき同時に1件まで。空きが出たら待っているユーザーを順番（ラウンドロビン）に通す
+    ・ブレーカーが開いている間・待ち行列が満杯・queue_timeout 秒待っても順番が来ない場合は DifyUnavailable
+    ・ヘッジの2本目は try_extra() で空き枠があるときだけ送る（待っている人がいれば送らない）
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, breaker: CircuitBreaker):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self._running = 0
+        self._in_flight = set()                        # 実行中のユーザー
+        self._queues = collections.OrderedDict()       # user -> deque[Future]（並び順 = 次に通す順）
+        self._waiting = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total_sec = 0.0
+        self.wait_max_sec = 0.0
+        self.queue_max = 0
+        self.hedges = 0
+        self.hedges_skipped = 0
+
+    def _dispatch(self):
+        while self._running < self.max_concurrency:
+            for user, q in self._queues.items():
+                if user not in self._in_flight:
+                    break
+            else:
+                return
+            fut = q.popleft()
+            if not q:
+                del self._queues[user]
+            else:
+                self._queues.move_to_end(user)
+            self._waiting -= 1
+            if fut.done():
+                continue
+            self._running += 1
+            self._in_flight.add(user)
+            fut.set_result(None)
+
+    def _release(self, user: str):
+        self._running -= 1
+        self._in_flight.discard(user)
+        self._dispatch()
+
+    def try_extra(self) -> bool:
+        """ヘッジ用にもう1枠を待たずに取る。満杯・待ち行列がある・ブレーカーが閉じていないときは取らない"""
+        if self._running >= self.max_concurrency or self._waiting > 0 or self.breaker.state != "closed":
+            self.hedges_skipped += 1
+            return False
+        self._running += 1
+        self.hedges += 1
+        return True
+
+    def release_extra(self):
+        self._running -= 1
+        self._dispatch()
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise DifyUnavailable(reason)
+
+    async def _acquire(self, user: str):
+        if self.breaker.is_open():
+            self._reject("Dify circuit breaker is open")
+        if self._waiting >= self.max_queue:
+            self._reject("Dify call queue is full")
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, collections.deque()).append(fut)
+        self._waiting += 1
+        self.queue_max = max(self.queue_max, self._waiting)
+        self._dispatch()
+
+        t = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self._release(user)  # 通された直後に諦めた → 枠を返す
+            else:
+                fut.cancel()         # 行列に残った Future は _dispatch が読み飛ばす
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                self._reject(f"waited {self.queue_timeout:.0f}s for a Dify slot")
+            raise
+        dt = time.monotonic() - t
+        self.wait_total_sec += dt
+        self.wait_max_sec = max(self.wait_max_sec, dt)
+
+        if not self.breaker.acquire():
+            self._release(user)
+            self._reject("Dify circuit breaker is open")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, user_id):
+        """async with scheduler.slot(user_id): の中で Dify を1回呼ぶ"""
+        user = str(user_id)
+        await self._acquire(user)
+        t = time.monotonic()
+        self.calls += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record(False, time.monotonic() - t)
+            raise
+        else:
+            self.breaker.record(True, time.monotonic() - t)
+        finally:
+            self._release(user)
+
+    def stats(self) -> dict:
+        granted = self.calls or 1
+        return {
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "queued": self._waiting,
+            "queued_users": len(self._queues),
+            "queue_max": self.queue_max,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total_sec / granted * 1000, 1),
+            "wait_max_ms": round(self.wait_max_sec * 1000, 1),
+            "hedges": self.hedges,
+            "hedges_skipped": self.hedges_skipped,
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+        }
+
+
+_scheduler = DifyScheduler(
+    DIFY_MAX_CONCURRENCY, DIFY_MAX_QUEUE, DIFY_QUEUE_TIMEOUT_SEC,
+    CircuitBreaker(DIFY_BREAKER_WINDOW_SEC, DIFY_BREAKER_MIN_CALLS, DIFY_BREAKER_FAILURE_RATIO,
+                   DIFY_SLOW_CALL_SEC, DIFY_BREAKER_COOLDOWN_SEC),
+)
+
+
+def get_scheduler() -> DifyScheduler:
+    return _scheduler
+
+
+# ===== Latency =====
+class LatencyTracker:
+    """
+    ワークフロー別（question / answer / ...）に直近 window 件の応答時間を持ち、
+    適応タイムアウトとヘッジを始めるまでの待ち時間を出す。
+    タイムアウトした呼び出しはその時点の秒数で記録する（Dify が遅くなればタイムアウトも伸びる）。
+    """
+
+    def __init__(self, window: int, min_samples: int):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}   # workflow -> deque[秒]
+        self.timeouts = collections.Counter()
+        self.calls = collections.Counter()
+        self.hedges = collections.Counter()
+        self.hedge_wins = collections.Counter()
+
+    def record(self, workflow: str, elapsed: float):
+        self._samples.setdefault(workflow, collections.deque(maxlen=self.window)).append(elapsed)
+
+    def quantile(self, workflow: str, q: float) -> Optional[float]:
+        """サンプルが min_samples 未満なら None"""
+        xs = self._samples.get(workflow)
+        if not xs or len(xs) < self.min_samples:
+            return None
+        xs = sorted(xs)
+        return xs[min(int(q * len(xs)), len(xs) - 1)]
+
+    def timeout_for(self, workflow: str) -> float:
+        p99 = self.quantile(workflow, 0.99) if DIFY_ADAPTIVE_TIMEOUT else None
+        if p99 is None:
+            return DIFY_READ_TIMEOUT_SEC
+        return min(max(p99 * DIFY_TIMEOUT_P99_FACTOR, DIFY_TIMEOUT_MIN_SEC), DIFY_READ_TIMEOUT_SEC)
+
+    def hedge_after(self, workflow: str) -> Optional[float]:
+        """ヘッジを送るまでの秒数。ヘッジしない（無効・サンプル不足・予算切れ）なら None"""
+        if not DIFY_HEDGE or self.hedges[workflow] >= DIFY_HEDGE_MAX_RATIO * self.calls[workflow]:
+            return None
+        return self.quantile(workflow, DIFY_HEDGE_QUANTILE)
+
+    def stats(self) -> dict:
+        out = {}
+        for wf in sorted(self._samples):
+            q = {k: self.quantile(wf, v) for k, v in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+            out[wf] = {
+                **{k: None if v is None else round(v * 1000) for k, v in q.items()},
+                "samples": len(self._samples[wf]),
+                "timeout_sec": round(self.timeout_for(wf), 1),
+                "calls": self.calls[wf],
+                "timeouts": self.timeouts[wf],
+                "hedges": self.hedges[wf],
+                "hedge_wins": self.hedge_wins[wf],
+            }
+        return out
+
+
+_latency = LatencyTracker(DIFY_LATENCY_WINDOW, DIFY_LATENCY_MIN_SAMPLES)
+
+
+def get_latency() -> LatencyTracker:
+    return _latency
+
+
+# ===== Grading cache =====
+# get_or_load(namespace, inputs, load, cacheable) を持つオブジェクト（grading_cache.GradingCache）。
+# Bot 起動時に set_answer_cache で差し込む。None ならキャッシュしない。
+_answer_cache = None
+
+
+def set_answer_cache(cache):
+    global _answer_cache
+    _answer_cache = cache
+
+
+def get_answer_cache():
+    return _answer_cache
+
+
 # ===== Utilities =====
 def _clean_fenced_json(text: str) -> str:
     """
@@ -76,46 +425,234 @@ def _extract_outputs_text(resp_json: Dict[str, Any]) -> Optional[str]:
     return None
 
 
+class PassageStreamParser:
+    """
+    出題 JSON（```json フェンス付きでも可）の生成途中のテキストから、
+    "passage" の値をその時点までデコードして取り出す。
+    feed(text) に累積テキストを渡すと (passage_so_far, complete) を返す。
+    エスケープ（\\n, \\", \\uXXXX）の途中で切れている場合はその手前までを返す。
+    """
+
+    KEY = '"passage"'
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.start = -1       # passage の値（開き " の次）の位置
+        self.pos = 0          # デコード済みの位置
+        self.parts = []
+        self.complete = False
+
+    def _find_start(self, text: str) -> bool:
+        i = text.find(self.KEY)
+        while i >= 0:
+            j = i + len(self.KEY)
+            while j < len(text) and text[j] in " \t\r\n":
+                j += 1
+            if j >= len(text):
+                return False
+            if text[j] == ":":
+                j += 1
+                while j < len(text) and text[j] in " \t\r\n":
+                    j += 1
+                if j >= len(text):
+                    return False
+                if text[j] == '"':
+                    self.start = self.pos = j + 1
+                    return True
+            i = text.find(self.KEY, i + 1)
+        return False
+
+    def feed(self, text: str):
+        if self.complete:
+            return self.value, True
+        if self.start < 0 and not self._find_start(text):
+            return "", False
+        i, n = self.pos, len(text)
+        while i < n:
+            ch = text[i]
+            if ch == '"':
+                self.complete = True
+                i += 1
+                break
+            if ch != "\\":
+                j = i
+                while j < n and text[j] not in '"\\':
+                    j += 1
+                self.parts.append(text[i:j])
+                i = j
+                continue
+            if i + 1 >= n:
+                break
+            esc = text[i + 1]
+            if esc == "u":
+                if i + 6 > n:
+                    break
+                code = int(text[i + 2:i + 6], 16)
+                if 0xD800 <= code < 0xDC00:  # サロゲートペアは下位側が揃うまで待つ
+                    if i + 12 > n:
+                        break
+                    low = int(text[i + 8:i + 12], 16)
+                    self.parts.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                self.parts.append(chr(code))
+                i += 6
+                continue
+            self.parts.append(self._ESCAPES.get(esc, esc))
+            i += 2
+        self.pos = i
+        return self.value, self.complete
+
+    @property
+    def value(self) -> str:
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+
+# ===== HTTP client =====
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _new_client() -> httpx.AsyncClient:
+    http2 = DIFY_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("DIFY_HTTP2=1 ですが h2 が未インストールのため HTTP/1.1 で接続します（pip install httpx[http2]）")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(DIFY_READ_TIMEOUT_SEC, connect=DIFY_CONNECT_TIMEOUT_SEC),
+        limits=httpx.Limits(
+            max_connections=DIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=DIFY_MAX_KEEPALIVE,
+            keepalive_expiry=DIFY_KEEPALIVE_EXPIRY_SEC,
+        ),
+    )
+
+
+async def open_client() -> httpx.AsyncClient:
+    """共有クライアントを作る（Bot の setup_hook から呼ぶ。未作成で呼ばれた場合も初回に作られる）"""
+    global _client, _client_loop
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+        _client_loop = asyncio.get_running_loop()
+    return _client
+
+
+async def close_client():
+    """共有クライアントを閉じる（Bot の close から呼ぶ）"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
 def _post_workflow(
     inputs: Dict[str, Any],
     user_id: str | int,
     api_key: str,
     endpoint: str = DIFY_ENDPOINT_RUN,
-    timeout_sec: int = DEFAULT_TIMEOUT_SEC,
+    timeout_sec: Optional[float] = None,
+    workflow: str = "default",
+) -> str:
+    """
+    Dify /workflows/run を叩く同期版（スクリプト・別スレッド向け）。中身は _apost_workflow。
+    - Bot のイベントループが動いていれば、そのループ上の共有クライアントで実行して結果を待つ
+    - ループが無ければ、使い捨てのループとクライアントで実行する
+    イベントループ上から呼ぶとループを止めてしまうため DifyError にする（*_async を使うこと）。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise DifyError("Sync Dify API called from the event loop. Use the *_async functions instead.")
+
+    loop = _client_loop
+    if _client is not None and loop is not None and loop.is_running():
+        fut = asyncio.run_coroutine_threadsafe(
+            _apost_workflow(inputs, user_id, api_key, endpoint, timeout_sec, workflow=workflow), loop
+        )
+        return fut.result()
+
+    async def standalone() -> str:
+        async with _new_client() as client:
+            return await _apost_workflow(inputs, user_id, api_key, endpoint, timeout_sec, client=client, workflow=workflow)
+
+    return asyncio.run(standalone())
+
+
+# ---------- ★ 非同期ポスト ----------
+async def _apost_workflow(
+    inputs: Dict[str, Any],
+    user_id: str | int,
+    api_key: str,
+    endpoint: str = DIFY_ENDPOINT_RUN,
+    timeout_sec: Optional[float] = None,
+    client: httpx.AsyncClient | None = None,
+    workflow: str = "default",
 ) -> str:
     """
     Dify /workflows/run を叩く共通関数。
     - inputs: Workflowに渡す "inputs" の中身（dict）
     - user_id: 任意のユーザー識別（stringでもintでもOK）
     - api_key: "app-..." で始まる Dify アプリキー
+    - timeout_sec: 読み取りタイムアウトの上書き（None なら workflow の応答時間から決める）
+    - workflow: 応答時間を記録する単位（"question" / "answer" など）
     戻り値: outputs.text（文字列）を返す。存在しなければ DifyError。
     """
     if not api_key:
-        raise DifyError("Missing Dify API key for this workflow. Check .env (DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER).")
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    body = {
-        "inputs": inputs,
-        "response_mode": "blocking",
-        "user": str(user_id),
-    }
+        raise DifyError("Missing Dify API key. Set DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER")
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    body = {"inputs": inputs, "response_mode": "blocking", "user": str(user_id)}
 
-    try:
-        resp = requests.post(endpoint, headers=headers, json=body, timeout=timeout_sec)
-    except requests.RequestException as e:
-        raise DifyError(f"Failed to call Dify endpoint: {e}") from e
+    if client is None:
+        client = await open_client()
+    latency = _latency
+    read_timeout = timeout_sec if timeout_sec is not None else latency.timeout_for(workflow)
+    timeout = httpx.Timeout(read_timeout, connect=DIFY_CONNECT_TIMEOUT_SEC)
 
-    if not (200 <= resp.status_code < 300):
-        # 可能ならエラーボディを載せる
-        detail = None
+    async def send() -> httpx.Response:
+        t = time.monotonic()
         try:
-            detail = resp.json()
-        except Exception:
-            detail = resp.text[:500]
-        raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+            resp = await client.post(endpoint, headers=headers, json=body, timeout=timeout)
+        except httpx.TimeoutException as e:
+            latency.timeouts[workflow] += 1
+            latency.record(workflow, time.monotonic() - t)
+            raise DifyError(f"Dify did not respond within {read_timeout:.1f}s: {e!r}") from e
+        except asyncio.CancelledError:
+            # ヘッジで負けた側も「少なくともこれだけかかった」として残す（遅い側が消えて分布が速く見えないように）
+            latency.record(workflow, time.monotonic() - t)
+            raise
+        except httpx.HTTPError as e:
+            raise DifyError(f"Failed to call Dify endpoint: {e!r}") from e
+
+        if not (200 <= resp.status_code < 300):
+            try:
+                detail = resp.json()
+            except Exception:
+                detail = resp.text[:500]
+            raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+        latency.record(workflow, time.monotonic() - t)
+        return resp
+
+    async with _scheduler.slot(user_id):
+        latency.calls[workflow] += 1
+        hedge_after = latency.hedge_after(workflow) if timeout_sec is None else None
+        if hedge_after is None:
+            resp = await send()
+        else:
+            resp = await _hedged(send, hedge_after, workflow, latency)
 
     try:
         resp_json = resp.json()
@@ -125,43 +662,290 @@ def _post_workflow(
     text = _extract_outputs_text(resp_json)
     if text is None:
         raise DifyError(f"Dify response missing outputs.text. Raw: {json.dumps(resp_json)[:800]}")
-
     return text
 
 
-# ---------- ★ 非同期ポスト ----------
-async def _apost_workflow(
+async def _hedged(send, hedge_after: float, workflow: str, latency: LatencyTracker, discard=None):
+    """
+    send() を1本送り、hedge_after 秒たっても返らなければもう1本送る。先に成功した方を返し、残りは取り消す。
+    2本目はスケジューラの枠を追加で取れたときだけ送り（取れなければ1本目を待つ）、終わったら返す。
+    両方失敗したら後に失敗した方の例外を投げる（ヘッジ前に失敗したらそのまま投げる）。
+    discard があれば、同時に成功して使わなかった方の結果を渡して後始末させる（開いたストリームを閉じるなど）。
+    """
+    first = asyncio.ensure_future(send())
+    pending = {first}
+    extra = False
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+        if not _scheduler.try_extra():
+            return await first  # 混んでいるときにヘッジで同時実行数を超えない
+        extra = True
+        latency.hedges[workflow] += 1
+        second = asyncio.ensure_future(send())
+        pending.add(second)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            ok = [task for task in done if task.exception() is None]
+            if ok:
+                for task in ok[1:]:
+                    if discard is not None:
+                        await discard(task.result())
+                if ok[0] is second:
+                    latency.hedge_wins[workflow] += 1
+                return ok[0].result()
+            error = next(iter(done)).exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if extra:
+            _scheduler.release_extra()
+
+
+async def _sse_events(resp: httpx.Response):
+    """SSE の data: 行を JSON として順に返す（空行・event: 行・ping・壊れた行は読み飛ばす）"""
+    async for line in resp.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        try:
+            yield json.loads(line[5:].strip())
+        except ValueError:
+            continue
+
+
+async def _raise_for_stream_status(resp: httpx.Response):
+    if not (200 <= resp.status_code < 300):
+        raw = (await resp.aread()).decode("utf-8", "replace")
+        try:
+            detail = json.loads(raw)
+        except ValueError:
+            detail = raw[:500]
+        raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+
+
+class _SseStream:
+    """開いた SSE 応答と、読み出し済みの最初のイベント。close() で接続を切る"""
+
+    def __init__(self, stack: contextlib.AsyncExitStack, events, first):
+        self._stack = stack
+        self._events = events
+        self.first = first
+
+    async def events(self):
+        if self.first is not None:
+            yield self.first
+        async for event in self._events:
+            yield event
+
+    async def close(self):
+        await self._stack.aclose()
+
+
+async def _open_sse(client: httpx.AsyncClient, endpoint: str, headers, body, read_timeout: float, workflow: str) -> _SseStream:
+    """
+    ストリームを開いて最初のイベントまで読む。最初のイベントまでの秒数（TTFB）を "<workflow>.ttfb" として記録する。
+    read_timeout は httpx の読み取りタイムアウト（最初のイベントまでの待ちにも、チャンクの間隔にも効く）。
+    """
+    key = f"{workflow}.ttfb"
+    latency = _latency
+    stack = contextlib.AsyncExitStack()
+    t = time.monotonic()
+    try:
+        resp = await stack.enter_async_context(client.stream(
+            "POST", endpoint, headers=headers, json=body,
+            timeout=httpx.Timeout(read_timeout, connect=DIFY_CONNECT_TIMEOUT_SEC),
+        ))
+        await _raise_for_stream_status(resp)
+        events = _sse_events(resp)
+        stack.push_async_callback(events.aclose)
+        first = await anext(events, None)
+    except httpx.TimeoutException as e:
+        latency.timeouts[key] += 1
+        latency.record(key, time.monotonic() - t)
+        await stack.aclose()
+        raise DifyError(f"Dify stream did not start within {read_timeout:.1f}s: {e!r}") from e
+    except asyncio.CancelledError:
+        # ヘッジで負けた側も「少なくともこれだけかかった」として残す
+        latency.record(key, time.monotonic() - t)
+        await stack.aclose()
+        raise
+    except httpx.HTTPError as e:
+        await stack.aclose()
+        raise DifyError(f"Failed to call Dify endpoint: {e!r}") from e
+    except BaseException:
+        await stack.aclose()
+        raise
+    latency.record(key, time.monotonic() - t)
+    return _SseStream(stack, events, first)
+
+
+async def _astream_workflow(
     inputs: Dict[str, Any],
     user_id: str | int,
     api_key: str,
+    on_text=None,
     endpoint: str = DIFY_ENDPOINT_RUN,
-    timeout_sec: int = DEFAULT_TIMEOUT_SEC,
+    timeout_sec: Optional[float] = None,
+    client: httpx.AsyncClient | None = None,
+    workflow: str = "default",
 ) -> str:
+    """
+    /workflows/run を response_mode=streaming で叩き、SSE を読みながら text_chunk を連結する。
+    on_text(累積テキスト) はチャンクを受け取るたびに呼ばれる（コルーチン関数も可）。
+    戻り値は workflow_finished の outputs.text（無ければ連結したテキスト）。
+    読み取りタイムアウトは最初のイベントまでの秒数（"<workflow>.ttfb"）の分布から決め、
+    最初のイベントが p95 を過ぎても来なければもう1本開いて先に始まった方を読む（DIFY_HEDGE=1 のとき）。
+    """
     if not api_key:
         raise DifyError("Missing Dify API key. Set DIFY_API_KEY_QUESTION / DIFY_API_KEY_ANSWER")
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    body = {"inputs": inputs, "response_mode": "blocking", "user": str(user_id)}
+    body = {"inputs": inputs, "response_mode": "streaming", "user": str(user_id)}
 
-    async with httpx.AsyncClient(timeout=timeout_sec) as client:
-        resp = await client.post(endpoint, headers=headers, json=body)
-    if not (200 <= resp.status_code < 300):
-        try:
-            detail = resp.json()
-        except Exception:
-            detail = resp.text[:500]
-        raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+    if client is None:
+        client = await open_client()
+    latency = _latency
+    key = f"{workflow}.ttfb"
+    read_timeout = timeout_sec if timeout_sec is not None else latency.timeout_for(key)
 
-    try:
-        resp_json = resp.json()
-    except ValueError as e:
-        raise DifyError(f"Dify response is not JSON: {resp.text[:500]!r}") from e
+    def open_stream():
+        return _open_sse(client, endpoint, headers, body, read_timeout, workflow)
 
-    text = _extract_outputs_text(resp_json)
-    if text is None:
-        raise DifyError(f"Dify response missing outputs.text. Raw: {json.dumps(resp_json)[:800]}")
+    chunks = []
+    final = None
+    async with _scheduler.slot(user_id):
+        latency.calls[key] += 1
+        hedge_after = latency.hedge_after(key) if timeout_sec is None else None
+        if hedge_after is None:
+            stream = await open_stream()
+        else:
+            stream = await _hedged(open_stream, hedge_after, key, latency, discard=lambda s: s.close())
+        try:
+            async for event in stream.events():
+                kind = event.get("event")
+                data = event.get("data") or {}
+                if kind == "text_chunk":
+                    chunks.append(data.get("text") or "")
+                    if on_text is not None:
+                        r = on_text("".join(chunks))
+                        if asyncio.iscoroutine(r):
+                            await r
+                elif kind == "workflow_finished":
+                    if data.get("status") not in (None, "succeeded"):
+                        raise DifyError(f"Dify workflow {data.get('status')}: {data.get('error')}")
+                    final = _extract_outputs_text({"outputs": data.get("outputs") or {}})
+                    break
+                elif kind == "error":
+                    raise DifyError(f"Dify stream error: {event.get('message') or event}")
+        except httpx.TimeoutException as e:
+            raise DifyError(f"Dify stream stalled for {read_timeout:.1f}s: {e!r}") from e
+        except httpx.HTTPError as e:
+            raise DifyError(f"Failed to call Dify endpoint: {e!r}") from e
+        finally:
+            await stream.close()
+
+    text = final if final is not None else "".join(chunks)
+    if not text:
+        raise DifyError("Dify stream ended without outputs.text")
     return text
 
 
+async def _achat_message(
+    query: str,
+    inputs: Dict[str, Any],
+    user_id: str | int,
+    api_key: str,
+    conversation_id: str = "",
+    on_text=None,
+    endpoint: str = DIFY_ENDPOINT_CHAT,
+    client: httpx.AsyncClient | None = None,
+    workflow: str = "chat",
+) -> tuple[str, str]:
+    """
+    Dify /chat-messages を1ターン叩き、(answer, conversation_id) を返す。
+    - conversation_id が空なら新しい会話を始める（inputs は会話の開始時だけ使われる）
+    - on_text があれば streaming で受け、累積テキストを渡しながら読む
+    会話は user ごとに分かれるので、続きのターンも同じ user_id で呼ぶこと。
+    タイムアウトと応答時間の記録は workflow 版と同じ（blocking は全体、streaming は最初のイベントまで）。
+    1回の送信が会話の1ターンとして残るので、ヘッジ（同じ質問の二重送信）はしない。
+    """
+    if not api_key:
+        raise DifyError("Missing Dify API key. Set DIFY_API_KEY_CHAT")
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    body = {
+        "inputs": inputs,
+        "query": query,
+        "response_mode": "streaming" if on_text is not None else "blocking",
+        "conversation_id": conversation_id or "",
+        "user": str(user_id),
+    }
+    if client is None:
+        client = await open_client()
+    latency = _latency
+
+    async with _scheduler.slot(user_id):
+        try:
+            if on_text is None:
+                latency.calls[workflow] += 1
+                read_timeout = latency.timeout_for(workflow)
+                t = time.monotonic()
+                try:
+                    resp = await client.post(endpoint, headers=headers, json=body,
+                                             timeout=httpx.Timeout(read_timeout, connect=DIFY_CONNECT_TIMEOUT_SEC))
+                except httpx.TimeoutException as e:
+                    latency.timeouts[workflow] += 1
+                    latency.record(workflow, time.monotonic() - t)
+                    raise DifyError(f"Dify did not respond within {read_timeout:.1f}s: {e!r}") from e
+                latency.record(workflow, time.monotonic() - t)
+                if not (200 <= resp.status_code < 300):
+                    try:
+                        detail = resp.json()
+                    except Exception:
+                        detail = resp.text[:500]
+                    raise DifyError(f"Dify returned HTTP {resp.status_code}: {detail}")
+                try:
+                    resp_json = resp.json()
+                except ValueError as e:
+                    raise DifyError(f"Dify response is not JSON: {resp.text[:500]!r}") from e
+                answer, conv = resp_json.get("answer"), resp_json.get("conversation_id")
+            else:
+                chunks, conv = [], None
+                key = f"{workflow}.ttfb"
+                latency.calls[key] += 1
+                read_timeout = latency.timeout_for(key)
+                stream = await _open_sse(client, endpoint, headers, body, read_timeout, workflow)
+                try:
+                    async for event in stream.events():
+                        kind = event.get("event")
+                        conv = event.get("conversation_id") or conv
+                        if kind in ("message", "agent_message"):
+                            chunks.append(event.get("answer") or "")
+                            r = on_text("".join(chunks))
+                            if asyncio.iscoroutine(r):
+                                await r
+                        elif kind == "message_end":
+                            break
+                        elif kind == "error":
+                            raise DifyError(f"Dify stream error: {event.get('message') or event}")
+                finally:
+                    await stream.close()
+                answer = "".join(chunks)
+        except httpx.TimeoutException as e:
+            raise DifyError(f"Dify stream stalled: {e!r}") from e
+        except httpx.HTTPError as e:
+            raise DifyError(f"Failed to call Dify endpoint: {e!r}") from e
+
+    if not isinstance(answer, str) or not answer:
+        raise DifyError("Dify chat response missing answer")
+    if not conv:
+        raise DifyError("Dify chat response missing conversation_id")
+    return answer, conv
+
+
 # ===== Public APIs (Reading) =====
 def run_reading_question(
     *,
@@ -183,7 +967,7 @@ def run_reading_question(
         "word": word,
     }
 
-    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION)
+    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION, workflow="question")
     cleaned = _clean_fenced_json(raw_text)
     try:
         return json.loads(cleaned)
@@ -223,7 +1007,7 @@ def run_reading_answer(
         "question_2_User_Answer": q2_user,
     }
 
-    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER)
+    raw_text = _post_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER, workflow="answer")
     cleaned = _clean_fenced_json(raw_text)
     try:
         return json.loads(cleaned)
@@ -248,7 +1032,53 @@ async def run_reading_question_async(
         "recent_svocm_mistakes": recent_svocm_mistakes or "",
         "word": word or "",
     }
-    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION)
+    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION, workflow="question")
+    cleaned = _clean_fenced_json(raw_text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        logger.warning("Question JSON parse failed. Returning raw text")
+        return {"raw_text": raw_text}
+
+
+async def run_reading_question_stream(
+    *,
+    user_id: int | str,
+    on_passage=None,
+    training_type: str = "reading",
+    current_score: int | float = 50,
+    recent_svocm_mistakes: str = "",
+    word: str = "",
+) -> Dict[str, Any]:
+    """
+    run_reading_question_async のストリーミング版。
+    on_passage(passage_so_far, complete) が本文の伸びるたびに呼ばれる（コルーチン関数も可）。
+    DIFY_STREAMING=0 のときは通常の blocking 呼び出しになる（on_passage は呼ばれない）。
+    """
+    if not DIFY_STREAMING:
+        return await run_reading_question_async(
+            user_id=user_id, training_type=training_type, current_score=current_score,
+            recent_svocm_mistakes=recent_svocm_mistakes, word=word,
+        )
+    inputs = {
+        "user_id": str(user_id),  # ← string必須
+        "training_type": training_type,
+        "current_score": current_score,
+        "recent_svocm_mistakes": recent_svocm_mistakes or "",
+        "word": word or "",
+    }
+    parser = PassageStreamParser()
+    last = [""]
+
+    async def on_text(text: str):
+        passage, complete = parser.feed(text)
+        if on_passage is not None and passage != last[0]:
+            last[0] = passage
+            r = on_passage(passage, complete)
+            if asyncio.iscoroutine(r):
+                await r
+
+    raw_text = await _astream_workflow(inputs, user_id, api_key=DIFY_API_KEY_QUESTION, on_text=on_text, workflow="question")
     cleaned = _clean_fenced_json(raw_text)
     try:
         return json.loads(cleaned)
@@ -257,6 +1087,70 @@ async def run_reading_question_async(
         return {"raw_text": raw_text}
 
 
+def reading_chat_enabled() -> bool:
+    return DIFY_READING_MODE == "chat" and bool(DIFY_API_KEY_CHAT)
+
+
+async def run_reading_question_chat(
+    *,
+    user_id: int | str,
+    on_passage=None,
+    training_type: str = "reading",
+    current_score: int | float = 50,
+    recent_svocm_mistakes: str = "",
+    word: str = "",
+) -> tuple[Dict[str, Any], str]:
+    """
+    会話版の出題ターン。(出題 dict, conversation_id) を返す。
+    チャットアプリは出題ターンで workflow 版と同じ JSON を answer に返す想定。
+    on_passage は run_reading_question_stream と同じ（DIFY_STREAMING=1 のときだけ呼ばれる）。
+    """
+    inputs = {
+        "user_id": str(user_id),
+        "training_type": training_type,
+        "current_score": current_score,
+        "recent_svocm_mistakes": recent_svocm_mistakes or "",
+        "word": word or "",
+    }
+    on_text = None
+    if DIFY_STREAMING and on_passage is not None:
+        parser = PassageStreamParser()
+        last = [""]
+
+        async def on_text(text: str):
+            passage, complete = parser.feed(text)
+            if passage != last[0]:
+                last[0] = passage
+                r = on_passage(passage, complete)
+                if asyncio.iscoroutine(r):
+                    await r
+
+    raw_text, conversation_id = await _achat_message(
+        "question", inputs, user_id, api_key=DIFY_API_KEY_CHAT, on_text=on_text
+    )
+    cleaned = _clean_fenced_json(raw_text)
+    try:
+        return json.loads(cleaned), conversation_id
+    except json.JSONDecodeError:
+        logger.warning("Question JSON parse failed. Returning raw text")
+        return {"raw_text": raw_text}, conversation_id
+
+
+async def run_reading_answer_chat(*, user_id: int | str, conversation_id: str, q1_user: str, q2_user: str) -> Dict[str, Any]:
+    """
+    会話版の採点ターン。本文・設問・正解は会話に残っているので、送るのは解答だけ。
+    チャットアプリは workflow 版の Answer と同じ JSON を answer に返す想定。
+    """
+    query = json.dumps({"question_1_User_Answer": q1_user, "question_2_User_Answer": q2_user})
+    raw_text, _ = await _achat_message(query, {}, user_id, api_key=DIFY_API_KEY_CHAT, conversation_id=conversation_id)
+    cleaned = _clean_fenced_json(raw_text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        logger.warning("Answer JSON parse failed. Returning raw text")
+        return {"raw_text": raw_text}
+
+
 async def run_reading_answer_async(
     *,
     user_id: int | str,
@@ -269,7 +1163,12 @@ async def run_reading_answer_async(
     q2_choices_str: str,
     q2_answer: str,
     q2_user: str,
+    conversation_id: str | None = None,
 ) -> Dict[str, Any]:
+    """
+    読解の採点。conversation_id（会話版で出題したもの）があれば解答だけを送る採点ターンで、
+    無いか失敗したら従来どおり全文を送る workflow で採点する。
+    """
     inputs = {
         "user_id": str(user_id),  # ← string必須
         "Question": passage,
@@ -282,12 +1181,57 @@ async def run_reading_answer_async(
         "question_2_Answer": q2_answer,
         "question_2_User_Answer": q2_user,
     }
-    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER)
-    cleaned = _clean_fenced_json(raw_text)
+
+    async def load() -> Dict[str, Any]:
+        if conversation_id and DIFY_API_KEY_CHAT:
+            try:
+                result = await run_reading_answer_chat(
+                    user_id=user_id, conversation_id=conversation_id, q1_user=q1_user, q2_user=q2_user
+                )
+                if "raw_text" not in result:
+                    return result
+                logger.warning("Chat answer was not JSON. Falling back to the workflow")
+            except DifyUnavailable:
+                raise
+            except DifyError as e:
+                logger.warning(f"Chat answer failed ({e}). Falling back to the workflow")
+        raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_ANSWER, workflow="answer")
+        cleaned = _clean_fenced_json(raw_text)
+        try:
+            return json.loads(cleaned)
+        except json.JSONDecodeError:
+            logger.warning("Answer JSON parse failed. Returning raw text")
+            return {"raw_text": raw_text}
+
+    if _answer_cache is None:
+        return await load()
+    # 同じ本文・設問・解答の組み合わせは採点済みの結果を使う（解析に失敗したものは保存しない）
+    return await _answer_cache.get_or_load("reading_answer", inputs, load, cacheable=lambda r: "raw_text" not in r)
+
+
+def svocm_grading_enabled() -> bool:
+    return bool(DIFY_API_KEY_SVOCM)
+
+
+async def run_svocm_answer_async(*, user_id: int | str, item_id: int, sentence: str, answers: Dict[str, str]) -> Dict[str, Any]:
+    """SVOCM の採点。JSON で返らなければ {"raw_text": ...}"""
+    inputs = {
+        "user_id": str(user_id),
+        "Question": sentence,
+        "Answer_S": answers.get("s", ""),
+        "Answer_V": answers.get("v", ""),
+        "Answer_O1": answers.get("o1", ""),
+        "Answer_O2": answers.get("o2", ""),
+        "Answer_C": answers.get("c", ""),
+        "Answer_M": answers.get("m", ""),
+        "question_id": str(item_id),
+        "training_type": "SVOCM",
+    }
+    raw_text = await _apost_workflow(inputs, user_id, api_key=DIFY_API_KEY_SVOCM, workflow="svocm")
     try:
-        return json.loads(cleaned)
+        return json.loads(_clean_fenced_json(raw_text))
     except json.JSONDecodeError:
-        logger.warning("Answer JSON parse failed. Returning raw text")
+        logger.warning("SVOCM answer JSON parse failed. Returning raw text")
         return {"raw_text": raw_text}
 
 
@@ -301,4 +1245,10 @@ def health_check() -> Dict[str, Any]:
         "endpoint": DIFY_ENDPOINT_RUN,
         "question_key_present": bool(DIFY_API_KEY_QUESTION),
         "answer_key_present": bool(DIFY_API_KEY_ANSWER),
+        "svocm_key_present": bool(DIFY_API_KEY_SVOCM),
+        "reading_mode": "chat" if reading_chat_enabled() else "workflow",
+        "http2": DIFY_HTTP2 and _http2_available(),
+        "adaptive_timeout": DIFY_ADAPTIVE_TIMEOUT,
+        "hedge": DIFY_HEDGE,
+        "client_open": _client is not None and not _client.is_closed,
     }
\ No newline at end of file
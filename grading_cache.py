@@ -0,0 +1,177 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1             # 正規化やワークフローの意味が変わったら上げる（古いキーは使われなくなる）
+IGNORED_KEYS = ("user_id",)   # 採点結果に影響しない入力はキーに含めない
+PURGE_PER_WRITE = 20          # 書き込み1回ごとに消す期限切れ行の上限（書き込みより速く消えるので溜まらない）
+
+GET_SQL = "SELECT result FROM dify_cache WHERE key=$1 AND expires_at > now()"
+# 書き込みのついでに期限切れを少しずつ消す（同じ文なので往復は増えない。他の書き込みが掴んでいる行は飛ばす）
+PUT_SQL = """
+WITH purge AS (
+  DELETE FROM dify_cache
+  WHERE key IN (
+    SELECT key FROM dify_cache
+    WHERE expires_at <= now() AND key <> $1
+    LIMIT $5
+    FOR UPDATE SKIP LOCKED
+  )
+)
+INSERT INTO dify_cache(key, namespace, result, expires_at)
+VALUES($1, $2, $3::jsonb, now() + make_interval(secs => $4))
+ON CONFLICT (key) DO UPDATE
+SET result=EXCLUDED.result, created_at=now(), expires_at=EXCLUDED.expires_at
+"""
+PURGE_SQL = "DELETE FROM dify_cache WHERE expires_at <= now()"
+
+
+def _normalize(v):
+    if isinstance(v, str):
+        return " ".join(unicodedata.normalize("NFC", v).split())
+    if isinstance(v, dict):
+        return {k: _normalize(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_normalize(x) for x in v]
+    return v
+
+
+def cache_key(namespace: str, inputs: dict) -> str:
+    """inputs を正規化（空白の揺れ・Unicode 正規化・キー順）してハッシュにする"""
+    norm = {k: _normalize(v) for k, v in inputs.items() if k not in IGNORED_KEYS}
+    blob = json.dumps([CACHE_VERSION, namespace, norm], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class GradingCache:
+    """
+    Dify の採点結果キャッシュ。キーは正規化した inputs のハッシュ。
+    ・1段目: プロセス内 LRU（max_entries 件、ttl 秒）
+    ・2段目: Postgres の dify_cache（use_pg のとき。ttl で失効。期限切れは起動時と書き込みのたびに消す）
+    ・同じキーの同時リクエストは1回だけ Dify に投げ、他はその結果を待つ（single-flight）。
+      読み込みは別タスクで行うので、最初の呼び出し元が取り消されても他の待ち手には結果が届く
+    """
+
+    def __init__(self, max_entries: int, ttl: float, use_pg: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_pg = use_pg
+        self._lru = collections.OrderedDict()   # key -> (expires, result)
+        self._inflight = {}                     # key -> 読み込み中の Task
+        self.requests = 0
+        self.memory_hits = 0
+        self.pg_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.pg_errors = 0
+        self.load_total_sec = 0.0
+
+    async def start(self):
+        if not self.use_pg:
+            return
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            n = await con.execute(PURGE_SQL)
+        logger.info(f"✅ 採点キャッシュ: 期限切れを削除 ({n})")
+
+    def _get_memory(self, key):
+        hit = self._lru.get(key)
+        if hit is None:
+            return None
+        expires, result = hit
+        if expires <= time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return result
+
+    def _put_memory(self, key, result):
+        self._lru[key] = (time.monotonic() + self.ttl, result)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def _get_pg(self, key):
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                raw = await con.fetchval(GET_SQL, key)
+        except Exception as e:
+            self.pg_errors += 1
+            logger.warning(f"⚠️ 採点キャッシュ(PG)の読み込みに失敗: {e}")
+            return None
+        return None if raw is None else json.loads(raw)
+
+    async def _put_pg(self, key, namespace, result):
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                await con.execute(PUT_SQL, key, namespace, json.dumps(result, ensure_ascii=False), float(self.ttl),
+                                  PURGE_PER_WRITE)
+        except Exception as e:
+            self.pg_errors += 1
+            logger.warning(f"⚠️ 採点キャッシュ(PG)の書き込みに失敗: {e}")
+
+    async def get_or_load(self, namespace: str, inputs: dict, load, cacheable=lambda r: True):
+        """キャッシュにあれば返し、無ければ load() の結果を返す（cacheable(result) が真なら保存）"""
+        self.requests += 1
+        key = cache_key(namespace, inputs)
+
+        result = self._get_memory(key)
+        if result is not None:
+            self.memory_hits += 1
+            return result
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.get_running_loop().create_task(self._load(key, namespace, load, cacheable))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        # 呼び出し元の取り消しは共有の読み込みに伝えない（失敗は待っている全員に同じ例外で返る）
+        return await asyncio.shield(task)
+
+    async def _load(self, key, namespace, load, cacheable):
+        try:
+            result = await self._get_pg(key) if self.use_pg else None
+            if result is not None:
+                self.pg_hits += 1
+                self._put_memory(key, result)
+                return result
+            self.misses += 1
+            t = time.perf_counter()
+            result = await load()
+            self.load_total_sec += time.perf_counter() - t
+            if cacheable(result):
+                self._put_memory(key, result)
+                if self.use_pg:
+                    await self._put_pg(key, namespace, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.pg_hits + self.coalesced
+        avg_load = self.load_total_sec / self.misses if self.misses else 0.0
+        return {
+            "requests": self.requests,
+            "memory_hits": self.memory_hits,
+            "pg_hits": self.pg_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": round(hits / self.requests, 3) if self.requests else 0.0,
+            "entries": len(self._lru),
+            "pg_errors": self.pg_errors,
+            "avg_load_ms": round(avg_load * 1000, 1),
+            # ヒット1件あたり、Dify を呼んだ場合の平均時間を節約したとみなす
+            "saved_sec": round(hits * avg_load, 1),
+        }
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+
+import asyncpg
+
+from config import DATABASE_URL, JOBS_WORKERS, JOBS_POLL_SEC, JOBS_LEASE_SEC, JOBS_BACKOFF_BASE_SEC, JOBS_BACKOFF_MAX_SEC
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+JOBS_CHANNEL = "jobs"
+DEFAULT_MAX_ATTEMPTS = 5
+REAP_INTERVAL_SEC = 30
+
+ENQUEUE_SQL = """
+WITH j AS (
+    INSERT INTO jobs(kind, payload, max_attempts, run_after)
+    VALUES($1, $2::jsonb, $3, now() + make_interval(secs => $4))
+    RETURNING job_id
+)
+SELECT job_id, pg_notify($5, $1) FROM j
+"""
+
+CLAIM_SQL = """
+UPDATE jobs SET status='running', attempts=attempts+1, locked_by=$1, locked_at=now()
+WHERE job_id = (
+    SELECT job_id FROM jobs
+    WHERE status='queued' AND run_after <= now() AND kind = ANY($2::text[])
+    ORDER BY run_after, job_id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING job_id, kind, payload, attempts, max_attempts, created_at
+"""
+
+DONE_SQL = """
+UPDATE jobs SET status='done', result=$2::jsonb, finished_at=now(), locked_by=NULL
+WHERE job_id=$1 AND locked_by=$3
+"""
+
+RETRY_SQL = """
+UPDATE jobs SET status='queued', run_after=now() + make_interval(secs => $2), last_error=$3, locked_by=NULL
+WHERE job_id=$1 AND locked_by=$4
+"""
+
+# 処理せずに手放す（停止時・ハンドラが無いとき）。試行回数は使わなかったことにしてすぐ他の worker に回す
+RELEASE_SQL = """
+UPDATE jobs SET status='queued', run_after=now(), attempts=greatest(attempts - 1, 0), locked_by=NULL
+WHERE job_id=$1 AND locked_by=$2
+"""
+
+FAIL_SQL = """
+UPDATE jobs SET status='failed', last_error=$2, finished_at=now(), locked_by=NULL
+WHERE job_id=$1 AND locked_by=$3
+"""
+
+# 処理中のままリース切れになった（プロセスが落ちた）ジョブを待ち行列に戻す（試行回数が残っているものだけ）
+REAP_SQL = """
+UPDATE jobs SET status='queued', run_after=now(), locked_by=NULL,
+    last_error=coalesce(last_error, '') || '[lease expired on ' || coalesce(locked_by, '?') || ']'
+WHERE status='running' AND locked_at < now() - make_interval(secs => $1)
+  AND attempts < max_attempts
+"""
+
+# 試行回数を使い切ったままリース切れになったジョブは失敗にする。
+# on_failure を呼べるよう、このプロセスにハンドラがある kind だけを扱う（他の kind はそのプロセスの reaper に任せる）
+REAP_FAILED_SQL = """
+UPDATE jobs SET status='failed', finished_at=now(), locked_by=NULL,
+    last_error=coalesce(last_error, '') || '[lease expired on ' || coalesce(locked_by, '?') || ', no attempts left]'
+WHERE status='running' AND locked_at < now() - make_interval(secs => $1)
+  AND attempts >= max_attempts AND kind = ANY($2::text[])
+RETURNING job_id, kind, payload, attempts, last_error
+"""
+
+
+class LeaseExpired(RuntimeError):
+    """最後の試行の途中でリースが切れた（処理していたプロセスが落ちた等）"""
+    pass
+
+
+class JobQueue:
+    """
+    Postgres の jobs テーブルを使った小さなジョブキュー。
+    ・enqueue() は1文で INSERT + NOTIFY する。どのプロセスの worker でも受け取れる
+    ・worker は FOR UPDATE SKIP LOCKED で1件ずつ確保し、登録済みハンドラを実行する
+    ・失敗したら指数バックオフで再試行し、max_attempts 回で諦めて on_failure を呼ぶ
+    ・処理中のまま lease 秒を過ぎたジョブ（プロセスが落ちた等）は待ち行列に戻す。
+      最後の試行でリースが切れたものは失敗にして on_failure（error は LeaseExpired）を呼ぶ
+    ・stop() で中断したジョブは試行回数を戻して待ち行列に返す（リース切れを待たない）
+    配送は少なくとも1回（at-least-once）。ハンドラは再実行されても困らないように書く。
+    """
+
+    def __init__(self, workers: int = JOBS_WORKERS, poll_interval: float = JOBS_POLL_SEC,
+                 lease: float = JOBS_LEASE_SEC, worker_id: str | None = None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers = {}   # kind -> (handler, on_failure, max_attempts)
+        self._tasks = []
+        self._wake = asyncio.Event()
+        self._listen_con = None
+        self._closed = False
+        self.stats_counters = {"enqueued": 0, "done": 0, "retried": 0, "failed": 0, "running": 0}
+        self.wait_total_sec = 0.0
+        self.run_total_sec = 0.0
+
+    def register(self, kind: str, handler, on_failure=None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """handler(payload) -> dict|None、on_failure(payload, error) は最後の試行も失敗したときに呼ぶ"""
+        self._handlers[kind] = (handler, on_failure, max_attempts)
+
+    def unregister(self, kind: str):
+        self._handlers.pop(kind, None)
+
+    async def enqueue(self, kind: str, payload: dict, max_attempts: int | None = None, delay: float = 0.0) -> int:
+        if max_attempts is None:
+            entry = self._handlers.get(kind)
+            max_attempts = entry[2] if entry else DEFAULT_MAX_ATTEMPTS
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            row = await con.fetchrow(ENQUEUE_SQL, kind, json.dumps(payload, ensure_ascii=False),
+                                     max_attempts, float(delay), JOBS_CHANNEL)
+        self.stats_counters["enqueued"] += 1
+        return row["job_id"]
+
+    # ---------- worker ----------
+    async def start(self):
+        if self.workers <= 0 or not self._handlers:
+            logger.info("ℹ️ ジョブ worker は起動しません（enqueue のみ）")
+            return
+        try:
+            self._listen_con = await asyncpg.connect(DATABASE_URL)
+            await self._listen_con.add_listener(JOBS_CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning(f"⚠️ jobs の通知購読に失敗（{self.poll_interval}s ごとのポーリングで動作）: {e}")
+            self._listen_con = None
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(n)) for n in range(self.workers)]
+        self._tasks.append(loop.create_task(self._reaper()))
+        logger.info(f"✅ ジョブ worker 起動: {self.worker_id} x{self.workers} ({', '.join(sorted(self._handlers))})")
+
+    async def stop(self):
+        self._closed = True
+        self._wake.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._listen_con is not None:
+            await self._listen_con.close()
+            self._listen_con = None
+
+    def _on_notify(self, con, pid, channel, payload):
+        if payload in self._handlers:
+            self._wake.set()
+
+    async def _claim(self):
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            return await con.fetchrow(CLAIM_SQL, self.worker_id, list(self._handlers))
+
+    async def _worker(self, n: int):
+        while not self._closed:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ ジョブの取得に失敗: {e}")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        entry = self._handlers.get(job["kind"])
+        if entry is None:
+            # 確保した直後にハンドラが外された（Cog の再読み込み等）→ 試行回数を使わずにそのまま戻す
+            await self._release(job)
+            return
+        handler, on_failure, _ = entry
+        payload = json.loads(job["payload"])
+        self.stats_counters["running"] += 1
+        self.wait_total_sec += max(time.time() - job["created_at"].timestamp(), 0.0)
+        t = time.perf_counter()
+        try:
+            result = await handler(payload)
+        except asyncio.CancelledError:
+            # 停止時（デプロイ等）は試行回数を戻して手放し、リース切れを待たずに他の worker が拾い直せるようにする
+            await self._release(job)
+            raise
+        except Exception as e:
+            await self._on_error(job, payload, on_failure, e)
+        else:
+            self.stats_counters["done"] += 1
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                await con.execute(DONE_SQL, job["job_id"], json.dumps(result, ensure_ascii=False), self.worker_id)
+        finally:
+            self.stats_counters["running"] -= 1
+            self.run_total_sec += time.perf_counter() - t
+
+    async def _release(self, job):
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                await con.execute(RELEASE_SQL, job["job_id"], self.worker_id)
+        except Exception as e:
+            logger.warning(f"⚠️ ジョブ {job['job_id']} を戻せませんでした（リース切れで回収されます）: {e}")
+
+    async def _on_error(self, job, payload, on_failure, e: Exception):
+        err = f"{type(e).__name__}: {e}"[:2000]
+        pool = await get_pool()
+        if job["attempts"] < job["max_attempts"]:
+            delay = min(JOBS_BACKOFF_BASE_SEC * 2 ** (job["attempts"] - 1), JOBS_BACKOFF_MAX_SEC)
+            delay *= 1 + random.random() * 0.2
+            self.stats_counters["retried"] += 1
+            logger.warning(f"⚠️ ジョブ {job['job_id']} ({job['kind']}) 失敗 {job['attempts']}/{job['max_attempts']}、{delay:.1f}s 後に再試行: {err}")
+            async with pool.acquire() as con:
+                await con.execute(RETRY_SQL, job["job_id"], delay, err, self.worker_id)
+            return
+        self.stats_counters["failed"] += 1
+        logger.error(f"❌ ジョブ {job['job_id']} ({job['kind']}) を諦めました: {err}")
+        async with pool.acquire() as con:
+            await con.execute(FAIL_SQL, job["job_id"], err, self.worker_id)
+        if on_failure is not None:
+            try:
+                await on_failure(payload, e)
+            except Exception:
+                logger.exception(f"⚠️ ジョブ {job['job_id']} の失敗通知でエラー")
+
+    async def _reaper(self):
+        while not self._closed:
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as con:
+                    n = await con.execute(REAP_SQL, float(self.lease))
+                    failed = await con.fetch(REAP_FAILED_SQL, float(self.lease), list(self._handlers))
+                if n != "UPDATE 0":
+                    logger.warning(f"⚠️ リース切れのジョブを戻しました ({n})")
+                    self._wake.set()
+                for job in failed:
+                    await self._on_lease_exhausted(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ リース切れジョブの回収に失敗: {e}")
+            await asyncio.sleep(min(REAP_INTERVAL_SEC, self.lease / 2))
+
+    async def _on_lease_exhausted(self, job):
+        self.stats_counters["failed"] += 1
+        logger.error(f"❌ ジョブ {job['job_id']} ({job['kind']}) は最後の試行中にリースが切れたため諦めました")
+        entry = self._handlers.get(job["kind"])
+        on_failure = entry[1] if entry else None
+        if on_failure is None:
+            return
+        try:
+            await on_failure(json.loads(job["payload"]), LeaseExpired(job["last_error"]))
+        except Exception:
+            logger.exception(f"⚠️ ジョブ {job['job_id']} の失敗通知でエラー")
+
+    def stats(self) -> dict:
+        c = self.stats_counters
+        finished = c["done"] + c["retried"] + c["failed"]
+        return {
+            **c,
+            "worker_id": self.worker_id,
+            "workers": self.workers if self._tasks else 0,
+            "kinds": sorted(self._handlers),
+            "avg_wait_ms": round(self.wait_total_sec / finished * 1000, 1) if finished else 0.0,
+            "avg_run_ms": round(self.run_total_sec / finished * 1000, 1) if finished else 0.0,
+        }
@@ -11,10 +11,17 @@ except ImportError:
     print("❌ discord.py がインストールされていません。`pip install -r requirements.txt` を実行してください。")
     sys.exit(1)
 
-from config import DISCORD_TOKEN
-from db import init_db
+from config import DISCORD_TOKEN, SESSION_SECRET, GRADING_CACHE_SIZE, GRADING_CACHE_TTL_SEC, GRADING_CACHE_PG
+from db import init_db, get_pool
+from catalog import get_catalog, listen_for_changes, stop_listening, start_version_poll, stop_version_poll
+from svocm_index import get_svocm_index, listen_for_changes as listen_for_svocm_changes
 from utils import info_embed
 from cogs.menu import MenuView
+from router import InteractionRouter
+import dify
+from grading_cache import GradingCache
+from jobs import JobQueue
+from outbound import get_outbound
 
 # --- ログ設定 ---
 logging.basicConfig(level=logging.INFO)
@@ -26,12 +33,39 @@ intents.members = True
 
 class WinglishBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents, help_command=None)
+        # REST 応答のレート制限ヘッダを送信キューのペース配分に使う
+        super().__init__(command_prefix="!", intents=intents, help_command=None,
+                         http_trace=get_outbound().trace_config())
+        # ボタン/モーダルの振り分け先（各 Cog が cog_load で登録する）
+        self.router = InteractionRouter()
+        # Dify を呼ぶ出題・採点のジョブキュー（各 Cog が cog_load でハンドラを登録する）
+        self.jobs = JobQueue()
 
     async def setup_hook(self) -> None:
         await init_db()
         logger.info("✅ データベース初期化完了")
 
+        await dify.open_client()
+        logger.info(f"✅ Dify クライアント準備完了: {dify.health_check()}")
+        cache = GradingCache(GRADING_CACHE_SIZE, GRADING_CACHE_TTL_SEC, use_pg=GRADING_CACHE_PG)
+        try:
+            await cache.start()
+        except Exception as e:
+            logger.error(f"❌ 採点キャッシュ(PG)の準備に失敗（メモリのみで動作します）: {e}")
+            cache.use_pg = False
+        dify.set_answer_cache(cache)
+
+        pool = await get_pool()
+        await get_catalog(pool)
+        await get_svocm_index(pool)
+        try:
+            # svocm は登録だけ先に済ませ、words の購読で張る専用接続にまとめて LISTEN する
+            await listen_for_svocm_changes(pool)
+            await listen_for_changes(pool)
+        except Exception as e:
+            logger.error(f"❌ words / svocm_items 更新通知の購読に失敗（接続は張り直し続けます）: {e}")
+        start_version_poll(pool)
+
         cogs = ["cogs.onboarding", "cogs.menu", "cogs.vocab", "cogs.svocm", "cogs.reading", "cogs.admin"]
         for cog in cogs:
             try:
@@ -40,6 +74,11 @@ class WinglishBot(commands.Bot):
             except Exception as e:
                 logger.error(f"❌ Cog 読み込み失敗: {cog} - {e}")
 
+        try:
+            await self.jobs.start()
+        except Exception as e:
+            logger.error(f"❌ ジョブ worker の起動に失敗: {e}")
+
         self.add_view(MenuView())
         logger.info("✅ 永続 View 登録完了")
         
@@ -57,9 +96,19 @@ class WinglishBot(commands.Bot):
         except Exception as e:
             logger.error(f"❌ スラッシュコマンド同期失敗: {e}")
 
+    async def close(self) -> None:
+        stop_version_poll()
+        await stop_listening()
+        await self.jobs.stop()
+        await dify.close_client()
+        await super().close()
+
     async def on_ready(self) -> None:
         logger.info(f"✅ Logged in as {self.user} ({self.user.id})")
 
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        await self.router.dispatch(interaction)
+
     async def on_error(self, event_method: str, *args: Any, **kwargs: Any) -> None:
         logger.exception(f"⚠️ イベントエラー ({event_method})")
 
@@ -76,6 +125,9 @@ if __name__ == "__main__":
     if not DISCORD_TOKEN or DISCORD_TOKEN == "YOUR_BOT_TOKEN":
         logger.critical("❌ DISCORD_TOKEN が .env に設定されていません。")
         sys.exit(1)
+    if not SESSION_SECRET:
+        logger.critical("❌ SESSION_SECRET が .env に設定されていません（ボタンの署名鍵。ランダムな長い文字列を設定してください）。")
+        sys.exit(1)
 
     try:
         bot.run(DISCORD_TOKEN)
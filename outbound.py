@@ -0,0 +1,380 @@
+import asyncio
+import collections
+import logging
+import re
+import time
+
+import aiohttp
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord のメッセージ送信/編集の目安（5回 / 5秒）。
+# 応答の X-RateLimit-* ヘッダを見てからはそちらに従い、この値はヘッダを見る前（起動直後など）だけ使う
+CHANNEL_RATE = 5
+CHANNEL_PER_SEC = 5.0
+# このキューが呼ぶルート（discord.py の Route.key と同じ "METHOD /path" 形式）と、
+# 応答の URL からルートと major parameter（チャンネル ID / webhook ID + トークン）を取り出す正規表現。
+# typing や GET など他のルートは Discord 側でも別のバケツなので、ヘッダを見ても反映しない
+SEND_ROUTE = "POST /channels/{channel_id}/messages"
+EDIT_ROUTE = "PATCH /channels/{channel_id}/messages/{message_id}"
+WEBHOOK_EDIT_ROUTE = "PATCH /webhooks/{webhook_id}/{webhook_token}/messages/{message_id}"
+_ROUTES = (
+    ("POST", re.compile(r"/channels/(\d+)/messages$"), SEND_ROUTE),
+    ("PATCH", re.compile(r"/channels/(\d+)/messages/\d+$"), EDIT_ROUTE),
+    ("PATCH", re.compile(r"/webhooks/(\d+/[^/]+)/messages/[^/]+$"), WEBHOOK_EDIT_ROUTE),
+)
+SWEEP_BUCKETS = 256   # バケツがこの数を超えたら、使い終わったもの（インタラクションごとの webhook 等）を捨てる
+MAX_RETRY_WAIT_SEC = 30.0  # 429 で待つ合計の上限（超えたら呼び出し元へ例外を返す）
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+class _Bucket:
+    """
+    レート制限バケツ1つ分（X-RateLimit-Bucket + major parameter ごと）の制御。
+    ・X-RateLimit-Remaining / Reset-After を見たあとは、リセットまで残り回数の分だけ通す
+    ・まだヘッダを見ていない（またはリセットを過ぎた）ときは直近 per 秒の送信回数で抑える
+    ・429 の Retry-After と、残り 0 のヘッダはリセットまで止める
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.sent = collections.deque()
+        self.blocked_until = 0.0
+        self.remaining = None   # ヘッダで知った残り回数（None は不明）
+        self.reset_at = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            while self.sent and now - self.sent[0] >= self.per:
+                self.sent.popleft()
+            wait = self.blocked_until - now
+            if self.remaining is not None and now < self.reset_at:
+                if self.remaining <= 0:
+                    wait = max(wait, self.reset_at - now)
+                elif wait <= 0:
+                    self.remaining -= 1
+                    self.sent.append(now)
+                    return
+            elif len(self.sent) >= self.rate:
+                wait = max(wait, self.per - (now - self.sent[0]))
+            if wait <= 0:
+                self.sent.append(now)
+                return
+            await asyncio.sleep(wait)
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def idle(self, now: float) -> bool:
+        """待っている制限が無く、直近 per 秒に送っていない（捨てて作り直しても同じ）"""
+        return (now >= self.blocked_until and now >= self.reset_at
+                and (not self.sent or now - self.sent[-1] >= self.per))
+
+    def observe(self, remaining: int, reset_after: float):
+        """応答ヘッダの残り回数とリセットまでの秒数を反映する"""
+        self.remaining = remaining
+        self.reset_at = time.monotonic() + reset_after
+        if remaining <= 0:
+            self.block(reset_after)
+
+
+class _PendingEdit:
+    __slots__ = ("fn", "kwargs", "futures")
+
+    def __init__(self, fn, kwargs, fut):
+        self.fn = fn
+        self.kwargs = _normalize_embeds(kwargs)
+        self.futures = [fut]
+
+    def absorb(self, newer: "_PendingEdit"):
+        """後から来た編集で上書き（同じキーは新しい方が勝つ。embed は embeds に揃えてあるので両方が残ることはない）"""
+        self.fn = newer.fn
+        self.kwargs.update(newer.kwargs)
+        self.futures.extend(newer.futures)
+
+
+def _normalize_embeds(kwargs) -> dict:
+    """embed= を embeds= に揃える（embed=None は「Embed を消す」なので embeds=[]）"""
+    kwargs = dict(kwargs)
+    if "embed" in kwargs:
+        embed = kwargs.pop("embed")
+        kwargs["embeds"] = [embed] if embed is not None else []
+    return kwargs
+
+
+def _float(v, default: float) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def message_route(channel_id, edit: bool = False) -> tuple:
+    """channel.send / message.edit が使うバケツの (ルート, major parameter)"""
+    return (EDIT_ROUTE if edit else SEND_ROUTE, str(channel_id))
+
+
+def interaction_route(interaction) -> tuple:
+    """interaction.edit_original_response が使うバケツの (ルート, major parameter)"""
+    return (WEBHOOK_EDIT_ROUTE, f"{interaction.application_id}/{interaction.token}")
+
+
+def _parse_route(method: str, path: str):
+    for m, pattern, route in _ROUTES:
+        if method == m:
+            hit = pattern.search(path)
+            if hit is not None:
+                return route, hit.group(1)
+    return None
+
+
+def _retry_after(e: Exception):
+    """429 なら待ち秒数、それ以外は None"""
+    if isinstance(e, discord.RateLimited):
+        return e.retry_after
+    if isinstance(e, discord.HTTPException) and e.status == 429:
+        headers = getattr(e.response, "headers", None) or {}
+        try:
+            return float(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or 1.0)
+        except (TypeError, ValueError):
+            return 1.0
+    return None
+
+
+def _settle(futures, result=None, exc=None):
+    for f in futures:
+        if f.done():
+            continue
+        if exc is not None:
+            f.set_exception(exc)
+        else:
+            f.set_result(result)
+
+
+def _embeds_of(kwargs) -> list:
+    if "embeds" in kwargs:
+        return list(kwargs["embeds"] or [])
+    return [kwargs["embed"]] if kwargs.get("embed") is not None else []
+
+
+class OutboundQueue:
+    """
+    メッセージ編集・送信の出口。
+    ・同じメッセージへの編集はキューに1つだけ持ち、未送信のうちに来た編集で上書きする（最後の1回だけ送る）
+    ・同じチャンネルへの Embed だけの送信は、続く送信とまとめて1通にする（merge=False の送信はまとめない）
+    ・レート制限のバケツごとに送信ペースを抑える。バケツは discord.py と同じく、ルートから
+      X-RateLimit-Bucket のハッシュを引き、major parameter（チャンネル / webhook）と組にして区別する。
+      trace_config() を Bot の http_trace に渡すと、discord.py が受けた送信・編集の応答の
+      X-RateLimit-* ヘッダ（discord.py が内部で再試行した 429 も含む）でペースを決める
+    ・それでも 429 が返ってきたら Retry-After だけ待って再送する
+    """
+
+    def __init__(self, rate: int = CHANNEL_RATE, per: float = CHANNEL_PER_SEC):
+        self.rate = rate
+        self.per = per
+        self._buckets = {}        # (バケツのハッシュ or ルート, major) -> _Bucket
+        self._bucket_hashes = {}  # ルート -> X-RateLimit-Bucket
+        self._edits = {}          # key -> _PendingEdit
+        self._edit_tasks = {}     # key -> Task
+        self._sends = {}          # channel_id -> deque[(channel, kwargs, future, merge)]
+        self._send_tasks = {}     # channel_id -> Task
+        self.stats = {"edits": 0, "edits_superseded": 0, "sends": 0, "sends_batched": 0, "rate_limited": 0}
+
+    def _bucket(self, route: tuple) -> _Bucket:
+        name, major = route
+        key = (self._bucket_hashes.get(name, name), major)
+        b = self._buckets.get(key)
+        if b is None:
+            if len(self._buckets) >= SWEEP_BUCKETS:
+                now = time.monotonic()
+                for k in [k for k, v in self._buckets.items() if v.idle(now)]:
+                    del self._buckets[k]
+            b = self._buckets[key] = _Bucket(self.rate, self.per)
+        return b
+
+    # ---------- 応答ヘッダ ----------
+    def observe_response(self, method: str, path: str, status: int, headers):
+        """REST 応答1件のレート制限ヘッダを、そのルートのバケツに反映する（このキューが使わないルートは無視）"""
+        if headers.get("X-RateLimit-Global") and status == 429:
+            delay = _float(headers.get("Retry-After"), 1.0)
+            for b in self._buckets.values():
+                b.block(delay)
+            self.stats["rate_limited"] += 1
+            return
+        parsed = _parse_route(method, path)
+        if parsed is None:
+            return
+        name, major = parsed
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is not None and self._bucket_hashes.get(name) != bucket_hash:
+            # ハッシュを初めて知った（または変わった）: ルート名で持っていた状態をハッシュの側へ移す
+            old = self._buckets.pop((self._bucket_hashes.get(name, name), major), None)
+            self._bucket_hashes[name] = bucket_hash
+            if old is not None:
+                self._buckets.setdefault((bucket_hash, major), old)
+        bucket = self._bucket(parsed)
+        if status == 429:
+            self.stats["rate_limited"] += 1
+            bucket.block(_float(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After"), 1.0))
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None:
+            bucket.observe(int(_float(remaining, 0)), _float(reset_after, 1.0))
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """discord.Client(http_trace=...) に渡す。すべての REST 応答のヘッダを observe_response に流す"""
+        tc = aiohttp.TraceConfig()
+
+        async def on_request_end(session, ctx, params):
+            self.observe_response(params.method, params.url.path, params.response.status, params.response.headers)
+
+        tc.on_request_end.append(on_request_end)
+        return tc
+
+    async def _call(self, route: tuple, fn, kwargs, refresh=None):
+        """レート制御付きで1回呼ぶ。429 の間に新しい内容が来ていれば refresh() で差し替える"""
+        waited = 0.0
+        while True:
+            bucket = self._bucket(route)  # ヘッダでハッシュを知るとバケツが替わるので毎回引く
+            await bucket.acquire()
+            try:
+                return await fn(**kwargs)
+            except Exception as e:
+                delay = _retry_after(e)
+                if delay is None or waited + delay > MAX_RETRY_WAIT_SEC:
+                    raise
+                waited += delay
+                self.stats["rate_limited"] += 1
+                bucket.block(delay)
+                logger.warning(f"⏳ 429 Too Many Requests: {delay:.2f}s 待って再送します")
+                await asyncio.sleep(delay)
+                if refresh is not None:
+                    fn, kwargs = refresh(fn, kwargs)
+
+    # ---------- 編集 ----------
+    async def edit(self, key, route: tuple, fn, **kwargs):
+        """
+        fn(**kwargs) でメッセージを編集する。key（例: ("msg", message.id)）が同じ編集は
+        送信前なら1回にまとまり、呼び出し元には実際に送った編集の結果が返る。
+        route は fn が使うバケツ（message_route(channel_id, edit=True) / interaction_route(interaction)）
+        """
+        fut = asyncio.get_running_loop().create_future()
+        pending = _PendingEdit(fn, kwargs, fut)
+        current = self._edits.get(key)
+        if current is not None:
+            current.absorb(pending)
+            self.stats["edits_superseded"] += 1
+        else:
+            self._edits[key] = pending
+        if key not in self._edit_tasks:
+            self._edit_tasks[key] = asyncio.get_running_loop().create_task(self._run_edits(key, route))
+        return await fut
+
+    async def _run_edits(self, key, route):
+        try:
+            while key in self._edits:
+                p = self._edits.pop(key)
+
+                def refresh(fn, kwargs, p=p):
+                    newer = self._edits.pop(key, None)
+                    if newer is None:
+                        return fn, kwargs
+                    p.absorb(newer)
+                    self.stats["edits_superseded"] += 1
+                    return p.fn, p.kwargs
+
+                try:
+                    result = await self._call(route, p.fn, p.kwargs, refresh)
+                except Exception as e:
+                    _settle(p.futures, exc=e)
+                else:
+                    self.stats["edits"] += 1
+                    _settle(p.futures, result)
+        finally:
+            self._edit_tasks.pop(key, None)
+
+    # ---------- 送信 ----------
+    def send_nowait(self, channel, merge: bool = True, **kwargs) -> asyncio.Future:
+        """
+        channel.send をキューに積む（結果は Future）。直後の送信とまとめて1通になることがある。
+        あとで embed= で編集するメッセージは merge=False にする（まとめた他の Embed を消してしまうため）
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        q = self._sends.setdefault(channel.id, collections.deque())
+        q.append((channel, kwargs, fut, merge))
+        if channel.id not in self._send_tasks:
+            self._send_tasks[channel.id] = loop.create_task(self._run_sends(channel.id))
+        return fut
+
+    async def send(self, channel, merge: bool = True, **kwargs):
+        return await self.send_nowait(channel, merge, **kwargs)
+
+    @staticmethod
+    def _mergeable(entry, last: bool) -> bool:
+        _, kwargs, _, merge = entry
+        allowed = {"embed", "embeds", "view"} if last else {"embed", "embeds"}
+        return merge and bool(kwargs) and set(kwargs) <= allowed
+
+    def _take_batch(self, q):
+        first = q.popleft()
+        batch = [first]
+        if not self._mergeable(first, last=False):
+            return batch, first[1]
+        embeds = _embeds_of(first[1])
+        chars = sum(len(e) for e in embeds)
+        while q:
+            nxt = q[0]
+            if not self._mergeable(nxt, last=True):
+                break
+            more = _embeds_of(nxt[1])
+            if len(embeds) + len(more) > MAX_EMBEDS or chars + sum(len(e) for e in more) > MAX_EMBED_CHARS:
+                break
+            q.popleft()
+            batch.append(nxt)
+            embeds += more
+            chars += sum(len(e) for e in more)
+            if "view" in nxt[1]:
+                break  # View 付きはまとめの最後にしか置けない
+        if len(batch) == 1:
+            return batch, first[1]
+        kwargs = {"embeds": embeds}
+        if "view" in batch[-1][1]:
+            kwargs["view"] = batch[-1][1]["view"]
+        self.stats["sends_batched"] += len(batch) - 1
+        return batch, kwargs
+
+    async def _run_sends(self, channel_id):
+        route = message_route(channel_id)
+        q = self._sends.get(channel_id)
+        try:
+            while q:
+                batch, kwargs = self._take_batch(q)
+                channel = batch[0][0]
+                futures = [f for _, _, f, _ in batch]
+                try:
+                    msg = await self._call(route, channel.send, kwargs)
+                except Exception as e:
+                    _settle(futures, exc=e)
+                else:
+                    self.stats["sends"] += 1
+                    _settle(futures, msg)
+        finally:
+            self._send_tasks.pop(channel_id, None)
+            if not q:
+                self._sends.pop(channel_id, None)
+
+
+_outbound = None
+
+
+def get_outbound() -> OutboundQueue:
+    global _outbound
+    if _outbound is None:
+        _outbound = OutboundQueue()
+    return _outbound
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+POOL_SOURCE = "pool"
+REFILL_RETRY_SEC = 30   # 生成に失敗したときの再試行までの待ち
+
+POP_SQL = """
+UPDATE reading_items SET consumed_at = now()
+WHERE item_id = (
+    SELECT item_id FROM reading_items
+    WHERE source = 'pool' AND skill_tag = $1 AND level = $2 AND consumed_at IS NULL
+    ORDER BY item_id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING item_id, passage_en, questions, answer_key
+"""
+
+COUNT_SQL = """
+SELECT skill_tag, level, COUNT(*) AS n
+FROM reading_items
+WHERE source = 'pool' AND consumed_at IS NULL
+GROUP BY skill_tag, level
+"""
+
+
+class ReadingPool:
+    """
+    長文読解の作り置きプール。reading_items に source='pool' で未使用の問題を貯めておき、
+    出題時は1文（SKIP LOCKED）で取り出す。(kind, level) ごとに残りが low_water を下回ったら
+    バックグラウンドで target 件まで補充する。
+    - generate(kind, level) -> item        : 問題を1問生成する（Dify）
+    - store(item, kind, level, source) -> item_id : reading_items に保存する
+    """
+
+    def __init__(self, generate, store, target: int, low_water: int, concurrency: int = 1):
+        self.generate = generate
+        self.store = store
+        self.target = target
+        self.low_water = low_water
+        self._ready = {}      # (kind, level) -> 未使用の件数（このプロセスから見た概算）
+        self._tasks = {}      # (kind, level) -> 補充タスク
+        self._sem = asyncio.Semaphore(concurrency)
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.refill_total_sec = 0.0
+        self.refill_max_sec = 0.0
+
+    async def start(self, keys=()):
+        """DB 上の残数を読み込み、keys（と既存の (kind, level)）を low_water 以上に保つ"""
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            rows = await con.fetch(COUNT_SQL)
+        for r in rows:
+            self._ready[(r["skill_tag"], r["level"])] = r["n"]
+        for key in keys:
+            self._ready.setdefault(key, 0)
+        for key in list(self._ready):
+            self._maybe_refill(key)
+
+    async def stop(self):
+        self._closed = True
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def ready(self, kind: str, level: str) -> int:
+        return self._ready.get((kind, level), 0)
+
+    async def pop(self, kind: str, level: str):
+        """未使用の問題を1つ確保して行を返す（無ければ None）。どちらの場合も必要なら補充を始める"""
+        key = (kind, level)
+        row = None
+        if self._ready.get(key, 0) > 0:
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                row = await con.fetchrow(POP_SQL, kind, level)
+        if row is None:
+            self.misses += 1
+            self._ready[key] = 0  # 他プロセスが使い切った場合もここで揃う
+        else:
+            self.hits += 1
+            self._ready[key] = max(self._ready.get(key, 1) - 1, 0)
+        self._maybe_refill(key)
+        return row
+
+    def _maybe_refill(self, key):
+        if self._closed or key in self._tasks or self._ready.get(key, 0) >= self.low_water:
+            return
+        task = asyncio.get_running_loop().create_task(self._refill(key))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    async def _refill(self, key):
+        kind, level = key
+        while not self._closed and self._ready.get(key, 0) < self.target:
+            async with self._sem:
+                t = time.perf_counter()
+                try:
+                    item = await self.generate(kind, level)
+                    await self.store(item, kind, level, POOL_SOURCE)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.refill_failures += 1
+                    logger.warning(f"⚠️ 読解プールの補充に失敗 {key}: {e}")
+                    await asyncio.sleep(REFILL_RETRY_SEC)
+                    continue
+                dt = time.perf_counter() - t
+            self.refills += 1
+            self.refill_total_sec += dt
+            self.refill_max_sec = max(self.refill_max_sec, dt)
+            self._ready[key] = self._ready.get(key, 0) + 1
+
+    def stats(self) -> dict:
+        served = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / served, 3) if served else 0.0,
+            "ready": {f"{k}/{lv}": n for (k, lv), n in sorted(self._ready.items())},
+            "refilling": sorted(f"{k}/{lv}" for k, lv in self._tasks),
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "refill_avg_ms": round(self.refill_total_sec / self.refills * 1000, 1) if self.refills else 0.0,
+            "refill_max_ms": round(self.refill_max_sec * 1000, 1),
+        }
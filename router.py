@@ -0,0 +1,90 @@
+import logging
+import time
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+SLOW_HANDLER_SEC = 2.5  # これを超えたら警告ログ（Discordの初回応答期限は3秒）
+
+
+class RouteStats:
+    __slots__ = ("count", "errors", "total_sec", "max_sec")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+
+    def as_dict(self) -> dict:
+        avg = self.total_sec / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(avg * 1000, 1),
+            "max_ms": round(self.max_sec * 1000, 1),
+        }
+
+
+class InteractionRouter:
+    """
+    コンポーネント（ボタン等）とモーダル送信の custom_id を、登録済みハンドラへ1回で振り分ける。
+    キーは custom_id そのもの（"vocab:ten"）か、":" 区切りの前方一致（"vocab:k" → "vocab:k:<token>"）。
+    ハンドラは handler(interaction, custom_id) を返すコルーチン関数。
+    """
+
+    TYPES = (discord.InteractionType.component, discord.InteractionType.modal_submit)
+
+    def __init__(self):
+        self._routes = {}   # key -> (handler, owner)
+        self._stats = {}    # key -> RouteStats
+
+    def register(self, key: str, handler, owner=None):
+        if key in self._routes and self._routes[key][1] is not owner:
+            raise ValueError(f"route already registered: {key}")
+        self._routes[key] = (handler, owner)
+        self._stats.setdefault(key, RouteStats())
+
+    def unregister_owner(self, owner):
+        """Cog のアンロード時に、その Cog が登録したルートをまとめて外す"""
+        for key in [k for k, (_, o) in self._routes.items() if o is owner]:
+            del self._routes[key]
+
+    def resolve(self, custom_id: str):
+        """完全一致 → 末尾の ":..." を1段ずつ外した前方一致、の順に探す"""
+        key = custom_id
+        while True:
+            route = self._routes.get(key)
+            if route is not None:
+                return key, route[0]
+            if ":" not in key:
+                return None, None
+            key = key.rsplit(":", 1)[0]
+
+    async def dispatch(self, interaction: discord.Interaction) -> bool:
+        if interaction.type not in self.TYPES:
+            return False
+        cid = (interaction.data or {}).get("custom_id", "")
+        key, handler = self.resolve(cid)
+        if handler is None:
+            return False  # 永続View（メインメニュー等）のコールバックに任せる
+
+        st = self._stats[key]
+        t = time.perf_counter()
+        try:
+            await handler(interaction, cid)
+        except Exception:
+            st.errors += 1
+            logger.exception(f"⚠️ インタラクション処理エラー ({key})")
+        finally:
+            dt = time.perf_counter() - t
+            st.count += 1
+            st.total_sec += dt
+            st.max_sec = max(st.max_sec, dt)
+            if dt > SLOW_HANDLER_SEC:
+                logger.warning(f"🐢 遅いハンドラ {key}: {dt:.2f}s")
+        return True
+
+    def stats(self) -> dict:
+        return {k: st.as_dict() for k, st in sorted(self._stats.items()) if st.count}
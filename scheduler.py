@@ -0,0 +1,148 @@
+import asyncio
+import datetime
+import logging
+import time
+
+from db import get_pool
+from catalog import get_catalog
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10
+PREFETCH_TTL_SEC = 600  # 先読みバッチの有効期限（復習期限のずれを抑える）
+PREFETCH_MAX = 10_000   # 先読みを持っておく人数の上限（戻ってこない人の分で膨らまないように）
+
+# 1往復で「今日が期限の復習語」と「候補のうち既出の語」を取る。
+# どちらも (user_id, next_review) / (user_id, word_id) の索引範囲だけを読む形にしている。
+BATCH_SQL = """
+SELECT word_id, true AS due
+FROM (
+  SELECT word_id FROM srs_state
+  WHERE user_id=$1 AND next_review <= CURRENT_DATE AND word_id <> ALL($3::int[])
+  ORDER BY next_review
+  LIMIT $2
+) d
+UNION ALL
+SELECT word_id, false AS due
+FROM srs_state
+WHERE user_id=$1 AND word_id = ANY($4::int[])
+"""
+
+# 苦手テスト：OR 条件を索引に乗る2本の枝に分け、各枝で上位だけ取ってから併合する
+WEAK_SQL = """
+SELECT s.word_id, w.word, w.jp, w.pos
+FROM (
+  (SELECT word_id, consecutive_correct, next_review FROM srs_state
+   WHERE user_id=$1 AND next_review <= CURRENT_DATE
+   ORDER BY consecutive_correct ASC NULLS FIRST, next_review ASC NULLS LAST
+   LIMIT $2)
+  UNION
+  (SELECT word_id, consecutive_correct, next_review FROM srs_state
+   WHERE user_id=$1 AND consecutive_correct < 2
+   ORDER BY consecutive_correct ASC NULLS FIRST, next_review ASC NULLS LAST
+   LIMIT $2)
+) s
+JOIN words w ON w.word_id=s.word_id
+ORDER BY s.consecutive_correct ASC NULLS FIRST, s.next_review ASC NULLS LAST
+LIMIT $2
+"""
+
+
+class VocabScheduler:
+    """
+    英単語10問バッチの組み立て役。
+    「今日が期限の復習語」→「未学習の新出語」の順で埋め、
+    出題中に次のバッチを先読みしておく（次の「10問」は出題語を決めるDB往復を待たずに画面を返せる。
+    出題語のSRS状態の読み込み（SrsWriteBuffer.seed）は1往復残るが、応答と並行して行う）。
+    先読みは PREFETCH_TTL_SEC で期限切れになり、prefetch のたびに期限切れの分と上限を超えた古い分を捨てる。
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self._prefetch = {}  # user_id -> (作成時刻, 日付, Task)
+
+    async def build_batch(self, user_id: str, exclude=()) -> list[dict]:
+        pool = await get_pool()
+        catalog = await get_catalog(pool)
+        exclude = [int(x) for x in exclude]
+        excluded = set(exclude)
+
+        # 新出語候補：既出の分を見込んで多めに取る
+        candidates = [w for w in catalog.sample(self.batch_size * 3) if w["word_id"] not in excluded]
+
+        async with pool.acquire() as con:
+            rows = await con.fetch(
+                BATCH_SQL, user_id, self.batch_size, exclude,
+                [w["word_id"] for w in candidates],
+            )
+
+        due_ids = [r["word_id"] for r in rows if r["due"]]
+        seen = {r["word_id"] for r in rows if not r["due"]}
+
+        items = []
+        for wid in due_ids:
+            w = catalog.get(wid)
+            if w is not None:
+                items.append(w)
+        picked = {w["word_id"] for w in items}
+        for w in candidates:
+            if len(items) >= self.batch_size:
+                break
+            if w["word_id"] in seen or w["word_id"] in picked:
+                continue
+            items.append(w)
+            picked.add(w["word_id"])
+
+        # 新出語が尽きた学習者には既出語で埋める
+        if len(items) < self.batch_size:
+            for w in candidates:
+                if len(items) >= self.batch_size:
+                    break
+                if w["word_id"] not in picked:
+                    items.append(w)
+                    picked.add(w["word_id"])
+        return items
+
+    def prefetch(self, user_id: str, exclude=()):
+        """次のバッチをバックグラウンドで組み立てておく"""
+        old = self._prefetch.pop(user_id, None)
+        if old:
+            old[2].cancel()
+        self._sweep()
+        task = asyncio.get_running_loop().create_task(self.build_batch(user_id, exclude))
+        self._prefetch[user_id] = (time.monotonic(), datetime.date.today(), task)
+
+    def _sweep(self):
+        """期限切れの先読みと、上限を超えた分を古い順に捨てる（dict は作成順なので先頭から見れば足りる）"""
+        now = time.monotonic()
+        while self._prefetch:
+            user_id, (created, _, task) = next(iter(self._prefetch.items()))
+            if now - created < PREFETCH_TTL_SEC and len(self._prefetch) < PREFETCH_MAX:
+                break
+            del self._prefetch[user_id]
+            task.cancel()
+
+    def has_ready(self, user_id: str) -> bool:
+        """先読みが完了していて、すぐ返せるか"""
+        entry = self._prefetch.get(user_id)
+        return bool(entry) and entry[2].done() and not entry[2].cancelled() and entry[2].exception() is None
+
+    async def next_batch(self, user_id: str) -> list[dict]:
+        """先読み済みならそれを返し、無ければその場で組み立てる"""
+        entry = self._prefetch.pop(user_id, None)
+        if entry:
+            created, day, task = entry
+            fresh = time.monotonic() - created < PREFETCH_TTL_SEC and day == datetime.date.today()
+            if fresh:
+                try:
+                    return await task
+                except Exception as e:
+                    logger.warning(f"先読みバッチの取得に失敗したため再構築します: {e}")
+            else:
+                task.cancel()
+        return await self.build_batch(user_id)
+
+    async def weak_items(self, user_id: str, limit: int = 10):
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            return await con.fetch(WEAK_SQL, user_id, limit)
@@ -0,0 +1,86 @@
+# scripts/bench_catalog.py  (ORDER BY random() vs 単語カタログ)
+# 使い方: python scripts/bench_catalog.py
+#   DATABASE_PUBLIC_URL / DATABASE_URL があれば DB 側 (ORDER BY random()) も計測する。
+#   DB 側は一時テーブルに合成データを入れて計測するので、本番の words には触れない。
+import asyncio, os, sys, time, statistics
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from catalog import WordCatalog  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+SIZES = [4_000, 100_000, 1_000_000]
+ROUNDS = int(os.getenv("BENCH_ROUNDS") or 20)
+
+SAMPLE_SQL = """
+SELECT word_id, word, jp, pos, example_en, example_ja, synonyms, derived
+FROM bench_words
+ORDER BY random()
+LIMIT 20
+"""
+
+def synth_rows(n: int):
+    for i in range(1, n + 1):
+        yield {
+            "word_id": i, "word": f"word{i}", "jp": f"単語{i}", "pos": "名詞",
+            "example_en": f"This is word{i}.", "example_ja": f"これは単語{i}です。",
+            "synonyms": None, "derived": None,
+        }
+
+def timed(fn, rounds):
+    xs = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        fn()
+        xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs)
+
+async def atimed(fn, rounds):
+    xs = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        await fn()
+        xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs)
+
+async def bench_db(con, n: int):
+    await con.execute("DROP TABLE IF EXISTS bench_words")
+    await con.execute("""
+        CREATE TEMP TABLE bench_words (
+          word_id INT PRIMARY KEY, word TEXT, jp TEXT, pos TEXT,
+          example_en TEXT, example_ja TEXT, synonyms TEXT[], derived TEXT[]
+        )
+    """)
+    cols = ["word_id", "word", "jp", "pos", "example_en", "example_ja", "synonyms", "derived"]
+    await con.copy_records_to_table(
+        "bench_words", records=[tuple(r[c] for c in cols) for r in synth_rows(n)], columns=cols
+    )
+    await con.execute("ANALYZE bench_words")
+    return await atimed(lambda: con.fetch(SAMPLE_SQL), ROUNDS)
+
+async def main():
+    con = None
+    if DSN:
+        import asyncpg
+        con = await asyncpg.connect(DSN)
+    else:
+        print("(DSN 未設定のため DB 側の計測はスキップ)")
+
+    print(f"{'words':>10} | {'catalog load':>12} | {'catalog sample(10)':>18} | {'ORDER BY random()':>17}")
+    try:
+        for n in SIZES:
+            cat = WordCatalog()
+            t = time.perf_counter()
+            cat.replace(synth_rows(n))
+            load_ms = (time.perf_counter() - t) * 1000
+            mem_ms = timed(lambda: cat.sample(10), ROUNDS * 50)
+            db_ms = await bench_db(con, n) if con else None
+            db_s = f"{db_ms:14.3f} ms" if db_ms is not None else f"{'-':>17}"
+            print(f"{n:>10} | {load_ms:9.1f} ms | {mem_ms:15.4f} ms | {db_s}")
+    finally:
+        if con:
+            await con.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
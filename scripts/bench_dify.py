@@ -0,0 +1,114 @@
+# scripts/bench_dify.py  (dify.py のマイクロベンチ一式：scripts/dify_stub.py 相手なのでトークンを使わない)
+# 使い方: python scripts/bench_dify.py
+#   1) 形式の確認: フェンス（json / plain / none）× 応答の形（data / outputs / text）の全組み合わせで出題・採点が dict になるか
+#   2) 同時実行数を上げながら run_reading_question_async / run_reading_answer_async の requests/s と p50 / p99
+#      （スタブの応答時間は BENCH_LATENCY、既定 lognormal:0.05,0.3。各段 BENCH_CALLS 件、同時数は BENCH_LEVELS）
+#   3) _clean_fenced_json + json.loads の解析スループット（10KB〜1MB の出題 JSON、フェンス有無）
+#   DIFY_MAX_CONCURRENCY（スケジューラの上限）は未指定なら 64 にして、スタブ側の性能を見えやすくする
+#   ※ 同時 64 付近で requests/s が落ちるのは httpcore の接続プールが要求ごとに全接続を走査するため
+#     （素の httpx でも同じ）。本番の既定（スケジューラ 8 / 接続 20）はその手前で動いている
+import asyncio, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from dify_stub import DifyStub, StubConfig, FENCES, SHAPES  # noqa: E402
+dify = None  # スタブの URL を環境変数に入れてから import する
+
+CALLS = int(os.getenv("BENCH_CALLS") or 200)
+LEVELS = [int(x) for x in (os.getenv("BENCH_LEVELS") or "1,4,16,64").split(",")]
+LATENCY = os.getenv("BENCH_LATENCY") or "lognormal:0.05,0.3"
+PARSE_SIZES = [10_000, 100_000, 1_000_000]
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(int(q * len(xs)), len(xs) - 1)] * 1000
+
+def choices_str(q, n):
+    return " ".join(f"{k}. {q[f'question_{n}_choice_{k}']}" for k in "ABCD")
+
+async def question(i):
+    return await dify.run_reading_question_async(user_id=f"q{i}", current_score=50)
+
+def answer_fn(q):
+    async def answer(i):
+        return await dify.run_reading_answer_async(
+            user_id=f"a{i}", passage=q["passage"],
+            q1_text=q["question_1_text"], q1_choices_str=choices_str(q, 1), q1_answer=q["question_1_answer"], q1_user="B",
+            q2_text=q["question_2_text"], q2_choices_str=choices_str(q, 2), q2_answer=q["question_2_answer"], q2_user="A",
+        )
+    return answer
+
+async def check_formats(stub) -> int:
+    bad = 0
+    for fence in FENCES:
+        for shape in SHAPES:
+            stub.config.fence, stub.config.shape = fence, shape
+            q = await question(0)
+            r = await answer_fn(stub.question)(0)
+            ok = q == stub.question and "raw_text" not in r and r.get("overall_feedback")
+            bad += not ok
+            print(f"  fence={fence:<5} shape={shape:<7} {'OK' if ok else 'NG'}")
+    stub.config.fence, stub.config.shape = "json", "data"
+    return bad
+
+async def load(fn, conc):
+    sem = asyncio.Semaphore(conc)
+    lat = []
+
+    async def one(i):
+        async with sem:
+            t = time.perf_counter()
+            await fn(i)
+            lat.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(CALLS)))
+    return CALLS / (time.perf_counter() - t), pct(lat, .5), pct(lat, .99)
+
+def bench_parse(stub):
+    q = dict(stub.question)
+    words = q["passage"].split()
+    for size in PARSE_SIZES:
+        q["passage"] = " ".join(words[i % len(words)] for i in range(size // 6))
+        raw = json.dumps(q, ensure_ascii=False, indent=2)
+        for fence in ("json", "none"):
+            text = f"```json\n{raw}\n```" if fence == "json" else raw
+            n, t = 0, time.perf_counter()
+            while time.perf_counter() - t < 0.5:
+                obj = json.loads(dify._clean_fenced_json(text))
+                n += 1
+            dt = (time.perf_counter() - t) / n
+            assert obj["passage"] == q["passage"]
+            print(f"  {len(text) / 1000:7.0f} KB  fence={fence:<4}  {dt * 1e6:9.1f} us/parse  {len(text) / dt / 1e6:7.1f} MB/s")
+
+async def main() -> int:
+    stub = DifyStub(StubConfig(latency="const:0"))
+    base = await stub.start()
+    os.environ.update(stub.env(base))
+    os.environ.update({"DIFY_API_KEY_QUESTION": "app-q", "DIFY_API_KEY_ANSWER": "app-a"})
+    os.environ.setdefault("DIFY_MAX_CONCURRENCY", "64")
+    os.environ.setdefault("DIFY_MAX_CONNECTIONS", "128")
+    os.environ.setdefault("DIFY_MAX_KEEPALIVE", "128")
+    global dify
+    import dify
+    await dify.open_client()
+    try:
+        print("1) response formats")
+        bad = await check_formats(stub)
+
+        print(f"2) load: stub latency {LATENCY}, {CALLS} calls per level, scheduler cap {dify.DIFY_MAX_CONCURRENCY}")
+        stub.config.latency = LATENCY
+        for name, fn in (("question", question), ("answer", answer_fn(stub.question))):
+            for conc in LEVELS:
+                rps, p50, p99 = await load(fn, conc)
+                print(f"  {name:<8} concurrency {conc:3d}: {rps:8.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+
+        print("3) parse: _clean_fenced_json + json.loads")
+        bench_parse(stub)
+        print(f"stub: {stub.stats()}")
+    finally:
+        await dify.close_client()
+        await stub.close()
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,129 @@
+# scripts/bench_dify_chat.py  (会話版の読解フローのベンチ：ローカルのスタブ相手)
+# 使い方: python scripts/bench_dify_chat.py
+#   ・採点リクエストの送信バイト数と所要時間を、workflow 版（全文を送る）と会話版（解答だけ送る）で比べる
+#   ・スタブは入力の大きさに比例して遅くなる（モデルの入力トークン処理の代わり: STUB_MS_PER_KB）
+#   ・会話が見つからない（期限切れ等）ときに workflow 版へ落ちることも確認する
+# 出題データは scripts/fixtures/dify_question_stream.sse の記録を使う
+import asyncio, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+dify = None  # スタブのポートを環境変数に入れてから import する
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "dify_question_stream.sse")
+ROUNDS = int(os.getenv("BENCH_ROUNDS") or 50)
+BASE_MS = float(os.getenv("STUB_BASE_MS") or 5)
+MS_PER_KB = float(os.getenv("STUB_MS_PER_KB") or 10)
+
+GRADE = {"questions": [{"q1_reason": "The notice is about elevator work.", "feedback": "Good."},
+                       {"q2_reason": "They should use the west elevators or stairs.", "feedback": "Check the details."}],
+         "overall_feedback": "Nice work."}
+
+def recorded_question() -> str:
+    with open(FIXTURE, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("data:") and '"workflow_finished"' in line:
+                return json.loads(line[5:])["data"]["outputs"]["text"]
+    raise SystemExit("fixture has no workflow_finished event")
+
+class Stub:
+    def __init__(self, question_text):
+        self.question_text = question_text
+        self.conversations = {}
+        self.bytes = {}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1].decode()
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                raw = await reader.readexactly(length)
+                body = json.loads(raw)
+                kind = path.rsplit("/", 1)[-1]
+                if kind == "chat-messages":
+                    kind = "chat-answer" if body["conversation_id"] else "chat-question"
+                self.bytes.setdefault(kind, []).append(len(raw))
+                await asyncio.sleep((BASE_MS + MS_PER_KB * len(raw) / 1024) / 1000)
+
+                status, out = 200, None
+                if path.endswith("/workflows/run"):
+                    out = {"data": {"outputs": {"text": json.dumps(GRADE)}}}
+                elif not body["conversation_id"]:
+                    conv = f"conv-{len(self.conversations)}"
+                    self.conversations[conv] = body["user"]
+                    out = {"event": "message", "answer": self.question_text, "conversation_id": conv}
+                elif self.conversations.get(body["conversation_id"]) == body["user"]:
+                    out = {"event": "message", "answer": json.dumps(GRADE), "conversation_id": body["conversation_id"]}
+                else:
+                    status, out = 404, {"code": "not_found", "message": "Conversation Not Exists."}
+                data = json.dumps(out).encode()
+                writer.write(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                             % (status, len(data), data))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+def choices_str(q, n):
+    return " ".join(f"{k}. {q[f'question_{n}_choice_{k}']}" for k in "ABCD")
+
+async def grade(q, user, conversation_id):
+    return await dify.run_reading_answer_async(
+        user_id=user, passage=q["passage"],
+        q1_text=q["question_1_text"], q1_choices_str=choices_str(q, 1), q1_answer=q["question_1_answer"], q1_user="B",
+        q2_text=q["question_2_text"], q2_choices_str=choices_str(q, 2), q2_answer=q["question_2_answer"], q2_user="A",
+        conversation_id=conversation_id,
+    )
+
+async def timed(coro_fn):
+    t = time.perf_counter()
+    for i in range(ROUNDS):
+        await coro_fn(i)
+    return (time.perf_counter() - t) / ROUNDS * 1000
+
+async def main() -> int:
+    question_text = recorded_question()
+    stub = Stub(question_text)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    base = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1"
+    os.environ.update({
+        "DIFY_ENDPOINT_RUN": f"{base}/workflows/run", "DIFY_ENDPOINT_CHAT": f"{base}/chat-messages",
+        "DIFY_API_KEY_ANSWER": "app-answer", "DIFY_API_KEY_CHAT": "app-chat", "DIFY_READING_MODE": "chat",
+    })
+    global dify
+    import dify
+    await dify.open_client()
+    bad = 0
+    try:
+        q, conv = await dify.run_reading_question_chat(user_id="u0")
+        bad += q != json.loads(dify._clean_fenced_json(question_text))
+
+        wf_ms = await timed(lambda i: grade(q, "u0", None))
+        convs = [(await dify.run_reading_question_chat(user_id=f"u{i}"))[1] for i in range(ROUNDS)]
+        chat_ms = await timed(lambda i: grade(q, f"u{i}", convs[i]))
+
+        wf_b = stub.bytes["run"]
+        chat_b = stub.bytes["chat-answer"]
+        avg = lambda xs: sum(xs) / len(xs)
+        print(f"workflow grading : {avg(wf_b):7.0f} bytes/request  {wf_ms:6.1f} ms")
+        print(f"chat answer turn : {avg(chat_b):7.0f} bytes/request  {chat_ms:6.1f} ms"
+              f"  (-{1 - avg(chat_b) / avg(wf_b):.0%} bytes)")
+        print(f"chat question turn: {avg(stub.bytes['chat-question']):6.0f} bytes/request (workflow question: same inputs)")
+
+        # 会話が無い（他ユーザー・期限切れ）→ workflow にフォールバック
+        n = len(stub.bytes["run"])
+        r = await grade(q, "someone-else", convs[0])
+        ok = r == GRADE and len(stub.bytes["run"]) == n + 1
+        bad += not ok
+        print(f"fallback to workflow on missing conversation: {'OK' if ok else 'NG'}")
+    finally:
+        await dify.close_client()
+        server.close()
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
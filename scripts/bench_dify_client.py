@@ -0,0 +1,106 @@
+# scripts/bench_dify_client.py  (Dify 呼び出しの接続使い回しベンチ：ローカルのスタブサーバー相手)
+# 使い方: python scripts/bench_dify_client.py
+#   ・呼び出しごとに AsyncClient を作る従来方式と、共有クライアント（dify._apost_workflow）の比較
+#   ・逐次 / 並列それぞれで1回あたりの所要時間と、サーバー側で受け付けた TCP 接続数を出す
+#   ・同期 API（_post_workflow）がイベントループ上から呼ばれたら拒否されることも確認する
+# 注: スタブは平文 HTTP なので TLS ハンドシェイク分は含まれない（本番の差はこれより大きい）
+import asyncio, json, os, sys, time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import dify  # noqa: E402
+
+CALLS = int(os.getenv("BENCH_CALLS") or 300)
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY") or 10)
+STUB_DELAY_MS = float(os.getenv("STUB_DELAY_MS") or 0)
+
+BODY = json.dumps({"data": {"outputs": {"text": "```json\n{\"ok\": true}\n```"}}}).encode()
+
+class StubServer:
+    """/workflows/run 相当の最小 HTTP/1.1 サーバー（keep-alive 対応、接続数を数える）"""
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                if STUB_DELAY_MS:
+                    await asyncio.sleep(STUB_DELAY_MS / 1000)
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def per_call_client(url):
+    """変更前の方式: 呼び出しごとに AsyncClient を作って閉じる"""
+    async with httpx.AsyncClient(timeout=dify.DEFAULT_TIMEOUT_SEC) as client:
+        resp = await client.post(url, headers={"Authorization": "Bearer app-bench"},
+                                 json={"inputs": {}, "response_mode": "blocking", "user": "1"})
+    return dify._extract_outputs_text(resp.json())
+
+_users = iter(range(1 << 30))
+
+async def shared_client(url):
+    # 同じユーザーの呼び出しはスケジューラで直列化されるので、呼び出しごとに別ユーザーにする
+    return await dify._apost_workflow({}, next(_users), api_key="app-bench", endpoint=url)
+
+async def measure(stub, label, fn, url, concurrency):
+    stub.connections = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await fn(url)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(CALLS)))
+    dt = time.perf_counter() - t
+    print(f"{label:<28} c={concurrency:<3} {dt / CALLS * 1000:7.3f} ms/call  TCP接続={stub.connections}")
+    return dt
+
+async def main():
+    stub = StubServer()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/v1/workflows/run"
+    await dify.open_client()
+    try:
+        await shared_client(url)  # ウォームアップ
+        for c in (1, CONCURRENCY):
+            old = await measure(stub, "per-call AsyncClient", per_call_client, url, c)
+            new = await measure(stub, "shared client (dify.py)", shared_client, url, c)
+            print(f"  -> {old / new:.1f}x")
+
+        try:
+            dify._post_workflow({}, 1, api_key="app-bench", endpoint=url)
+            print("NG: sync API ran on the event loop", file=sys.stderr)
+            sys.exit(1)
+        except dify.DifyError:
+            print("sync API on the event loop: rejected (OK)")
+
+        # 別スレッドからの同期呼び出しは、共有クライアントのループに載って返ってくる
+        text = await asyncio.to_thread(dify._post_workflow, {}, 1, "app-bench", url)
+        print(f"sync API from a worker thread: {'OK' if text else 'NG'}")
+    finally:
+        await dify.close_client()
+        server.close()
+        await server.wait_closed()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# scripts/bench_dify_hedge.py  (裾の重い応答時間のスタブ相手に、固定タイムアウト / 適応タイムアウト / ヘッジを比べる)
+# 使い方: python scripts/bench_dify_hedge.py
+#   ・スタブの応答時間: 大半は 100ms 前後、STUB_SLOW_RATE（既定 5%）は 1〜3 秒、STUB_STUCK_RATE（既定 1%）は 20 秒止まる
+#   ・各モードで BENCH_WARMUP 件流して応答時間を貯めてから BENCH_CALLS 件を同時 BENCH_CONCURRENCY で計測し、
+#     p50 / p95 / p99 / 最大、失敗（タイムアウト）件数、スタブに届いたリクエスト数（ヘッジの追加コスト）を出す
+#   ・同じことを streaming（_astream_workflow。最初のイベントが来るまでがスタブの応答時間）でも測る。
+#     streaming の適応タイムアウト・ヘッジは最初のイベントまでの秒数（bench.ttfb）で決まる
+#   ・時間の尺を縮めるため、固定タイムアウトは 15 秒、適応タイムアウトの下限は 5 秒にしている
+import asyncio, json, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+dify = None  # 環境変数を入れてから import する
+
+CALLS = int(os.getenv("BENCH_CALLS") or 500)
+WARMUP = int(os.getenv("BENCH_WARMUP") or 100)
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY") or 16)
+SLOW_RATE = float(os.getenv("STUB_SLOW_RATE") or 0.05)
+STUCK_RATE = float(os.getenv("STUB_STUCK_RATE") or 0.01)
+BODY = json.dumps({"data": {"outputs": {"text": "{\"ok\": true}"}}}).encode()
+SSE = b"".join(b"data: " + json.dumps(e).encode() + b"\n\n" for e in (
+    {"event": "text_chunk", "data": {"text": "{\"ok\": "}},
+    {"event": "text_chunk", "data": {"text": "true}"}},
+    {"event": "workflow_finished", "data": {"status": "succeeded", "outputs": {"text": "{\"ok\": true}"}}},
+))
+
+class HeavyTailStub:
+    def __init__(self):
+        self.rng = random.Random(0)
+        self.requests = 0
+
+    def latency(self) -> float:
+        r = self.rng.random()
+        if r < STUCK_RATE:
+            return 20.0
+        if r < STUCK_RATE + SLOW_RATE:
+            return self.rng.uniform(1.0, 3.0)
+        return self.rng.lognormvariate(-2.3, 0.25)  # 中央値 100ms
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.latency())
+                if b'"streaming"' in body:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (len(SSE), SSE))
+                else:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (len(BODY), BODY))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # ヘッジ・タイムアウトでクライアントが切った
+        finally:
+            writer.close()
+
+async def drive(url, n, prefix, stream=False):
+    sem = asyncio.Semaphore(CONCURRENCY)
+    lat, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            try:
+                if stream:
+                    await dify._astream_workflow({}, f"{prefix}{i}", api_key="app-stub", endpoint=url, workflow="bench")
+                else:
+                    await dify._apost_workflow({}, f"{prefix}{i}", api_key="app-stub", endpoint=url, workflow="bench")
+            except dify.DifyError:
+                errors += 1
+            lat.append(time.perf_counter() - t)
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return lat, errors
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(int(q * len(xs)), len(xs) - 1)] * 1000
+
+async def run_mode(stub, url, label, adaptive, hedge, stream=False):
+    dify.DIFY_ADAPTIVE_TIMEOUT, dify.DIFY_HEDGE = adaptive, hedge
+    dify._latency = dify.LatencyTracker(dify.DIFY_LATENCY_WINDOW, dify.DIFY_LATENCY_MIN_SAMPLES)
+    stub.rng = random.Random(0)
+    await drive(url, WARMUP, "w", stream)
+    before = stub.requests
+    t = time.perf_counter()
+    lat, errors = await drive(url, CALLS, "u", stream)
+    dt = time.perf_counter() - t
+    extra = (stub.requests - before) / CALLS - 1
+    st = dify.get_latency().stats()["bench.ttfb" if stream else "bench"]
+    print(f"{label:<22} p50 {pct(lat, .5):7.0f}  p95 {pct(lat, .95):7.0f}  p99 {pct(lat, .99):7.0f}  max {max(lat) * 1000:7.0f} ms"
+          f"  errors {errors:3d}  extra requests {extra:+.1%}  (timeout {st['timeout_sec']}s, hedges {st['hedges']}"
+          f" / won {st['hedge_wins']}, wall {dt:.1f}s)")
+    return pct(lat, .99)
+
+async def main() -> int:
+    stub = HeavyTailStub()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1/workflows/run"
+    os.environ.update({
+        "DIFY_READ_TIMEOUT_SEC": "15", "DIFY_TIMEOUT_MIN_SEC": "5",
+        "DIFY_MAX_CONCURRENCY": str(CONCURRENCY * 2), "DIFY_MAX_CONNECTIONS": str(CONCURRENCY * 4),
+        "DIFY_SLOW_CALL_SEC": "60",
+    })
+    global dify
+    import dify
+    await dify.open_client()
+    try:
+        print(f"{CALLS} calls, concurrency {CONCURRENCY}, slow {SLOW_RATE:.0%} (1-3s), stuck {STUCK_RATE:.0%} (20s)")
+        fixed = await run_mode(stub, url, "fixed timeout (15s)", False, False)
+        await run_mode(stub, url, "adaptive timeout", True, False)
+        hedged = await run_mode(stub, url, "adaptive + hedge@p95", True, True)
+        print(f"p99: {fixed:.0f} ms -> {hedged:.0f} ms ({hedged / fixed:.1%} of fixed)")
+        s_fixed = await run_mode(stub, url, "stream, fixed (15s)", False, False, stream=True)
+        s_hedged = await run_mode(stub, url, "stream, adaptive+hedge", True, True, stream=True)
+        print(f"stream p99: {s_fixed:.0f} ms -> {s_hedged:.0f} ms ({s_hedged / s_fixed:.1%} of fixed)")
+    finally:
+        await dify.close_client()
+        server.close()
+    return 0 if hedged < fixed and s_hedged < s_fixed else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,96 @@
+# scripts/bench_grading_cache.py  (採点キャッシュのベンチ：Dify の代わりに遅延付きの偽採点を使う)
+# 使い方: python scripts/bench_grading_cache.py
+#   ・本文を使い回す想定で、(本文, 解答の組み合わせ) が Zipf 分布で繰り返す採点リクエストを流す
+#   ・キャッシュなし / あり で Dify 呼び出し回数・所要時間・ヒット率・節約時間を比べる
+#   ・同じ組み合わせの同時リクエストが1回の呼び出しにまとまること、空白の揺れでも同じキーになることを確認
+#   ・最初に読み込みを始めた呼び出し元が取り消されても、待っている他のリクエストには結果が届くことを確認
+# 注: PG 段は使わない（GradingCache(use_pg=False)）
+import asyncio, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from grading_cache import GradingCache, cache_key  # noqa: E402
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS") or 2000)
+PASSAGES = int(os.getenv("BENCH_PASSAGES") or 50)
+LATENCY_SEC = float(os.getenv("FAKE_DIFY_SEC") or 0.02)
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY") or 20)
+
+def make_requests(rng):
+    weights = [1 / (i + 1) for i in range(PASSAGES)]
+    out = []
+    for n in range(REQUESTS):
+        p = rng.choices(range(PASSAGES), weights)[0]
+        out.append({
+            "user_id": str(rng.randrange(40)),
+            "Question": f"Passage {p} text ...",
+            "question_1_text": f"Q1 of {p}", "question_1_choice": "A. a B. b C. c D. d", "question_1_Answer": "B",
+            "question_1_User_Answer": rng.choice("ABCD"),
+            "question_2_text": f"Q2 of {p}", "question_2_choice": "A. a B. b C. c D. d", "question_2_Answer": "C",
+            "question_2_User_Answer": rng.choice("ABCD"),
+        })
+    return out
+
+async def run(reqs, cache):
+    calls = 0
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(inputs):
+        nonlocal calls
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(LATENCY_SEC)
+            return {"overall_feedback": inputs["Question"][:20]}
+        async with sem:
+            if cache is None:
+                return await load()
+            return await cache.get_or_load("reading_answer", inputs, load)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(one(r) for r in reqs))
+    return calls, time.perf_counter() - t
+
+async def main() -> int:
+    reqs = make_requests(random.Random(0))
+    base_calls, base_dt = await run(reqs, None)
+    cache = GradingCache(max_entries=500, ttl=3600)
+    calls, dt = await run(reqs, cache)
+    st = cache.stats()
+    print(f"no cache : Dify calls={base_calls}, {base_dt:.2f}s")
+    print(f"cache    : Dify calls={calls}, {dt:.2f}s, hit ratio={st['hit_ratio']:.1%} "
+          f"(memory {st['memory_hits']}, coalesced {st['coalesced']}), saved≈{st['saved_sec']}s")
+
+    # 同時の同一リクエストは1回にまとまる
+    cache = GradingCache(max_entries=10, ttl=3600)
+    n = 0
+    async def load():
+        nonlocal n
+        n += 1
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+    same = dict(reqs[0])
+    await asyncio.gather(*(cache.get_or_load("reading_answer", same, load) for _ in range(30)))
+    ok = n == 1 and cache.stats()["coalesced"] == 29
+
+    # 最初の呼び出し元を取り消しても、共有の読み込みは続いて他の待ち手に結果が届く
+    cache = GradingCache(max_entries=10, ttl=3600)
+    n = 0
+    first = asyncio.ensure_future(cache.get_or_load("reading_answer", same, load))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.ensure_future(cache.get_or_load("reading_answer", same, load)) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    first.cancel()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    cancel_ok = first.cancelled() and n == 1 and all(r == {"ok": True} for r in results)
+    print(f"loader cancelled, waiters served: {'OK' if cancel_ok else 'NG'}")
+    ok = ok and cancel_ok
+
+    # 空白・ユーザーIDの違いは同じキー、解答が違えば別キー
+    a = dict(same, Question="  Passage 0\n text ...", user_id="999")
+    b = dict(same, question_1_User_Answer="D" if same["question_1_User_Answer"] != "D" else "A")
+    ok = ok and cache_key("x", a) == cache_key("x", dict(same, Question="Passage 0 text ...")) and cache_key("x", b) != cache_key("x", same)
+    print(f"single-flight / key normalization: {'OK' if ok else 'NG'}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
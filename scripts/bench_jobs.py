@@ -0,0 +1,146 @@
+# scripts/bench_jobs.py  (ジョブキューのスループット：複数の worker プロセス × ローカル Postgres × Dify スタブ)
+# 使い方: python scripts/bench_jobs.py   ※ DATABASE_PUBLIC_URL / DATABASE_URL が必要
+#   ・BENCH_JOBS 件（既定 400）を enqueue してから worker プロセスを P=1,2,4 個起動し、全件 done までの時間を測る
+#   ・1プロセスあたりの worker は JOBS_WORKERS（既定 4）。スタブは STUB_MS（既定 200ms）で応答し、
+#     STUB_ERROR_RATE（既定 0.1）の割合で 500 を返す → 再試行（バックオフ）込みの数字になる
+#   ・BENCH_KILL=1 なら途中で worker プロセスを1つ SIGKILL し、リース切れで他のプロセスが拾い直すことを確かめる
+#   ・jobs テーブルには kind='bench.dify' の行だけを作り、終わったら消す
+import asyncio, json, os, random, signal, subprocess, sys, time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+load_dotenv()
+
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+KIND = "bench.dify"
+JOBS = int(os.getenv("BENCH_JOBS") or 400)
+PROCS = [int(p) for p in (os.getenv("BENCH_PROCS") or "1,2,4").split(",")]
+WORKERS = os.getenv("JOBS_WORKERS") or "4"
+STUB_MS = float(os.getenv("STUB_MS") or 200)
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE") or 0.1)
+KILL = os.getenv("BENCH_KILL") == "1"
+TIMEOUT_SEC = float(os.getenv("BENCH_TIMEOUT_SEC") or 300)
+
+class Stub:
+    """/workflows/run のスタブ。inputs.job ごとに呼ばれた回数・成功（200）回数を数える"""
+    def __init__(self):
+        self.calls = {}
+        self.ok = {}
+        self.rng = random.Random(0)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                n = json.loads(await reader.readexactly(length))["inputs"]["job"]
+                self.calls[n] = self.calls.get(n, 0) + 1
+                await asyncio.sleep(STUB_MS / 1000)
+                if self.rng.random() < ERROR_RATE:
+                    status, body = 500, b'{"code": "internal_error"}'
+                else:
+                    self.ok[n] = self.ok.get(n, 0) + 1
+                    status, body = 200, json.dumps({"data": {"outputs": {"text": "{\"ok\": true}"}}}).encode()
+                writer.write(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                             % (status, len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+# ---------- worker プロセス ----------
+async def worker():
+    import dify
+    from jobs import JobQueue
+
+    async def handle(payload):
+        await dify._apost_workflow({"job": payload["n"]}, f"u{payload['n']}", api_key="app-stub")
+        return {"ok": True}
+
+    await dify.open_client()
+    queue = JobQueue()
+    queue.register(KIND, handle)
+    await queue.start()
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+    await queue.stop()
+    await dify.close_client()
+    print(json.dumps(queue.stats()), flush=True)
+
+# ---------- 親プロセス ----------
+async def counts(con):
+    rows = await con.fetch("SELECT status, count(*) AS n FROM jobs WHERE kind=$1 GROUP BY status", KIND)
+    return {r["status"]: r["n"] for r in rows}
+
+async def run(con, stub, port, procs):
+    from jobs import JobQueue
+    await con.execute("DELETE FROM jobs WHERE kind=$1", KIND)
+    stub.calls.clear()
+    stub.ok.clear()
+    queue = JobQueue(workers=0)
+    for n in range(JOBS):
+        await queue.enqueue(KIND, {"n": n}, max_attempts=6)
+
+    env = {**os.environ,
+           "DIFY_ENDPOINT_RUN": f"http://127.0.0.1:{port}/v1/workflows/run",
+           "JOBS_WORKERS": WORKERS, "JOBS_POLL_SEC": "0.5", "JOBS_LEASE_SEC": "5",
+           "JOBS_BACKOFF_BASE_SEC": "0.1", "JOBS_BACKOFF_MAX_SEC": "2"}
+    t = time.perf_counter()
+    children = [subprocess.Popen([sys.executable, __file__, "worker"], env=env, stdout=subprocess.PIPE)
+                for _ in range(procs)]
+    killed = False
+    c = {}
+    while time.perf_counter() - t < TIMEOUT_SEC:
+        await asyncio.sleep(0.2)
+        c = await counts(con)
+        if KILL and procs > 1 and not killed and c.get("done", 0) >= JOBS // 4:
+            children[0].send_signal(signal.SIGKILL)
+            killed = True
+        if c.get("done", 0) + c.get("failed", 0) >= JOBS:
+            break
+    dt = time.perf_counter() - t
+
+    for ch in children:
+        if ch.poll() is None:
+            ch.send_signal(signal.SIGTERM)
+    for ch in children:
+        ch.wait(timeout=30)
+    calls = sum(stub.calls.values())
+    dup = sum(1 for n in stub.ok.values() if n > 1)
+    print(f"P={procs} x{WORKERS} workers: {JOBS} jobs in {dt:6.2f}s  {JOBS / dt:6.1f} jobs/s  "
+          f"calls {calls} (retries {calls - JOBS})  duplicated {dup}  status {c}"
+          + ("  [1 process killed]" if killed else ""))
+    return c.get("done", 0) == JOBS
+
+async def main() -> int:
+    if not DSN:
+        print("DATABASE_PUBLIC_URL / DATABASE_URL が未設定です（ローカルの Postgres を指定してください）")
+        return 2
+    import asyncpg
+    stub = Stub()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    con = await asyncpg.connect(DSN)
+    with open(os.path.join(ROOT, "sql", "schema.sql"), encoding="utf-8") as f:
+        await con.execute(f.read())
+    bad = 0
+    try:
+        for procs in PROCS:
+            bad += not await run(con, stub, port, procs)
+    finally:
+        await con.execute("DELETE FROM jobs WHERE kind=$1", KIND)
+        await con.close()
+        server.close()
+    return bad
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["worker"]:
+        asyncio.run(worker())
+    else:
+        sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,84 @@
+# scripts/bench_load_svocm.py  (load_svocm.py の一括投入ベンチ：合成した英文 BENCH_ROWS 件（既定 1,000,000）)
+# 使い方: python scripts/bench_load_svocm.py
+#   ・一時ディレクトリに JSONL を作る（2% はファイル内の重複、30% は正解 gold 付き、0.1% は壊れた行）
+#   ・1) DB なし: 読み込み + row_to_record（正規化・ハッシュ・検証）だけの rows/s
+#   ・2) DATABASE_PUBLIC_URL / DATABASE_URL があれば、使い捨てのスキーマ bench_load_svocm に load() で投入して rows/s、
+#        続けて同じファイルをもう一度流して「全件 unchanged」になることと所要時間を確認する（最後にスキーマごと消す）
+import asyncio, json, os, random, sys, tempfile, time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+import load_svocm  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+ROWS = int(os.getenv("BENCH_ROWS") or 1_000_000)
+SCHEMA = "bench_load_svocm"
+
+SUBJECTS = ["The boy", "My sister", "Our teacher", "The company", "Ken", "The old man", "Scientists", "She"]
+VERBS = ["gave", "made", "found", "kept", "became", "sent", "told", "showed"]
+OBJECTS = ["the letter", "his friend", "a present", "the window", "everyone", "the result", "us", "the truth"]
+TAILS = ["yesterday", "in the morning", "at the station", "last year", "very quickly", "after school"]
+
+def synth(path: str, n: int):
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            if rng.random() < 0.001:
+                f.write("{broken json\n")
+                continue
+            j = rng.randrange(i) if i and rng.random() < 0.02 else i   # ファイル内の重複
+            s, v, o, t = (SUBJECTS[j % 8], VERBS[j // 8 % 8], OBJECTS[j // 64 % 8], TAILS[j // 512 % 6])
+            row = {"sentence_en": f"{s} {v} {o} {t} (#{j}).", "pattern": j % 5 + 1, "level": j % 3 + 1,
+                   "tags": ["synthetic", f"t{j % 10}"]}
+            if j % 10 < 3:
+                row["gold"] = {"s": s, "v": v, "o1": o, "m": [t]}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def parse_only(path: str):
+    ok = ng = 0
+    for line, row in load_svocm.read_rows(path):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            load_svocm.row_to_record(line, row)
+            ok += 1
+        except Exception:
+            ng += 1
+    return ok, ng
+
+async def bench_db(path: str):
+    import asyncpg
+    con = await asyncpg.connect(DSN)
+    try:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await con.execute(f"SET search_path TO {SCHEMA}, pg_temp")
+        for label in ("first load", "same file again"):
+            st = await load_svocm.load(con, path, progress=False)
+            print(f"  {label:<16} {st['total_sec']:6.1f}s  {st['read'] / st['total_sec']:10,.0f} rows/s"
+                  f"  (staging {st['staged_sec']:.1f}s)  inserted={st['inserted']} updated={st['updated']}"
+                  f" unchanged={st['unchanged']} duplicates={st['duplicates']} NG={st['ng']}")
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+async def main():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "svocm.jsonl")
+        t = time.perf_counter()
+        synth(path, ROWS)
+        print(f"synthetic file: {ROWS:,} rows, {os.path.getsize(path) / 1e6:.0f} MB ({time.perf_counter() - t:.1f}s)")
+
+        t = time.perf_counter()
+        ok, ng = parse_only(path)
+        dt = time.perf_counter() - t
+        print(f"1) parse only: {dt:.1f}s  {ROWS / dt:,.0f} rows/s  (OK={ok:,} NG={ng:,})")
+
+        if DSN:
+            print(f"2) load into schema {SCHEMA}:")
+            await bench_db(path)
+        else:
+            print("(DSN 未設定のため DB への投入はスキップ)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
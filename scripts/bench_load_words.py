@@ -0,0 +1,104 @@
+# scripts/bench_load_words.py  (load_words.py の1行ずつ UPSERT と bulk（COPY + 1回のマージ）の比較)
+# 使い方: python scripts/bench_load_words.py
+#   ・Bubble のエクスポートと同じ列の CSV を BENCH_ROWS 行（既定 500,000）合成する（1% は同じ単語の再登場、0.1% は jp 空で NG）
+#   ・1) DB なし: CSV の読み込み + row_to_params だけの rows/s
+#   ・2) DATABASE_PUBLIC_URL / DATABASE_URL があれば、使い捨てのスキーマ bench_load_words に投入して比べる
+#        bulk は全行、row は先頭 BENCH_ROW_LIMIT 行（既定 50,000。0 で全行）だけ流して全行分の時間を見積もる
+#        続けて bulk で同じ CSV をもう一度（全件 unchanged・版は据え置き）、1% の行の訳を変えた CSV を流す（差分だけ updated）
+#        最後にスキーマごと消す
+import asyncio, csv, os, random, sys, tempfile, time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+import load_words  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+ROWS = int(os.getenv("BENCH_ROWS") or 500_000)
+ROW_LIMIT = int(os.getenv("BENCH_ROW_LIMIT") or 50_000)
+SCHEMA = "bench_load_words"
+HEADER = ["word", "japanese", "part of speech", "level", "example", "ex_japa", "Synonym", "Antonym", "Derived word"]
+
+def synth(path: str, n: int, changed: float = 0.0):
+    """changed の割合の行は訳を変える（差分投入の確認用。乱数の流れは changed に関係なく同じ）"""
+    rng = random.Random(0)
+    edit = random.Random(1)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(HEADER)
+        for i in range(n):
+            j = rng.randrange(i) if i and rng.random() < 0.01 else i
+            w.writerow([
+                f"word{j}", "" if rng.random() < 0.001 else f"単語{j}" + ("（改）" if edit.random() < changed else ""),
+                rng.choice(["noun", "verb", "adjective"]),
+                j % 10 + 1, f"This is an example for word{j}.", f"word{j} の例文です。",
+                f"syn{j}a, syn{j}b", f"ant{j}" if j % 3 == 0 else "", f"word{j}ly，word{j}ness",
+            ])
+
+def parse_only(path: str):
+    stats = load_words.new_stats()
+    n = sum(1 for _ in load_words.read_params(path, 0, stats))
+    return n, stats["ng"]
+
+async def run(pool, path: str, mode: str, limit: int, truncate: bool = True):
+    if truncate:
+        async with pool.acquire() as con:
+            await con.execute("TRUNCATE words")
+    t = time.perf_counter()
+    st = await load_words.load(pool, path, mode, limit, prune=False)
+    return time.perf_counter() - t, st
+
+def counts(st) -> str:
+    return (f"inserted={st['inserted']:,} updated={st['updated']:,} unchanged={st['unchanged']:,}"
+            f" not in CSV={st['missing']:,} version={st['version']}")
+
+async def bench_db(path: str, changed_path: str):
+    import asyncpg
+    con = await asyncpg.connect(DSN)
+    await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    pool = await asyncpg.create_pool(DSN, min_size=1, max_size=5, server_settings={"search_path": SCHEMA})
+    try:
+        async with pool.acquire() as c:
+            await c.execute(load_words.SCHEMA_SQL)
+        dt, st = await run(pool, path, "bulk", 0)
+        bulk_rate = (st["ok"] + st["ng"]) / dt
+        print(f"  bulk: {dt:7.1f}s  {bulk_rate:10,.0f} rows/s  OK={st['ok']:,} NG={st['ng']:,}  {counts(st)}")
+
+        limit = ROW_LIMIT or ROWS
+        dt, st = await run(pool, path, "row", limit)
+        row_rate = (st["ok"] + st["ng"]) / dt
+        print(f"  row : {dt:7.1f}s  {row_rate:10,.0f} rows/s  OK={st['ok']:,} NG={st['ng']:,}"
+              f"  (first {limit:,} rows; all {ROWS:,} ≈ {ROWS / row_rate:,.0f}s)")
+        print(f"  bulk / row: {bulk_rate / row_rate:.0f}x")
+
+        await run(pool, path, "bulk", 0)
+        for label, p in (("same CSV again", path), ("1% of rows edited", changed_path)):
+            dt, st = await run(pool, p, "bulk", 0, truncate=False)
+            print(f"  bulk, {label:<18} {dt:6.1f}s  {counts(st)}")
+    finally:
+        await pool.close()
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+async def main():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "words.csv")
+        t = time.perf_counter()
+        synth(path, ROWS)
+        print(f"synthetic CSV: {ROWS:,} rows, {os.path.getsize(path) / 1e6:.0f} MB ({time.perf_counter() - t:.1f}s)")
+
+        t = time.perf_counter()
+        ok, ng = parse_only(path)
+        dt = time.perf_counter() - t
+        print(f"1) parse only: {dt:.1f}s  {ROWS / dt:,.0f} rows/s  (OK={ok:,} NG={ng:,})")
+
+        if DSN:
+            changed_path = os.path.join(d, "words_changed.csv")
+            synth(changed_path, ROWS, changed=0.01)
+            print(f"2) load into schema {SCHEMA}:")
+            await bench_db(path, changed_path)
+        else:
+            print("(DSN 未設定のため DB への投入はスキップ)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
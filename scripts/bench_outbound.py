@@ -0,0 +1,198 @@
+# scripts/bench_outbound.py  (送信キューの動作確認：429 を返す偽 HTTP 層)
+# 使い方: python scripts/bench_outbound.py
+#   ・連打相当の編集 50 回 → 実際の REST 呼び出しが数回にまとまり、最後の内容が残ること
+#   ・一定確率で 429（Retry-After 付き）を返しても、取りこぼさず最後の内容で終わること
+#   ・embed= と embeds= が混ざった編集がまとまっても、片方（embeds=）だけで送られること
+#   ・Embed だけの連続送信 + View 付き送信が1通にまとまり、merge=False の送信はまとまらないこと
+#   ・X-RateLimit-Remaining: 0 のヘッダを見たら Reset-After まで次の呼び出しを待つこと
+#   ・typing / GET など別ルートのヘッダは送信のペースに影響せず、X-RateLimit-Bucket が同じルートは状態を共有すること
+import asyncio, os, random, sys, time
+from types import SimpleNamespace
+
+import discord
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from outbound import OutboundQueue, interaction_route, message_route  # noqa: E402
+
+RATE_429 = float(os.getenv("FAKE_429_RATE") or 0.3)
+
+class FakeHTTP:
+    """REST 呼び出しの回数を数え、確率的に 429 を返す"""
+    def __init__(self, rng):
+        self.rng = rng
+        self.calls = 0
+        self.throttled = 0
+
+    async def request(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.rng.random() < RATE_429:
+            self.throttled += 1
+            resp = SimpleNamespace(status=429, reason="Too Many Requests", headers={"Retry-After": "0.05"})
+            raise discord.HTTPException(resp, "You are being rate limited.")
+
+class FakeMessage:
+    def __init__(self, http, id):
+        self.http = http
+        self.id = id
+        self.content = None
+        self.embeds = []
+        self.mixed = 0   # embed= と embeds= を同時に受けた回数
+
+    async def edit(self, **kwargs):
+        await self.http.request()
+        self.mixed += "embed" in kwargs and "embeds" in kwargs
+        self.content = kwargs.get("content", self.content)
+        self.embeds = kwargs.get("embeds", self.embeds)
+        return self
+
+class FakeChannel:
+    def __init__(self, http, id):
+        self.http = http
+        self.id = id
+        self.sent = []
+
+    async def send(self, **kwargs):
+        await self.http.request()
+        self.sent.append(kwargs)
+        return FakeMessage(self.http, len(self.sent))
+
+async def scenario_edits(rng) -> bool:
+    http = FakeHTTP(rng)
+    q = OutboundQueue(rate=5, per=0.5)
+    msgs = [FakeMessage(http, n) for n in range(20)]
+    t = time.perf_counter()
+    tasks = []
+    for m in msgs:
+        for k in range(50):
+            tasks.append(q.edit(("msg", m.id), message_route(1, edit=True), m.edit, content=f"v{k}"))
+            if rng.random() < 0.2:
+                await asyncio.sleep(0)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    dt = time.perf_counter() - t
+    errors = sum(isinstance(r, Exception) for r in results)
+    ok = errors == 0 and all(m.content == "v49" for m in msgs)
+    print(f"edits: requested={len(tasks)}, REST calls={http.calls} (429={http.throttled}), "
+          f"errors={errors}, last-write-wins={'OK' if ok else 'NG'}, {dt:.2f}s, stats={q.stats}")
+    return ok
+
+def no_429_http() -> FakeHTTP:
+    http = FakeHTTP(random.Random(0))
+    http.rng.random = lambda: 1.0
+    return http
+
+async def scenario_mixed_embeds() -> bool:
+    http = no_429_http()
+    q = OutboundQueue()
+    m = FakeMessage(http, 1)
+    e1, e2 = discord.Embed(title="a"), discord.Embed(title="b")
+    await asyncio.gather(
+        q.edit(("msg", 1), message_route(1, edit=True), m.edit, embeds=[e1, e2]),
+        q.edit(("msg", 1), message_route(1, edit=True), m.edit, embed=e2),
+        q.edit(("msg", 1), message_route(1, edit=True), m.edit, embeds=[e2, e1]),
+        q.edit(("msg", 1), message_route(1, edit=True), m.edit, embed=e1, view=None),
+    )
+    ok = m.mixed == 0 and m.embeds == [e1]
+    print(f"mixed embed/embeds edits: REST calls={http.calls}, single kwarg={'OK' if ok else 'NG'}")
+    return ok
+
+async def scenario_sends() -> bool:
+    http = no_429_http()  # 送信の確認では 429 を出さない
+    q = OutboundQueue()
+    ch = FakeChannel(http, 2)
+    futs = [q.send_nowait(ch, embed=discord.Embed(title=f"e{k}")) for k in range(3)]
+    futs.append(q.send_nowait(ch, embed=discord.Embed(title="q"), view=None))
+    msgs = await asyncio.gather(*futs)
+    ok = len(ch.sent) == 1 and len(ch.sent[0]["embeds"]) == 4 and len({id(m) for m in msgs}) == 1
+
+    # あとで編集するメッセージ（merge=False）は前後どちらともまとまらない
+    ch2 = FakeChannel(http, 3)
+    futs = [q.send_nowait(ch2, embed=discord.Embed(title="p")),
+            q.send_nowait(ch2, merge=False, embed=discord.Embed(title="stream")),
+            q.send_nowait(ch2, embed=discord.Embed(title="q"), view=None)]
+    await asyncio.gather(*futs)
+    ok2 = [len(kw.get("embeds") or [kw.get("embed")]) for kw in ch2.sent] == [1, 1, 1]
+    print(f"sends: requested=4, REST calls={len(ch.sent)}, batched={'OK' if ok else 'NG'}; "
+          f"merge=False kept separate={'OK' if ok2 else 'NG'}, stats={q.stats}")
+    return ok and ok2
+
+async def scenario_headers() -> bool:
+    """ヘッダの残り回数に従う（ローカルの目安 5回/5秒 より先にヘッダで止まる／ヘッダで通る）"""
+    http = no_429_http()
+    q = OutboundQueue(rate=100, per=5.0)
+    ch = FakeChannel(http, 4)
+    await q.send(ch, content="1")
+    q.observe_response("POST", "/api/v10/channels/4/messages", 200,
+                       {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.3"})
+    t = time.perf_counter()
+    await q.send(ch, content="2")
+    waited = time.perf_counter() - t
+    ok_block = waited >= 0.25
+
+    q2 = OutboundQueue(rate=1, per=5.0)
+    ch2 = FakeChannel(http, 5)
+    await q2.send(ch2, content="1")
+    q2.observe_response("POST", "/api/v10/channels/5/messages", 200,
+                        {"X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "5"})
+    t = time.perf_counter()
+    await asyncio.gather(*(q2.send(ch2, content=str(k)) for k in range(4)))
+    fast = time.perf_counter() - t
+    ok_pass = fast < 1.0
+
+    q3 = OutboundQueue()
+    q3.observe_response("POST", "/api/v10/channels/6/messages", 429,
+                        {"Retry-After": "0.2", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.2"})
+    ch3 = FakeChannel(http, 6)
+    t = time.perf_counter()
+    await q3.send(ch3, content="x")
+    ok_429 = time.perf_counter() - t >= 0.15 and q3.stats["rate_limited"] == 1
+    ok = ok_block and ok_pass and ok_429
+    print(f"headers: remaining=0 waited {waited:.2f}s, remaining=4 sent 4 in {fast:.2f}s, "
+          f"observed 429 blocked={'OK' if ok_429 else 'NG'} -> {'OK' if ok else 'NG'}")
+    return ok
+
+async def scenario_routes() -> bool:
+    """ヘッダはルート（X-RateLimit-Bucket）ごとに反映する"""
+    http = no_429_http()
+    q = OutboundQueue(rate=100, per=5.0)
+    ch = FakeChannel(http, 7)
+    exhausted = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "5"}
+    q.observe_response("POST", "/api/v10/channels/7/typing", 200, exhausted)
+    q.observe_response("GET", "/api/v10/channels/7/messages", 200, exhausted)
+    q.observe_response("POST", "/api/v10/channels/7/typing", 429, {"Retry-After": "5"})
+    t = time.perf_counter()
+    await q.send(ch, content="x")
+    ok_other = time.perf_counter() - t < 0.1
+
+    # 編集（PATCH）のヘッダは送信（POST）を止めないが、同じハッシュを名乗るルートは同じバケツ
+    q.observe_response("PATCH", "/api/v10/channels/7/messages/1", 200, {**exhausted, "X-RateLimit-Bucket": "edit"})
+    t = time.perf_counter()
+    await q.send(ch, content="y")
+    ok_edit = time.perf_counter() - t < 0.1
+    q.observe_response("POST", "/api/v10/channels/8/messages", 200,
+                       {"X-RateLimit-Remaining": "1", "X-RateLimit-Reset-After": "5", "X-RateLimit-Bucket": "edit"})
+    ok_shared = q._bucket(message_route(8)) is q._bucket(message_route(8, edit=True))
+
+    # インタラクションの編集（webhook）もヘッダで止まる
+    q.observe_response("PATCH", "/api/v10/webhooks/1/tok/messages/@original", 200,
+                       {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.3"})
+    m = FakeMessage(http, 9)
+    t = time.perf_counter()
+    await q.edit(("msg", 9), interaction_route(SimpleNamespace(application_id=1, token="tok")), m.edit, content="z")
+    ok_webhook = time.perf_counter() - t >= 0.25
+    ok = ok_other and ok_edit and ok_shared and ok_webhook
+    print(f"routes: typing/GET ignored={'OK' if ok_other else 'NG'}, edit separate from send={'OK' if ok_edit else 'NG'}, "
+          f"shared hash={'OK' if ok_shared else 'NG'}, webhook paced={'OK' if ok_webhook else 'NG'}")
+    return ok
+
+async def main():
+    rng = random.Random(42)
+    ok = await scenario_edits(rng)
+    ok = await scenario_mixed_embeds() and ok
+    ok = await scenario_sends() and ok
+    ok = await scenario_headers() and ok
+    ok = await scenario_routes() and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
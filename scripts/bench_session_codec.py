@@ -0,0 +1,76 @@
+# scripts/bench_session_codec.py  (custom_id セッション符号化のベンチ＋ファズ)
+# 使い方: python scripts/bench_session_codec.py
+#   ・英単語10問セッション相当の encode / decode の速度と custom_id 長
+#   ・ランダムな値での往復一致、1文字改変（どの位置でも）・action の差し替え・他ユーザー・切り詰めが必ず弾かれること
+#   ・SESSION_SECRET が未設定ならベンチ用の鍵を使う
+import os, sys, random, time, string
+
+os.environ.setdefault("SESSION_SECRET", "bench-session-secret")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import session_codec  # noqa: E402
+from session_codec import InvalidToken  # noqa: E402
+
+ROUNDS = int(os.getenv("BENCH_ROUNDS") or 100_000)
+FUZZ = int(os.getenv("FUZZ_CASES") or 20_000)
+ALPHABET = string.ascii_letters + string.digits + "-_:="
+
+def vocab_fields(rng):
+    return [rng.getrandbits(64), rng.randrange(10), rng.getrandbits(20)] + [rng.randrange(1, 1_000_000) for _ in range(10)]
+
+def bench():
+    rng = random.Random(0)
+    fields = vocab_fields(rng)
+    user = "123456789012345678"
+
+    t = time.perf_counter()
+    for _ in range(ROUNDS):
+        cid = session_codec.encode("vocab", "k", fields, user)
+    t_enc = (time.perf_counter() - t) / ROUNDS * 1e6
+
+    t = time.perf_counter()
+    for _ in range(ROUNDS):
+        session_codec.decode(cid, user)
+    t_dec = (time.perf_counter() - t) / ROUNDS * 1e6
+
+    print(f"encode: {t_enc:6.2f} us  decode: {t_dec:6.2f} us  custom_id: {len(cid)} chars")
+
+def fuzz():
+    rng = random.Random(1)
+    bad = 0
+    for n in range(FUZZ):
+        user = str(rng.getrandbits(63))
+        fields = [rng.getrandbits(rng.choice((1, 7, 14, 32, 64))) for _ in range(rng.randrange(0, 12))]
+        try:
+            cid = session_codec.encode("vocab", rng.choice("kun"), fields, user)
+        except ValueError:
+            continue  # 100文字を超える組み合わせは encode 側で拒否される
+
+        # 往復一致
+        if session_codec.decode(cid, user)[2] != fields:
+            bad += 1
+
+        # 1文字改変・action の差し替え・他ユーザー・切り詰めは必ず InvalidToken
+        i = rng.randrange(len(cid))
+        mutated = cid[:i] + rng.choice(ALPHABET.replace(cid[i], "")) + cid[i + 1:]
+        ns, action, token = cid.split(":", 2)
+        swapped = f"{ns}:{rng.choice('kun'.replace(action, ''))}:{token}"
+        for probe, who in ((mutated, user), (swapped, user), (cid, user + "1"), (cid[:rng.randrange(len(cid))], user)):
+            try:
+                session_codec.decode(probe, who)
+            except InvalidToken:
+                continue
+            bad += 1
+            print(f"NG: accepted {probe!r} for user {who}", file=sys.stderr)
+
+        # 任意文字列も例外は InvalidToken のみ
+        junk = "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(0, 100)))
+        try:
+            session_codec.decode(junk, user)
+        except InvalidToken:
+            pass
+    print(f"fuzz: cases={FUZZ}, NG={bad}")
+    return bad
+
+if __name__ == "__main__":
+    bench()
+    sys.exit(1 if fuzz() else 0)
@@ -0,0 +1,44 @@
+# scripts/bench_srs_batch.py  (update_srs vs update_srs_batch)
+# 使い方: python scripts/bench_srs_batch.py   ※ BENCH_ROWS で件数を変更（既定 1,000,000）
+# 同じ入力でスカラー版とベクトル版を走らせ、結果の一致と速度比を表示する。
+import os, sys, time, datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from srs import update_srs, update_srs_batch  # noqa: E402
+
+N = int(os.getenv("BENCH_ROWS") or 1_000_000)
+
+def main():
+    rng = np.random.default_rng(42)
+    e = np.round(rng.uniform(1.3, 3.0, N), 2)
+    i = rng.integers(0, 400, N).astype(np.float64)
+    c = rng.integers(0, 8, N)
+    q = rng.integers(0, 6, N)
+    today = datetime.date.today()
+
+    t = time.perf_counter()
+    scalar = [update_srs(*args) for args in zip(e.tolist(), i.tolist(), c.tolist(), q.tolist())]
+    t_scalar = time.perf_counter() - t
+
+    t = time.perf_counter()
+    be, bi, bc, bnext = update_srs_batch(e, i, c, q, today=today)
+    t_batch = time.perf_counter() - t
+
+    se, si, sc, snext = (list(col) for col in zip(*scalar))
+    ok = (
+        np.array_equal(be, np.array(se))
+        and np.array_equal(bi, np.array(si))
+        and np.array_equal(bc, np.array(sc))
+        and bnext.tolist() == snext
+    )
+
+    print(f"rows={N:,}")
+    print(f"scalar : {t_scalar:8.3f} s")
+    print(f"batch  : {t_batch:8.3f} s")
+    print(f"speedup: {t_scalar / t_batch:8.1f} x")
+    print(f"parity : {'OK' if ok else 'NG'}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
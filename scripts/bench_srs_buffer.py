@@ -0,0 +1,155 @@
+# scripts/bench_srs_buffer.py  (SRS 書き込みバッファのフラッシュ経路：executemany と COPY マージ)
+# 使い方: python scripts/bench_srs_buffer.py
+#   ・1) DB なし: BENCH_USERS 人（既定 1,000）が10問ずつ入り混じって解答する状況を偽の接続で流し、
+#        上限到達のフラッシュが COPY（COPY_THRESHOLD 件以上）、セッション終了の少量が executemany に
+#        振り分けられること、すべてのカードがちょうど1回ずつ最後の状態で書かれることを確認する
+#   ・2) DATABASE_PUBLIC_URL / DATABASE_URL があれば、使い捨てのスキーマ bench_srs_buffer で
+#        件数ごとの executemany / COPY マージの所要時間を比べる（COPY_THRESHOLD の目安。最後にスキーマごと消す）
+import asyncio, os, random, sys, time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import srs_buffer  # noqa: E402
+from srs_buffer import SrsWriteBuffer, COPY_THRESHOLD, MAX_PENDING, UPSERT_SQL, MERGE_SQL, FLUSH_COLUMNS  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+USERS = int(os.getenv("BENCH_USERS") or 1_000)
+SCHEMA = "bench_srs_buffer"
+
+class FakeCon:
+    def __init__(self, db):
+        self.db = db
+
+    def transaction(self):
+        class Tx:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+        return Tx()
+
+    async def fetch(self, sql, *args):
+        return []
+
+    async def execute(self, sql, *args):
+        pass
+
+    async def executemany(self, sql, rows):
+        if sql is UPSERT_SQL:
+            self.db.write("executemany", rows)
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.db.write("copy", records)
+
+class FakePool:
+    def __init__(self):
+        self.flushes = {"executemany": [], "copy": []}
+        self.state = {}
+        self.writes = {}
+
+    def write(self, how, rows):
+        self.flushes[how].append(len(rows))
+        for r in rows:
+            self.state[(r[0], r[1])] = r[2:]
+            self.writes[(r[0], r[1])] = self.writes.get((r[0], r[1]), 0) + 1
+
+    def acquire(self):
+        pool = self
+
+        class Ctx:
+            async def __aenter__(self):
+                return FakeCon(pool)
+
+            async def __aexit__(self, *exc):
+                return False
+        return Ctx()
+
+async def simulate() -> bool:
+    pool = FakePool()
+
+    async def fake_get_pool():
+        return pool
+
+    srs_buffer.get_pool = fake_get_pool
+    buf = SrsWriteBuffer(write_behind=True)
+    rng = random.Random(0)
+    users = [f"u{n}" for n in range(USERS)]
+    for u in users:
+        await buf.seed(u, range(10))
+    # 全員の解答を入り混ぜて流す（1人の中では順番どおり）
+    queue = [(u, k) for u in users for k in range(10)]
+    rng.shuffle(queue)
+    nxt = {u: 0 for u in users}
+    t = time.perf_counter()
+    for u, _ in queue:
+        k = nxt[u]
+        nxt[u] += 1
+        await buf.record(u, k, rng.choice((2, 5)), "b", flush=False)
+        await buf.flush_if_full()
+        if nxt[u] == 10:
+            await buf.end_session(u)
+    dt = time.perf_counter() - t
+
+    expected = {(u, k) for u in users for k in range(10)}
+    ok = set(pool.state) == expected and all(v == 1 for v in pool.writes.values()) and buf.pending == 0
+    copy, many = pool.flushes["copy"], pool.flushes["executemany"]
+    ok = ok and bool(copy)
+    print(f"1) {USERS} users x 10 answers: {dt:.2f}s, MAX_PENDING={MAX_PENDING}, COPY_THRESHOLD={COPY_THRESHOLD}")
+    print(f"   COPY flushes={len(copy)} (rows {min(copy, default=0)}-{max(copy, default=0)}, total {sum(copy):,})"
+          f"  executemany flushes={len(many)} (rows {min(many, default=0)}-{max(many, default=0)}, total {sum(many):,})")
+    print(f"   every card written once={'OK' if ok else 'NG'}")
+    return ok
+
+async def bench_db():
+    import asyncpg, datetime
+    con = await asyncpg.connect(DSN)
+    try:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await con.execute(f"SET search_path TO {SCHEMA}, pg_temp")
+        await con.execute("""
+            CREATE TABLE srs_state (
+              user_id TEXT NOT NULL, word_id INT NOT NULL, next_review DATE,
+              easiness NUMERIC DEFAULT 2.5, interval_days INT DEFAULT 0,
+              consecutive_correct INT DEFAULT 0, last_result INT,
+              PRIMARY KEY(user_id, word_id)
+            )
+        """)
+        today = datetime.date.today()
+        print("2) flush time by size (executemany / COPY merge):")
+        for size in (10, 25, 50, 100, 200, 500):
+            rows = [(f"u{n // 10}", n % 10, 2.5, 1, 1, today, 5) for n in range(size)]
+            times = {}
+            for how in ("executemany", "copy"):
+                t = time.perf_counter()
+                for _ in range(5):
+                    async with con.transaction():
+                        if how == "copy":
+                            await con.execute("""
+                                CREATE TEMP TABLE srs_flush (
+                                  user_id TEXT, word_id INT, easiness NUMERIC, interval_days INT,
+                                  consecutive_correct INT, next_review DATE, last_result INT
+                                ) ON COMMIT DROP
+                            """)
+                            await con.copy_records_to_table("srs_flush", records=rows, columns=FLUSH_COLUMNS)
+                            await con.execute(MERGE_SQL)
+                        else:
+                            await con.executemany(UPSERT_SQL, rows)
+                times[how] = (time.perf_counter() - t) / 5 * 1000
+            mark = " <- COPY" if size >= COPY_THRESHOLD else ""
+            print(f"   {size:4d} rows: executemany {times['executemany']:7.1f} ms  COPY {times['copy']:7.1f} ms{mark}")
+    finally:
+        await con.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await con.close()
+
+async def main() -> int:
+    ok = await simulate()
+    if DSN:
+        await bench_db()
+    else:
+        print("(DSN 未設定のため DB での計測はスキップ)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
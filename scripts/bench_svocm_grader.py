@@ -0,0 +1,54 @@
+# scripts/bench_svocm_grader.py  (SVOCM ローカル採点 svocm_grader.py の正解率とスループット)
+# 使い方: python scripts/bench_svocm_grader.py
+#   1) ラベル付きの解答 scripts/fixtures/svocm_graded.jsonl（correct / partial / wrong）を採点し、
+#      点数が帯（correct ≥ 85 / partial 40〜84 / wrong < 40）に入るかを確認する。外れたものは一覧を出して終了コード 1
+#   2) grade() の1回あたりの時間と 1 秒あたりの採点数（正解側の正規化はキャッシュ済み・解答側は毎回正規化）
+#      BENCH_SECONDS（既定 1.0）秒ずつ回す
+import json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import svocm_grader  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "svocm_graded.jsonl")
+SECONDS = float(os.getenv("BENCH_SECONDS") or 1.0)
+BANDS = {"correct": (85, 100), "partial": (40, 84), "wrong": (0, 39)}
+
+def load_cases():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def check(cases) -> int:
+    bad = 0
+    counts = {}
+    for c in cases:
+        r = svocm_grader.grade(c["gold"], c["answers"])
+        lo, hi = BANDS[c["label"]]
+        ok = lo <= r["score"] <= hi
+        counts.setdefault(c["label"], [0, 0])[ok] += 1
+        if not ok:
+            bad += 1
+            print(f"  NG item {c['item_id']} {c['label']:<7} score {r['score']:3d}  {c['note']}  {r['slots']}")
+    for label, (ng, ok) in counts.items():
+        print(f"  {label:<7} {ok}/{ok + ng}")
+    return bad
+
+def throughput(cases, fn, label):
+    n, t = 0, time.perf_counter()
+    while time.perf_counter() - t < SECONDS:
+        for c in cases:
+            fn(c)
+        n += len(cases)
+    dt = (time.perf_counter() - t) / n
+    print(f"  {label:<28} {dt * 1e6:6.2f} us/call  {1 / dt:10,.0f} calls/s")
+
+def main() -> int:
+    cases = load_cases()
+    print(f"1) labeled set: {len(cases)} answers")
+    bad = check(cases)
+    print("2) throughput")
+    throughput(cases, lambda c: svocm_grader.grade(c["gold"], c["answers"]), "grade()")
+    throughput(cases, lambda c: svocm_grader._normalize(c["answers"].get("s", "")), "normalize one answer slot")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# scripts/bench_svocm_index.py  (SVOCM の出題: ORDER BY random() vs svocm_index のインデックス + SRS 選択)
+# 使い方: python scripts/bench_svocm_index.py   ※ BENCH_ITEMS で件数を変更（既定 100,000）
+#   DATABASE_PUBLIC_URL / DATABASE_URL があれば DB 側（WHERE pattern=$1 ORDER BY random() LIMIT 1）も計測する。
+#   DB 側は一時テーブルに合成データを入れて計測するので、本番の svocm_items には触れない。
+#   メモリ側は学習者の SRS 状態の量（未学習のみ / 2,000件 / 全件近く学習済み）ごとに1クリックの時間を測る。
+import asyncio, datetime, os, random, statistics, sys, time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from svocm_index import SvocmIndex, SvocmSelector  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+N = int(os.getenv("BENCH_ITEMS") or 100_000)
+ROUNDS = int(os.getenv("BENCH_ROUNDS") or 2000)
+
+RANDOM_SQL = "SELECT * FROM bench_svocm WHERE pattern=$1 ORDER BY random() LIMIT 1"
+
+def synth_rows(n: int):
+    for i in range(1, n + 1):
+        yield {"item_id": i, "sentence_en": f"Sentence number {i} is here.", "pattern": i % 5 + 1, "level": i % 3 + 1}
+
+class FakePool:
+    """SvocmSelector が学習者の状態を読むときだけ使う（svocm_srs_state の行を返す）"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def acquire(self):
+        pool = self
+
+        class Con:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def fetch(self, sql, user_id):
+                pool.queries += 1
+                return pool.rows
+        return Con()
+
+def srs_rows(item_ids, due_ratio):
+    today = datetime.date.today()
+    rows = []
+    for iid in item_ids:
+        days = -1 if random.random() < due_ratio else random.randint(1, 60)
+        rows.append({"item_id": iid, "next_review": today + datetime.timedelta(days=days)})
+    return rows
+
+async def bench_pick(index, rows, label):
+    pool = FakePool(rows)
+    sel = SvocmSelector(index)
+    await sel.pick("u", pool, pattern=1)  # 学習者の状態を読み込ませる（1回だけ）
+    xs = []
+    for r in range(ROUNDS):
+        t = time.perf_counter()
+        await sel.pick("u", pool, pattern=r % 5 + 1)
+        xs.append((time.perf_counter() - t) * 1e6)
+    xs.sort()
+    print(f"  {label:<34} median {statistics.median(xs):8.1f} us  p99 {xs[int(len(xs) * .99)]:8.1f} us"
+          f"  DB queries {pool.queries}  {sel.picks}")
+
+async def bench_db(con, n: int):
+    await con.execute("DROP TABLE IF EXISTS bench_svocm")
+    await con.execute("""
+        CREATE TEMP TABLE bench_svocm (
+          item_id INT PRIMARY KEY, sentence_en TEXT NOT NULL, pattern INT, level INT
+        )
+    """)
+    cols = ["item_id", "sentence_en", "pattern", "level"]
+    await con.copy_records_to_table("bench_svocm", records=[tuple(r[c] for c in cols) for r in synth_rows(n)], columns=cols)
+    await con.execute("ANALYZE bench_svocm")
+    xs = []
+    for r in range(50):
+        t = time.perf_counter()
+        await con.fetchrow(RANDOM_SQL, r % 5 + 1)
+        xs.append((time.perf_counter() - t) * 1000)
+    return statistics.median(xs)
+
+async def main():
+    index = SvocmIndex()
+    t = time.perf_counter()
+    index.replace(synth_rows(N))
+    print(f"index: {N} items, {len(index._buckets)} buckets, built in {(time.perf_counter() - t) * 1000:.1f} ms")
+
+    random.seed(1)
+    print(f"pick (pattern 1-5, {ROUNDS} clicks each):")
+    await bench_pick(index, [], "new learner (no SRS rows)")
+    await bench_pick(index, srs_rows(random.sample(range(1, N + 1), 2000), 0.2), "2,000 SRS rows, 20% due")
+    mostly = [i for i in range(1, N + 1) if i % 1000 != 0]   # 未学習は 1,000件に1件だけ
+    await bench_pick(index, srs_rows(mostly, 0.0), f"{len(mostly)} SRS rows, none due")
+
+    if DSN:
+        import asyncpg
+        con = await asyncpg.connect(DSN)
+        try:
+            print(f"ORDER BY random() LIMIT 1 on {N} rows: median {await bench_db(con, N):.2f} ms")
+        finally:
+            await con.close()
+    else:
+        print("(DSN 未設定のため DB 側の計測はスキップ)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
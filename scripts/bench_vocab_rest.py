@@ -0,0 +1,180 @@
+# scripts/bench_vocab_rest.py  (英単語のボタン操作1回あたりの REST 呼び出し回数と、最初の応答までの時間)
+# 使い方: python scripts/bench_vocab_rest.py
+#   ・Vocab Cog のハンドラを偽の Interaction / DB（BENCH_DB_SEC 秒の往復を sleep で模擬）で動かし、
+#     cogs.vocab.REST_STATS の累計から操作の種類ごとの「1操作あたりの REST 回数」を出す
+#   ・最初の応答（edit_message / defer）までの時間も測り、DB を待たずに応答していることを確認する
+#     （10問スタート（先読みあり）・解答・前々回テスト・苦手テストは DB 往復より先に応答すること）
+#   ・解答（シード済み）は REST 1回、それ以外も 2回以内であること。満たさなければ exit 1
+import asyncio, os, sys, time
+from types import SimpleNamespace
+
+os.environ.setdefault("SESSION_SECRET", "bench-session-secret")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import cogs.vocab as vocab  # noqa: E402
+
+USERS = int(os.getenv("BENCH_USERS") or 200)
+DB_SEC = float(os.getenv("BENCH_DB_SEC") or 0.05)
+
+class FakeResponse:
+    def __init__(self, log):
+        self.log = log
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        self.log.rest()
+
+    async def defer(self, **kwargs):
+        self.done = True
+        self.log.rest()
+
+class Log:
+    """1インタラクションの REST 回数と最初の応答までの秒数"""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.first = None
+        self.calls = 0
+
+    def rest(self):
+        self.calls += 1
+        if self.first is None:
+            self.first = time.perf_counter() - self.t0
+
+class FakeInteraction:
+    def __init__(self, user_id):
+        self.log = Log()
+        self.user = SimpleNamespace(id=user_id)
+        self.id = user_id
+        self.application_id = 1
+        self.token = f"token{user_id}"
+        self.channel_id = 1000 + user_id  # 送信キューのチャンネル単位の間隔に全員が並ばないよう、ユーザーごとに別チャンネル
+        self.message = SimpleNamespace(id=user_id, components=[])
+        self.response = FakeResponse(self.log)
+
+    async def edit_original_response(self, **kwargs):
+        self.log.rest()
+
+class FakeCon:
+    async def fetch(self, *args):
+        await asyncio.sleep(DB_SEC)
+        return [{"batch_id": f"{n:016x}"} for n in range(3)]
+
+    async def execute(self, *args):
+        await asyncio.sleep(DB_SEC)
+
+class FakePool:
+    def acquire(self):
+        class Ctx:
+            async def __aenter__(self):
+                return FakeCon()
+
+            async def __aexit__(self, *exc):
+                return False
+        return Ctx()
+
+class FakeScheduler:
+    def __init__(self):
+        self.ready = set()
+
+    def has_ready(self, user_id):
+        return user_id in self.ready
+
+    async def next_batch(self, user_id):
+        if user_id not in self.ready:
+            await asyncio.sleep(DB_SEC)
+        self.ready.discard(user_id)
+        return [WORDS[k] for k in range(10)]
+
+    def prefetch(self, user_id, exclude=()):
+        self.ready.add(user_id)
+
+    async def weak_items(self, user_id, limit=10):
+        await asyncio.sleep(DB_SEC)
+        return [{"word": w["word"], "jp": w["jp"]} for w in WORDS.values()][:limit]
+
+class FakeBuffer:
+    def __init__(self):
+        self.seeded = set()
+
+    async def seed(self, user_id, word_ids):
+        await asyncio.sleep(DB_SEC)
+        self.seeded.update((user_id, w) for w in word_ids)
+
+    def is_seeded(self, user_id, word_id):
+        return (user_id, word_id) in self.seeded
+
+    async def record(self, user_id, word_id, quality, batch_id=None, flush=True):
+        pass
+
+    async def end_session(self, user_id):
+        pass
+
+    async def flush_if_full(self):
+        pass
+
+WORDS = {k: {"word_id": k, "word": f"word{k}", "jp": f"単語{k}"} for k in range(10)}
+
+async def fake_pool():
+    return FakePool()
+
+async def fake_catalog(pool=None):
+    return WORDS
+
+async def measure(label, results, coro_for):
+    before = dict(vocab.REST_STATS)
+    logs = await asyncio.gather(*(coro_for(u) for u in range(USERS)))
+    n = vocab.REST_STATS["interactions"] - before["interactions"]
+    calls = vocab.REST_STATS["rest_calls"] - before["rest_calls"]
+    first = sorted(l.first for l in logs)
+    results[label] = (calls / n, first[len(first) // 2], first[-1])
+    print(f"{label:<24} REST/op {calls / n:4.2f}  first response p50 {first[len(first) // 2] * 1000:6.1f} ms"
+          f"  max {first[-1] * 1000:6.1f} ms  (ops={n})")
+
+async def main() -> int:
+    vocab.get_pool = fake_pool
+    vocab.get_catalog = fake_catalog
+    cog = vocab.Vocab(SimpleNamespace())
+    cog.scheduler = FakeScheduler()
+    cog.srs_buffer = FakeBuffer()
+    views = {}
+    results = {}
+    print(f"users={USERS}, DB round-trip={DB_SEC * 1000:.0f} ms")
+
+    async def start(u, prefetched):
+        if prefetched:
+            cog.scheduler.ready.add(str(u))
+        i = FakeInteraction(u)
+        await cog.start_ten(i)
+        views[u] = vocab.VocabSessionView("00" * 8, [WORDS[k] for k in range(10)], str(u))
+        return i.log
+
+    async def answer(u):
+        i = FakeInteraction(u)
+        await cog.advance(i, views[u].custom_id("k"))
+        return i.log
+
+    async def call(handler, u):
+        i = FakeInteraction(u)
+        await handler(i)
+        return i.log
+
+    await measure("start_ten (cold)", results, lambda u: start(u, False))
+    await measure("start_ten (prefetched)", results, lambda u: start(u, True))
+    await measure("advance (seeded)", results, answer)
+    await measure("prevprev_test", results, lambda u: call(cog.prevprev_test, u))
+    await measure("weak_test", results, lambda u: call(cog.weak_test, u))
+    s = vocab.REST_STATS
+    print(f"REST_STATS: interactions={s['interactions']}, rest_calls={s['rest_calls']}"
+          f" ({s['rest_calls'] / s['interactions']:.2f} per interaction)")
+
+    ok = results["advance (seeded)"][0] == 1.0
+    ok = ok and all(r[0] <= 2.0 for r in results.values())
+    ok = ok and all(results[k][2] < DB_SEC for k in ("start_ten (prefetched)", "advance (seeded)", "prevprev_test", "weak_test"))
+    print("OK" if ok else "NG")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
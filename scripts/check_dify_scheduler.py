@@ -0,0 +1,164 @@
+# scripts/check_dify_scheduler.py  (Dify 呼び出しスケジューラの確認：遅延・障害を注入するローカルスタブ相手)
+# 使い方: python scripts/check_dify_scheduler.py
+#   1) 教室40人が同時に押す → スタブ側の同時実行数が上限以内、待ち時間の統計
+#   2) 1人が10連打しても、他のユーザーは後ろに並ばされない（同一ユーザーは常に1件まで）
+#   3) スタブが 500 を返し続ける → ブレーカーが開いて即失敗、復旧後に half_open → closed
+#   4) 遅すぎる応答もブレーカーの失敗として数える / 待ち時間切れは DifyUnavailable
+#   5) ヘッジの2本目も枠を数える：空きがあれば送り、満杯・待ち行列があれば送らない（同時実行数は上限以内）
+import asyncio, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import dify  # noqa: E402
+from dify import CircuitBreaker, DifyScheduler, DifyUnavailable, DifyError  # noqa: E402
+
+BODY = json.dumps({"data": {"outputs": {"text": "{\"ok\": true}"}}}).encode()
+
+class LatencyStub:
+    """遅延（秒）とステータスを差し替えられる /workflows/run スタブ。同時実行数をユーザー別にも数える"""
+    def __init__(self):
+        self.latency = 0.1
+        self.status = 200
+        self.active = 0
+        self.peak = 0
+        self.active_by_user = {}
+        self.peak_by_user = 0
+        self.order = []
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                user = json.loads(await reader.readexactly(length))["user"]
+                self.order.append(user)
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                n = self.active_by_user[user] = self.active_by_user.get(user, 0) + 1
+                self.peak_by_user = max(self.peak_by_user, n)
+                try:
+                    await asyncio.sleep(self.latency)
+                finally:
+                    self.active -= 1
+                    self.active_by_user[user] -= 1
+                body = BODY if self.status == 200 else b'{"code": "internal_error"}'
+                writer.write(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                             % (self.status, len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+def install(max_concurrency=8, max_queue=200, queue_timeout=30.0, min_calls=5, slow_sec=10.0, cooldown=0.5):
+    sched = DifyScheduler(max_concurrency, max_queue, queue_timeout,
+                          CircuitBreaker(10.0, min_calls, 0.5, slow_sec, cooldown))
+    dify._scheduler = sched
+    return sched
+
+async def call(url, user):
+    t = time.perf_counter()
+    try:
+        await dify._apost_workflow({}, user, api_key="app-stub", endpoint=url)
+        return "ok", time.perf_counter() - t
+    except DifyUnavailable:
+        return "unavailable", time.perf_counter() - t
+    except DifyError:
+        return "error", time.perf_counter() - t
+
+def check(label, cond, detail=""):
+    print(f"{'OK' if cond else 'NG'}  {label}  {detail}")
+    return 0 if cond else 1
+
+async def main() -> int:
+    stub = LatencyStub()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1/workflows/run"
+    await dify.open_client()
+    bad = 0
+    try:
+        # 1) 教室40人
+        sched = install(max_concurrency=8)
+        stub.latency, stub.peak = 0.3, 0
+        t = time.perf_counter()
+        res = await asyncio.gather(*(call(url, f"student{i}") for i in range(40)))
+        dt = time.perf_counter() - t
+        st = sched.stats()
+        bad += check("classroom: all 40 served", all(r == "ok" for r, _ in res))
+        bad += check("classroom: peak concurrency <= 8", stub.peak <= 8,
+                     f"(peak={stub.peak}, {dt:.2f}s, wait avg {st['wait_avg_ms']} ms / max {st['wait_max_ms']} ms, queue max {st['queue_max']})")
+
+        # 2) 1人の連打と公平性
+        sched = install(max_concurrency=2)
+        stub.latency, stub.peak_by_user, stub.order = 0.1, 0, []
+        spam = [asyncio.ensure_future(call(url, "spammer")) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        others = await asyncio.gather(*(call(url, f"u{i}") for i in range(4)))
+        await asyncio.gather(*spam)
+        worst_other = max(d for _, d in others)
+        bad += check("fairness: one in-flight call per user", stub.peak_by_user == 1, f"(peak per user={stub.peak_by_user})")
+        bad += check("fairness: others are not queued behind the spammer", worst_other < 0.45,
+                     f"(slowest other user {worst_other:.2f}s vs spammer total {10 * 0.1:.1f}s)")
+
+        # 3) 障害 → ブレーカーが開く → 即失敗 → 復旧
+        sched = install(max_concurrency=4, min_calls=5, cooldown=0.5)
+        stub.latency, stub.status = 0.05, 500
+        for i in range(5):
+            await call(url, f"e{i}")
+        fast = [await call(url, f"f{i}") for i in range(20)]
+        bad += check("breaker: opens after repeated 500s", sched.breaker.state == "open", f"(opens={sched.breaker.opens})")
+        bad += check("breaker: fails fast while open",
+                     all(r == "unavailable" and d < 0.01 for r, d in fast),
+                     f"(max {max(d for _, d in fast) * 1000:.2f} ms)")
+        stub.status = 200
+        await asyncio.sleep(0.6)
+        trial = await asyncio.gather(*(call(url, f"t{i}") for i in range(3)))
+        results = sorted(r for r, _ in trial)
+        bad += check("breaker: half_open lets exactly one trial through", results == ["ok", "unavailable", "unavailable"], f"{results}")
+        r, _ = await call(url, "after")
+        bad += check("breaker: closes after a successful trial", r == "ok" and sched.breaker.state == "closed")
+
+        # 4) 遅すぎる応答 / 待ち時間切れ
+        sched = install(max_concurrency=4, min_calls=3, slow_sec=0.15)
+        stub.latency = 0.2
+        await asyncio.gather(*(call(url, f"s{i}") for i in range(3)))
+        bad += check("breaker: slow calls count as failures", sched.breaker.state == "open")
+
+        sched = install(max_concurrency=1, queue_timeout=0.1)
+        stub.latency = 0.3
+        res = await asyncio.gather(call(url, "a"), call(url, "b"))
+        bad += check("queue timeout: second caller gives up", sorted(r for r, _ in res) == ["ok", "unavailable"],
+                     f"(timeouts={sched.stats()['timeouts']}, running={sched.stats()['running']})")
+        await asyncio.sleep(0)
+        bad += check("queue timeout: slots are returned", sched.stats()["running"] == 0 and sched.stats()["queued"] == 0)
+
+        # 5) ヘッジは空き枠があるときだけ
+        hedge_after = dify._latency.hedge_after
+        dify._latency.hedge_after = lambda workflow: 0.02
+        try:
+            sched = install(max_concurrency=4)
+            stub.latency, stub.peak = 0.2, 0
+            await asyncio.gather(*(call(url, f"h{i}") for i in range(2)))
+            st = sched.stats()
+            bad += check("hedge: sent when slots are free", st["hedges"] == 2 and stub.peak <= 4,
+                         f"(hedges={st['hedges']}, peak={stub.peak})")
+            await asyncio.sleep(0.3)  # 取り消したヘッジの負け側がスタブ内で寝ている分を流しきる
+            sched = install(max_concurrency=4)
+            stub.peak = 0
+            await asyncio.gather(*(call(url, f"h{i}") for i in range(12)))
+            st = sched.stats()
+            bad += check("hedge: skipped when saturated, peak <= 4", stub.peak <= 4 and st["hedges_skipped"] > 0,
+                         f"(peak={stub.peak}, hedges={st['hedges']}, skipped={st['hedges_skipped']})")
+            bad += check("hedge: extra slots are returned", st["running"] == 0)
+        finally:
+            dify._latency.hedge_after = hedge_after
+        print(sched.stats())
+    finally:
+        await dify.close_client()
+        server.close()
+    return bad
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,133 @@
+# scripts/check_dify_stream.py  (出題ストリーミングの確認：記録済み SSE を再生するローカルスタブ相手)
+# 使い方: python scripts/check_dify_stream.py
+#   ・scripts/fixtures/dify_question_stream.sse（Dify /workflows/run の streaming 応答の記録）を
+#     チャンク転送で少しずつ返し、run_reading_question_stream の結果と途中経過を確かめる
+#   ・チャンク境界は UTF-8 の途中・エスケープの途中・行の途中でも切れるようにランダムに決める
+#   ・本文が最初に届くまでの時間（time-to-first-content）と全体の時間を出す
+#   ・text_chunk の無い応答（blocking 相当）と error イベントの扱いも確認する
+import asyncio, json, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+dify = None  # スタブのポートを DIFY_ENDPOINT_RUN に入れてから import する
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "dify_question_stream.sse")
+REPLAYS = int(os.getenv("REPLAYS") or 20)
+TOTAL_SEC = float(os.getenv("STUB_TOTAL_SEC") or 2.0)   # 1回の応答を何秒かけて流すか
+
+class SseStub:
+    """受け取ったリクエストに対して self.payload を Transfer-Encoding: chunked で流す"""
+    def __init__(self):
+        self.payload = b""
+        self.seed = 0
+        self.bodies = []
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            self.bodies.append(json.loads(await reader.readexactly(length)))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+            rng = random.Random(self.seed)
+            data, i = self.payload, 0
+            pieces = []
+            while i < len(data):
+                n = rng.randint(1, 400)
+                pieces.append(data[i:i + n])
+                i += n
+            delay = TOTAL_SEC / max(len(pieces), 1)
+            for p in pieces:
+                writer.write(b"%x\r\n%s\r\n" % (len(p), p))
+                await writer.drain()
+                await asyncio.sleep(delay)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # クライアントが途中で切った（error イベントの確認など）
+        finally:
+            writer.close()
+
+def expected_question(raw: bytes) -> dict:
+    for line in raw.decode("utf-8").splitlines():
+        if line.startswith("data:"):
+            ev = json.loads(line[5:])
+            if ev.get("event") == "workflow_finished":
+                return json.loads(dify._clean_fenced_json(ev["data"]["outputs"]["text"]))
+    raise SystemExit("fixture has no workflow_finished event")
+
+async def replay(stub, seed, expected) -> tuple[bool, float, float]:
+    stub.seed = seed
+    seen = []
+    t = time.perf_counter()
+    first = None
+
+    def on_passage(passage, complete):
+        nonlocal first
+        if first is None:
+            first = time.perf_counter() - t
+        seen.append((passage, complete))
+
+    q = await dify.run_reading_question_stream(user_id=1, on_passage=on_passage)
+    total = time.perf_counter() - t
+    ok = q == expected
+    ok = ok and all(expected["passage"].startswith(p) for p, _ in seen)
+    ok = ok and seen and seen[-1] == (expected["passage"], True)
+    ok = ok and stub.bodies[-1]["response_mode"] == "streaming"
+    return bool(ok), first or total, total
+
+async def main() -> int:
+    stub = SseStub()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    os.environ["DIFY_ENDPOINT_RUN"] = f"http://127.0.0.1:{port}/v1/workflows/run"
+    os.environ["DIFY_API_KEY_QUESTION"] = "app-stub"
+    os.environ["DIFY_STREAMING"] = "1"
+    global dify
+    import dify
+
+    with open(FIXTURE, "rb") as f:
+        raw = f.read()
+    expected = expected_question(raw)
+    await dify.open_client()
+    bad = 0
+    try:
+        stub.payload = raw
+        firsts, totals = [], []
+        for seed in range(REPLAYS):
+            ok, first, total = await replay(stub, seed, expected)
+            bad += not ok
+            firsts.append(first)
+            totals.append(total)
+        print(f"streamed: replays={REPLAYS}, NG={bad}, "
+              f"first passage avg {sum(firsts) / len(firsts):.2f}s / full question avg {sum(totals) / len(totals):.2f}s")
+
+        # text_chunk の無い応答：途中経過なしで結果だけ返る
+        stub.payload = b"".join(
+            line + b"\n\n" for line in raw.split(b"\n\n") if line and b'"text_chunk"' not in line
+        )
+        seen = []
+        q = await dify.run_reading_question_stream(user_id=1, on_passage=lambda p, c: seen.append(p))
+        ok = q == expected and not seen
+        bad += not ok
+        print(f"no text_chunk: {'OK' if ok else 'NG'}")
+
+        # error イベントは DifyError
+        stub.payload = raw[:raw.index(b'"text_chunk"') + 2000].rsplit(b"\n\n", 1)[0] + (
+            b'\n\ndata: {"event": "error", "status": 500, "code": "internal", "message": "model overloaded"}\n\n'
+        )
+        try:
+            await dify.run_reading_question_stream(user_id=1)
+            bad += 1
+            print("error event: NG (no exception)")
+        except dify.DifyError as e:
+            print(f"error event: OK ({e})")
+    finally:
+        await dify.close_client()
+        server.close()
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
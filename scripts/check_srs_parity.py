@@ -0,0 +1,58 @@
+# scripts/check_srs_parity.py  (srs_sm2() と srs.update_srs の一致確認)
+# 使い方: python scripts/check_srs_parity.py   ※ 先に apply_schema.py で srs_sm2() を作成しておく
+# (easiness, interval, streak, quality) の格子を1クエリでDBに投げ、Python版と全件比較する。
+import asyncio, os, sys, itertools, datetime
+from dotenv import load_dotenv
+import asyncpg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from srs import update_srs  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+
+GRID_SQL = """
+SELECT g.idx, f.easiness, f.interval_days, f.consecutive_correct,
+       (f.next_review - CURRENT_DATE) AS days
+FROM unnest($1::float8[], $2::float8[], $3::int[], $4::int[])
+     WITH ORDINALITY AS g(e, i, c, q, idx),
+     LATERAL srs_sm2(g.e, g.i, g.c, g.q) f
+ORDER BY g.idx
+"""
+
+def grid():
+    easiness = [1.3, 1.31, 1.36, 1.5, 1.7, 2.0, 2.18, 2.36, 2.5, 2.6, 2.8, 3.0, 3.5]
+    easiness += [round(1.3 + k * 0.01, 2) for k in range(0, 171, 7)]
+    intervals = [0, 1, 2, 3, 4, 5, 6, 7, 10, 13, 21, 30, 45, 60, 89, 120, 200, 365, 1000]
+    streaks = [0, 1, 2, 3, 5, 10]
+    qualities = [0, 1, 2, 3, 4, 5]
+    return list(itertools.product(easiness, intervals, streaks, qualities))
+
+async def main():
+    if not DSN:
+        print("❌ DATABASE_PUBLIC_URL / DATABASE_URL が未設定です。", file=sys.stderr)
+        sys.exit(1)
+
+    cases = grid()
+    con = await asyncpg.connect(DSN)
+    try:
+        rows = await con.fetch(GRID_SQL, *[list(col) for col in zip(*cases)])
+    finally:
+        await con.close()
+
+    today = datetime.date.today()
+    ng = 0
+    for (e, i, c, q), r in zip(cases, rows):
+        pe, pi, pc, pnext = update_srs(e, i, c, q)
+        got = (r["easiness"], r["interval_days"], r["consecutive_correct"], r["days"])
+        want = (pe, pi, pc, (pnext - today).days)
+        if got != want:
+            ng += 1
+            if ng <= 20:
+                print(f"NG input={(e, i, c, q)} sql={got} python={want}", file=sys.stderr)
+
+    print(f"Parity: cases={len(cases)}, NG={ng}")
+    sys.exit(1 if ng else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,251 @@
+# scripts/dify_stub.py  (Dify の代わりに応答するローカルスタブ。トークンを使わずに負荷試験・ベンチをするため)
+# 使い方:
+#   単体で起動: python scripts/dify_stub.py --port 8001 --latency lognormal:2,0.5 --error-rate 0.05 --fence mixed --shape mixed
+#     → 表示される DIFY_ENDPOINT_RUN / DIFY_ENDPOINT_CHAT を Bot やスクリプトの環境変数に入れる（API キーは何でもよい）
+#   スクリプトから: from dify_stub import DifyStub, StubConfig
+#     stub = DifyStub(StubConfig(latency="const:0.05")); base = await stub.start(); ...; await stub.close()
+#
+# 対応するもの
+#   ・POST /v1/workflows/run   … inputs に "Question" があれば読解の採点、無ければ出題の JSON を outputs.text で返す
+#   ・POST /v1/chat-messages   … conversation_id が空なら出題して会話を作り、あれば採点（他ユーザー・未知の会話は 404）
+#   ・response_mode=streaming は SSE（workflow: text_chunk → workflow_finished / chat: message → message_end）
+#   ・応答時間の分布 --latency: const:秒 / uniform:最小,最大 / lognormal:中央値,sigma / pareto:最小,alpha（上限 --latency-cap）
+#   ・--error-rate の割合で --error-status（既定 500）を返す
+#   ・--fence: json（```json フェンス付き）/ plain（``` のみ）/ none / mixed（リクエストごとに選ぶ）
+#   ・--shape: blocking 応答の形。data（{"data":{"outputs":{"text"}}}）/ outputs（{"outputs":{"text"}}）/ text（{"text"}）/ mixed
+#   ・--passage-words で出題の本文を水増しできる（大きな応答のベンチ用）
+import argparse, asyncio, itertools, json, os, random, time
+from dataclasses import dataclass
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "dify_question_stream.sse")
+FENCES = ("json", "plain", "none")
+SHAPES = ("data", "outputs", "text")
+
+GRADE = {
+    "questions": [
+        {"q1_reason": "The notice says the elevators will be closed for maintenance.", "feedback": "Good reading of the first line."},
+        {"q2_reason": "Staff are told to use the west elevators or the stairs.", "feedback": "Check the details in the last paragraph."},
+    ],
+    "overall_feedback": "Nice work. Keep scanning for the key instructions.",
+}
+
+def recorded_question() -> dict:
+    """記録済み SSE の workflow_finished から出題 JSON を取り出す（フェンスは外す）"""
+    with open(FIXTURE, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("data:") and '"workflow_finished"' in line:
+                text = json.loads(line[5:])["data"]["outputs"]["text"].strip()
+                if text.startswith("```"):
+                    text = text.split("\n", 1)[1].rstrip("`").rstrip()
+                return json.loads(text)
+    raise SystemExit("fixture has no workflow_finished event")
+
+@dataclass
+class StubConfig:
+    latency: str = "const:0"
+    latency_cap: float = 60.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    fence: str = "json"
+    shape: str = "data"
+    chunk_chars: int = 24         # streaming で1イベントに載せる文字数
+    chunk_delay: float = 0.0      # streaming のイベント間隔（秒）
+    passage_words: int = 0
+    seed: int = 0
+
+class DifyStub:
+    def __init__(self, config: StubConfig | None = None):
+        self.config = config or StubConfig()
+        self.rng = random.Random(self.config.seed)
+        self.question = recorded_question()
+        if self.config.passage_words:
+            filler = " ".join(itertools.islice(itertools.cycle(self.question["passage"].split()), self.config.passage_words))
+            self.question["passage"] = filler
+        self.conversations = {}   # conversation_id -> user
+        self.requests = 0
+        self.errors = 0
+        self.by_path = {}
+        self._server = None
+        self._ids = itertools.count(1)
+
+    # ---------- 起動・停止 ----------
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """起動して base URL（…/v1）を返す"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return f"http://{host}:{self._server.sockets[0].getsockname()[1]}/v1"
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def env(self, base: str) -> dict:
+        return {"DIFY_ENDPOINT_RUN": f"{base}/workflows/run", "DIFY_ENDPOINT_CHAT": f"{base}/chat-messages"}
+
+    # ---------- 応答の中身 ----------
+    def _latency(self) -> float:
+        kind, _, args = self.config.latency.partition(":")
+        a = [float(x) for x in args.split(",") if x] or [0.0]
+        if kind == "const":
+            v = a[0]
+        elif kind == "uniform":
+            v = self.rng.uniform(a[0], a[1])
+        elif kind == "lognormal":
+            v = a[0] * self.rng.lognormvariate(0.0, a[1])
+        elif kind == "pareto":
+            v = a[0] * self.rng.paretovariate(a[1])
+        else:
+            raise ValueError(f"unknown latency distribution: {self.config.latency}")
+        return min(v, self.config.latency_cap)
+
+    def _pick(self, value: str, choices) -> str:
+        return self.rng.choice(choices) if value == "mixed" else value
+
+    def _text(self, obj: dict) -> str:
+        raw = json.dumps(obj, ensure_ascii=False, indent=2)
+        fence = self._pick(self.config.fence, FENCES)
+        if fence == "json":
+            return f"```json\n{raw}\n```"
+        if fence == "plain":
+            return f"```\n{raw}\n```"
+        return raw
+
+    def _blocking_body(self, text: str) -> dict:
+        shape = self._pick(self.config.shape, SHAPES)
+        if shape == "data":
+            return {"task_id": "stub", "data": {"status": "succeeded", "outputs": {"text": text}}}
+        if shape == "outputs":
+            return {"outputs": {"text": text}}
+        return {"text": text}
+
+    # ---------- HTTP ----------
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                method, path, _ = head.split(b"\r\n", 1)[0].decode().split(" ", 2)
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = json.loads(await reader.readexactly(length) or b"{}")
+                self.requests += 1
+                self.by_path[path] = self.by_path.get(path, 0) + 1
+                await asyncio.sleep(self._latency())
+
+                if self.rng.random() < self.config.error_rate:
+                    self.errors += 1
+                    await self._json(writer, self.config.error_status, {"code": "internal_error", "message": "stub error"})
+                elif method == "POST" and path.endswith("/workflows/run"):
+                    await self._workflow(writer, body)
+                elif method == "POST" and path.endswith("/chat-messages"):
+                    await self._chat(writer, body)
+                else:
+                    await self._json(writer, 404, {"code": "not_found", "message": path})
+                if body.get("response_mode") == "streaming":
+                    break  # SSE は Connection: close で返している
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # クライアントが切った（タイムアウト・ヘッジ・取り消し）
+        finally:
+            writer.close()
+
+    async def _json(self, writer, status: int, obj: dict):
+        data = json.dumps(obj, ensure_ascii=False).encode()
+        writer.write(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                     % (status, len(data), data))
+        await writer.drain()
+
+    async def _sse(self, writer, events):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        for ev in events:
+            data = b"data: " + json.dumps(ev, ensure_ascii=False).encode() + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+            if self.config.chunk_delay:
+                await asyncio.sleep(self.config.chunk_delay)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _chunks(self, text: str):
+        n = max(self.config.chunk_chars, 1)
+        return [text[i:i + n] for i in range(0, len(text), n)]
+
+    async def _workflow(self, writer, body: dict):
+        inputs = body.get("inputs") or {}
+        text = self._text(GRADE if "Question" in inputs else self.question)
+        if body.get("response_mode") != "streaming":
+            await self._json(writer, 200, self._blocking_body(text))
+            return
+        run_id = f"run-{next(self._ids)}"
+        events = [{"event": "workflow_started", "workflow_run_id": run_id, "data": {"id": run_id}}]
+        events += [{"event": "text_chunk", "workflow_run_id": run_id, "data": {"text": c}} for c in self._chunks(text)]
+        events.append({"event": "workflow_finished", "workflow_run_id": run_id,
+                       "data": {"id": run_id, "status": "succeeded", "outputs": {"text": text}}})
+        await self._sse(writer, events)
+
+    async def _chat(self, writer, body: dict):
+        conv, user = body.get("conversation_id") or "", body.get("user")
+        if not conv:
+            conv = f"conv-{next(self._ids)}"
+            self.conversations[conv] = user
+            text = self._text(self.question)
+        elif self.conversations.get(conv) == user:
+            text = self._text(GRADE)
+        else:
+            await self._json(writer, 404, {"code": "not_found", "message": "Conversation Not Exists."})
+            return
+        msg_id = f"msg-{next(self._ids)}"
+        if body.get("response_mode") != "streaming":
+            await self._json(writer, 200, {"event": "message", "message_id": msg_id, "conversation_id": conv,
+                                           "answer": text, "created_at": int(time.time())})
+            return
+        events = [{"event": "message", "message_id": msg_id, "conversation_id": conv, "answer": c}
+                  for c in self._chunks(text)]
+        events.append({"event": "message_end", "message_id": msg_id, "conversation_id": conv})
+        await self._sse(writer, events)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "by_path": dict(self.by_path),
+                "conversations": len(self.conversations)}
+
+async def serve(args):
+    stub = DifyStub(StubConfig(
+        latency=args.latency, latency_cap=args.latency_cap, error_rate=args.error_rate,
+        error_status=args.error_status, fence=args.fence, shape=args.shape,
+        chunk_chars=args.chunk_chars, chunk_delay=args.chunk_delay,
+        passage_words=args.passage_words, seed=args.seed,
+    ))
+    base = await stub.start(args.host, args.port)
+    for k, v in stub.env(base).items():
+        print(f"{k}={v}")
+    print("Ctrl+C で停止", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(stub.stats(), flush=True)
+    finally:
+        await stub.close()
+
+def main():
+    p = argparse.ArgumentParser(description="Dify stub server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8001)
+    p.add_argument("--latency", default="const:0")
+    p.add_argument("--latency-cap", type=float, default=60.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--error-status", type=int, default=500)
+    p.add_argument("--fence", choices=FENCES + ("mixed",), default="json")
+    p.add_argument("--shape", choices=SHAPES + ("mixed",), default="data")
+    p.add_argument("--chunk-chars", type=int, default=24)
+    p.add_argument("--chunk-delay", type=float, default=0.0)
+    p.add_argument("--passage-words", type=int, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    try:
+        asyncio.run(serve(p.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
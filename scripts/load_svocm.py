@@ -0,0 +1,233 @@
+# scripts/load_svocm.py  (SVOCM の英文を CSV / JSONL から svocm_items に一括投入：COPY → 1回のマージ)
+# 使い方: SVOCM_PATH=data/svocm.jsonl python scripts/load_svocm.py
+#   ・拡張子 .jsonl / .ndjson は1行1件の JSON: {"sentence_en", "pattern", "level", "tags": [...], "gold": {"s": ..., ...}}
+#   ・それ以外は CSV: sentence_en（または sentence）, pattern, level, tags（"," か "|" 区切り）,
+#     正解は gold（JSON 文字列）か s / v / o1 / o2 / c / m の列（m は "/" 区切りで複数）。正解の無い行は Dify 採点になる
+#   ・SVOCM_CHUNK 件ずつ一時テーブルに COPY し、最後に INSERT ... ON CONFLICT (sentence_hash) を1回だけ流す
+#     （全体が1トランザクションなので、Bot のインデックスへの再読み込み通知はコミット時にまとめて届く）
+#   ・重複は正規化した英文（NFKC・小文字・空白の揺れ）の md5 で判定。ファイル内の重複は後の行を採る。
+#     既存の問題は pattern / level / tags / 正解が変わったときだけ更新する（正解が空の行では既存の正解を消さない）
+#   ・不正な行は飛ばして NG に数え、最初の1件の詳細を最後に出す（load_words.py と同じ。NG があれば exit 2）
+import asyncio, csv, hashlib, json, os, sys, time, traceback, unicodedata
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+PATH = os.getenv("SVOCM_PATH") or "data/svocm.jsonl"
+LIMIT = int(os.getenv("SVOCM_LIMIT") or 0)       # テスト投入数（0で全件）
+CHUNK = int(os.getenv("SVOCM_CHUNK") or 50_000)  # 1回の COPY に載せる行数
+SOURCE = os.getenv("SVOCM_SOURCE") or "import"   # svocm_items.source に入れる値
+
+SLOTS = ("s", "v", "o1", "o2", "c", "m")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS svocm_items (
+  item_id SERIAL PRIMARY KEY,
+  sentence_en TEXT NOT NULL,
+  pattern INT,
+  level INT,
+  tags TEXT[],
+  source TEXT DEFAULT 'static',
+  created_at TIMESTAMPTZ DEFAULT now()
+);
+ALTER TABLE svocm_items ADD COLUMN IF NOT EXISTS gold JSONB;
+ALTER TABLE svocm_items ADD COLUMN IF NOT EXISTS sentence_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_svocm_items_sentence_hash ON svocm_items(sentence_hash);
+"""
+
+STAGE_SQL = """
+CREATE TEMP TABLE svocm_stage (
+  line INT NOT NULL,
+  sentence_hash TEXT NOT NULL,
+  sentence_en TEXT NOT NULL,
+  pattern INT,
+  level INT,
+  tags TEXT[],
+  gold JSONB
+) ON COMMIT DROP
+"""
+STAGE_COLUMNS = ("line", "sentence_hash", "sentence_en", "pattern", "level", "tags", "gold")
+
+# 既存行のうち sentence_hash が無いもの（手で入れた問題など）。同じ文が複数あれば item_id の小さい方だけに付ける
+BACKFILL_SELECT_SQL = "SELECT item_id, sentence_en FROM svocm_items WHERE sentence_hash IS NULL"
+BACKFILL_UPDATE_SQL = """
+UPDATE svocm_items i SET sentence_hash = b.sentence_hash
+FROM (
+  SELECT DISTINCT ON (sentence_hash) item_id, sentence_hash
+  FROM svocm_backfill
+  WHERE sentence_hash NOT IN (SELECT sentence_hash FROM svocm_items WHERE sentence_hash IS NOT NULL)
+  ORDER BY sentence_hash, item_id
+) b
+WHERE i.item_id = b.item_id
+"""
+
+MERGE_SQL = """
+WITH src AS (
+  SELECT DISTINCT ON (sentence_hash) sentence_hash, sentence_en, pattern, level, tags, gold
+  FROM svocm_stage
+  ORDER BY sentence_hash, line DESC
+), m AS (
+  INSERT INTO svocm_items(sentence_en, pattern, level, tags, gold, source, sentence_hash)
+  SELECT sentence_en, pattern, level, tags, gold, $1, sentence_hash FROM src
+  ON CONFLICT (sentence_hash) DO UPDATE
+  SET pattern=EXCLUDED.pattern,
+      level=EXCLUDED.level,
+      tags=EXCLUDED.tags,
+      gold=COALESCE(EXCLUDED.gold, svocm_items.gold)
+  WHERE (svocm_items.pattern, svocm_items.level, svocm_items.tags, svocm_items.gold)
+        IS DISTINCT FROM (EXCLUDED.pattern, EXCLUDED.level, EXCLUDED.tags, COALESCE(EXCLUDED.gold, svocm_items.gold))
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT (SELECT count(*) FROM src) AS distinct_rows,
+       count(*) FILTER (WHERE inserted) AS inserted,
+       count(*) FILTER (WHERE NOT inserted) AS updated
+FROM m
+"""
+
+def sentence_hash(sentence: str) -> str:
+    """重複判定用: NFKC・小文字・空白の揺れを除いた英文の md5"""
+    norm = " ".join(unicodedata.normalize("NFKC", sentence).lower().split())
+    return hashlib.md5(norm.encode("utf-8")).hexdigest()
+
+def to_int(v, name: str, lo: int | None = None, hi: int | None = None):
+    if v is None or (isinstance(v, str) and not v.strip()):
+        return None
+    n = int(v)
+    if (lo is not None and n < lo) or (hi is not None and n > hi):
+        raise ValueError(f"{name} out of range: {n}")
+    return n
+
+def to_tags(v):
+    if not v:
+        return None
+    if isinstance(v, str):
+        v = v.replace("，", ",").replace("|", ",").split(",")
+    tags = [str(t).strip() for t in v if str(t).strip()]
+    return tags or None
+
+def to_gold(row: dict):
+    """gold（dict / JSON 文字列）か s〜m の列から正解を作る。どの枠も空なら None"""
+    gold = row.get("gold")
+    if isinstance(gold, str):
+        gold = json.loads(gold) if gold.strip() else None
+    if gold is None:
+        gold = {}
+        for k in SLOTS:
+            v = (row.get(k) or "").strip()
+            if v:
+                gold[k] = [p.strip() for p in v.split("/") if p.strip()] if k == "m" else v
+    if not isinstance(gold, dict):
+        raise ValueError("gold must be an object")
+    gold = {k: v for k, v in gold.items() if k in SLOTS and v}
+    return json.dumps(gold, ensure_ascii=False) if gold else None
+
+def row_to_record(line: int, row: dict):
+    sentence = " ".join(str(row.get("sentence_en") or row.get("sentence") or "").split())
+    if not sentence:
+        raise ValueError("required column empty (sentence_en)")
+    return (
+        line, sentence_hash(sentence), sentence,
+        to_int(row.get("pattern"), "pattern", 1, 5), to_int(row.get("level"), "level"),
+        to_tags(row.get("tags")), to_gold(row),
+    )
+
+def read_rows(path: str):
+    """(行番号, dict) を順に返す。JSONL の壊れた行は dict の代わりに例外を返す"""
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError as e:
+                    yield line, e
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from enumerate(csv.DictReader(f), start=1)
+
+async def backfill_hashes(con) -> int:
+    rows = await con.fetch(BACKFILL_SELECT_SQL)
+    if not rows:
+        return 0
+    await con.execute("CREATE TEMP TABLE svocm_backfill (item_id INT, sentence_hash TEXT) ON COMMIT DROP")
+    await con.copy_records_to_table("svocm_backfill", records=[(r["item_id"], sentence_hash(r["sentence_en"])) for r in rows])
+    return int((await con.execute(BACKFILL_UPDATE_SQL)).split()[-1])
+
+async def load(con, path: str, limit: int = 0, chunk: int = CHUNK, source: str = SOURCE, progress: bool = True) -> dict:
+    """path を svocm_items に取り込んで件数を返す（1トランザクション）"""
+    await con.execute(SCHEMA_SQL)
+    stats = {"read": 0, "ok": 0, "ng": 0, "first_error": None, "first_error_row": None}
+    t0 = time.perf_counter()
+    async with con.transaction():
+        stats["backfilled"] = await backfill_hashes(con)
+        await con.execute(STAGE_SQL)
+        buf = []
+        for line, row in read_rows(path):
+            if limit and stats["read"] >= limit:
+                break
+            stats["read"] += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                buf.append(row_to_record(line, row))
+                stats["ok"] += 1
+            except Exception as e:
+                stats["ng"] += 1
+                if stats["first_error"] is None:
+                    stats["first_error"], stats["first_error_row"] = e, (line, row if isinstance(row, dict) else {})
+            if len(buf) >= chunk:
+                await con.copy_records_to_table("svocm_stage", records=buf, columns=STAGE_COLUMNS)
+                buf = []
+                if progress:
+                    dt = time.perf_counter() - t0
+                    print(f"...progress: read={stats['read']}, OK={stats['ok']}, NG={stats['ng']}, {stats['read'] / dt:,.0f} rows/s")
+        if buf:
+            await con.copy_records_to_table("svocm_stage", records=buf, columns=STAGE_COLUMNS)
+        stats["staged_sec"] = time.perf_counter() - t0
+        r = await con.fetchrow(MERGE_SQL, source)
+    stats["distinct"] = r["distinct_rows"]
+    stats["inserted"] = r["inserted"]
+    stats["updated"] = r["updated"]
+    stats["unchanged"] = r["distinct_rows"] - r["inserted"] - r["updated"]
+    stats["duplicates"] = stats["ok"] - r["distinct_rows"]
+    stats["total_sec"] = time.perf_counter() - t0
+    return stats
+
+def report(stats: dict):
+    print(f"Import done: OK={stats['ok']}, NG={stats['ng']}, duplicates in file={stats['duplicates']}")
+    print(f"  inserted={stats['inserted']}, updated={stats['updated']}, unchanged={stats['unchanged']}"
+          f", hash backfilled={stats['backfilled']}")
+    print(f"  staged in {stats['staged_sec']:.1f}s, total {stats['total_sec']:.1f}s"
+          f" ({stats['read'] / max(stats['total_sec'], 1e-9):,.0f} rows/s)")
+    if stats["first_error"]:
+        e, (line, row) = stats["first_error"], stats["first_error_row"]
+        print("---- First error detail ----", file=sys.stderr)
+        print(f"Row line: {line}", file=sys.stderr)
+        compact = {k: (str(v)[:200] if v is not None else v) for k, v in row.items()}
+        print(f"Row data: {compact}", file=sys.stderr)
+        print("Exception:", repr(e), file=sys.stderr)
+        traceback.print_exception(type(e), e, e.__traceback__)
+
+async def main():
+    if not DSN:
+        print("❌ DATABASE_PUBLIC_URL / DATABASE_URL が未設定です。", file=sys.stderr)
+        sys.exit(1)
+
+    print("DB =", DSN[:80] + "...")
+    print("FILE =", PATH)
+
+    con = await asyncpg.connect(DSN)
+    try:
+        stats = await load(con, PATH, limit=LIMIT)
+    finally:
+        await con.close()
+
+    report(stats)
+    if stats["first_error"]:
+        # スキップしつつ続行したので exit 2 にしておく
+        sys.exit(2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,21 @@
 # scripts/load_words.py  (schema-aligned, robust)
-import asyncio, os, csv, asyncpg, sys, traceback
+# WORDS_LOAD_MODE=bulk（既定）: CSV を WORDS_CHUNK 行ずつ一時テーブルに COPY し、最後に1回の INSERT ... ON CONFLICT で words にマージ
+# WORDS_LOAD_MODE=row        : 1行ずつ UPSERT（DB 側で弾かれた行を特定したいとき。bulk のマージが失敗したときもこちらでやり直す）
+# どちらも行内容のハッシュ（words.content_hash）が変わった行だけ書き換え、inserted / updated / unchanged / deleted を数える。
+# CSV に無い単語は数えるだけで、WORDS_PRUNE=1 のときだけ削除する（srs_state も消える。WORDS_LIMIT 指定時は削除しない）。
+# 実際に変更があったときだけ catalog_versions の words の版を上げて NOTIFY する（Bot は版を見比べて読み直す）
+import asyncio, os, csv, asyncpg, hashlib, json, sys, time, traceback
 from dotenv import load_dotenv
 
 load_dotenv()
 DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
 CSV_PATH = os.getenv("WORDS_CSV_PATH") or "data/All-words-modified_2025-10-29_08-31-22.csv"
 LIMIT = int(os.getenv("WORDS_LIMIT") or 0)   # テスト投入数（0で全件）
+LOAD_MODE = os.getenv("WORDS_LOAD_MODE") or "bulk"
+CHUNK = int(os.getenv("WORDS_CHUNK") or 20_000)   # bulk で1回の COPY に載せる行数
+PRUNE = os.getenv("WORDS_PRUNE") == "1"             # CSV に無い単語を削除する
+WORDS_CHANNEL = "words_changed"              # catalog.WORDS_CHANNEL と同じ
+WORDS_VERSION_NAME = "words"                 # catalog.WORDS_VERSION_NAME と同じ
 
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS words (
@@ -24,11 +34,17 @@ CREATE TABLE IF NOT EXISTS words (
 );
 -- 念のため指数
 CREATE UNIQUE INDEX IF NOT EXISTS ux_words_word ON words(word);
+ALTER TABLE words ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE TABLE IF NOT EXISTS catalog_versions (
+  name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
 """
 
 UPSERT_SQL = """
-INSERT INTO words(word, jp, pos, cefr, level, topic_tags, synonyms, antonyms, derived, example_en, example_ja)
-VALUES($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11)
+INSERT INTO words(word, jp, pos, cefr, level, topic_tags, synonyms, antonyms, derived, example_en, example_ja, content_hash)
+VALUES($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12)
 ON CONFLICT (word) DO UPDATE
 SET jp=EXCLUDED.jp,
     pos=EXCLUDED.pos,
@@ -39,7 +55,74 @@ SET jp=EXCLUDED.jp,
     antonyms=EXCLUDED.antonyms,
     derived=EXCLUDED.derived,
     example_en=EXCLUDED.example_en,
-    example_ja=EXCLUDED.example_ja;
+    example_ja=EXCLUDED.example_ja,
+    content_hash=EXCLUDED.content_hash
+WHERE words.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+RETURNING (xmax = 0) AS inserted;
+"""
+
+COLUMNS = ("word", "jp", "pos", "cefr", "level", "topic_tags", "synonyms", "antonyms", "derived", "example_en", "example_ja",
+           "content_hash")
+
+# bulk: 一時テーブル（WAL を書かない）に COPY してからまとめてマージする
+STAGE_SQL = """
+CREATE TEMP TABLE words_stage (
+  line INT NOT NULL,
+  word TEXT NOT NULL,
+  jp TEXT NOT NULL,
+  pos TEXT,
+  cefr TEXT,
+  level INT,
+  topic_tags TEXT[],
+  synonyms TEXT[],
+  antonyms TEXT[],
+  derived TEXT[],
+  example_en TEXT,
+  example_ja TEXT,
+  content_hash TEXT NOT NULL
+) ON COMMIT DROP
+"""
+
+# CSV 内で同じ word が複数あれば後の行を採る（1行ずつ UPSERT したときと同じ結果）。ハッシュが同じ行は触らない
+MERGE_SQL = """
+WITH src AS (
+  SELECT DISTINCT ON (word) word, jp, pos, cefr, level, topic_tags, synonyms, antonyms, derived, example_en, example_ja,
+         content_hash
+  FROM words_stage
+  ORDER BY word, line DESC
+), m AS (
+  INSERT INTO words(word, jp, pos, cefr, level, topic_tags, synonyms, antonyms, derived, example_en, example_ja, content_hash)
+  SELECT * FROM src
+  ON CONFLICT (word) DO UPDATE
+  SET jp=EXCLUDED.jp,
+      pos=EXCLUDED.pos,
+      cefr=EXCLUDED.cefr,
+      level=EXCLUDED.level,
+      topic_tags=EXCLUDED.topic_tags,
+      synonyms=EXCLUDED.synonyms,
+      antonyms=EXCLUDED.antonyms,
+      derived=EXCLUDED.derived,
+      example_en=EXCLUDED.example_en,
+      example_ja=EXCLUDED.example_ja,
+      content_hash=EXCLUDED.content_hash
+  WHERE words.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT (SELECT count(*) FROM src) AS distinct_rows,
+       count(*) FILTER (WHERE inserted) AS inserted,
+       count(*) FILTER (WHERE NOT inserted) AS updated
+FROM m
+"""
+
+# CSV に出てきた単語（NG の行も含む）。これに無い words の行が「削除対象」
+SEEN_SQL = "CREATE TEMP TABLE words_seen (word TEXT NOT NULL)"
+MISSING_SQL = "SELECT count(*) FROM words w WHERE NOT EXISTS (SELECT 1 FROM words_seen s WHERE s.word = w.word)"
+PRUNE_SQL = "DELETE FROM words w WHERE NOT EXISTS (SELECT 1 FROM words_seen s WHERE s.word = w.word)"
+
+BUMP_SQL = """
+INSERT INTO catalog_versions(name, version) VALUES($1, 1)
+ON CONFLICT (name) DO UPDATE SET version=catalog_versions.version + 1, updated_at=now()
+RETURNING version
 """
 
 def to_array(s: str):
@@ -79,6 +162,114 @@ def row_to_params(row: dict):
     # word/jp は NOT NULL。空ならスキップ対象に。
     return (word, jp, pos, cefr, level, topic_tags, synonyms, antonyms, derived, example_en, example_ja)
 
+def content_hash(params) -> str:
+    """word 以外の列の内容ハッシュ（同じなら UPSERT しない）"""
+    blob = json.dumps(params[1:], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.md5(blob.encode("utf-8")).hexdigest()
+
+def new_stats() -> dict:
+    return {"mode": None, "ok": 0, "ng": 0, "first_error": None, "first_error_row": None,
+            "inserted": 0, "updated": 0, "unchanged": 0, "missing": 0, "deleted": 0, "version": None,
+            "seen": set()}
+
+def note_error(stats: dict, e: Exception, idx: int, row: dict):
+    stats["ng"] += 1
+    if stats["first_error"] is None:
+        stats["first_error"] = e
+        stats["first_error_row"] = (idx, dict(row))
+
+def read_params(path: str, limit: int, stats: dict):
+    """CSV を読み、(行番号, パラメータ) を返す。NOT NULL 列が空の行は NG に数えて飛ばす"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for idx, row in enumerate(reader, start=1):
+            if limit and idx > limit:
+                break
+
+            params = row_to_params(row)
+            word, jp = params[0], params[1]
+            if word:
+                stats["seen"].add(word)  # NG の行の単語も「CSV にある」ものとして削除対象から外す
+            if not word or not jp:  # NOT NULLカラムの欠落はスキップ
+                note_error(stats, ValueError("required column empty (word/jp)"), idx, row)
+                continue
+            yield idx, row, params
+
+async def finish(con, stats: dict, prune: bool, limit: int):
+    """CSV に無い単語を数え（prune なら削除し）、変更があれば版を上げる"""
+    if stats["seen"]:
+        await con.execute(SEEN_SQL)
+        await con.copy_records_to_table("words_seen", records=[(w,) for w in stats["seen"]])
+        stats["missing"] = await con.fetchval(MISSING_SQL)
+        if prune and stats["missing"]:
+            if limit:
+                print("⚠️ WORDS_LIMIT 指定中なので削除はしません", file=sys.stderr)
+            else:
+                stats["deleted"] = int((await con.execute(PRUNE_SQL)).split()[-1])
+        await con.execute("DROP TABLE words_seen")
+    if stats["inserted"] or stats["updated"] or stats["deleted"]:
+        stats["version"] = await con.fetchval(BUMP_SQL, WORDS_VERSION_NAME)
+
+async def load_rows(pool, path: str, limit: int = 0, prune: bool = PRUNE) -> dict:
+    """1行ずつ UPSERT する。DB 側で弾かれた行も1行単位で NG に数える"""
+    stats = new_stats()
+    stats["mode"] = "row"
+    for idx, row, params in read_params(path, limit, stats):
+        try:
+            async with pool.acquire() as con:
+                r = await con.fetchrow(UPSERT_SQL, *params, content_hash(params))
+            stats["ok"] += 1
+            if r is None:
+                stats["unchanged"] += 1
+            elif r["inserted"]:
+                stats["inserted"] += 1
+            else:
+                stats["updated"] += 1
+        except Exception as e:
+            note_error(stats, e, idx, row)
+
+        if idx % 1000 == 0:
+            print(f"...progress: read={idx}, OK={stats['ok']}, NG={stats['ng']}")
+    async with pool.acquire() as con:
+        await finish(con, stats, prune, limit)
+    return stats
+
+async def load_bulk(pool, path: str, limit: int = 0, chunk: int = CHUNK, prune: bool = PRUNE) -> dict:
+    """一時テーブルに COPY してから1文でマージする（全体で1トランザクション）"""
+    stats = new_stats()
+    stats["mode"] = "bulk"
+    async with pool.acquire() as con:
+        async with con.transaction():
+            await con.execute(STAGE_SQL)
+            buf = []
+            for idx, row, params in read_params(path, limit, stats):
+                buf.append((idx, *params, content_hash(params)))
+                if len(buf) >= chunk:
+                    await con.copy_records_to_table("words_stage", records=buf, columns=("line", *COLUMNS))
+                    stats["ok"] += len(buf)
+                    buf = []
+                    print(f"...progress: read={idx}, OK={stats['ok']}, NG={stats['ng']}")
+            if buf:
+                await con.copy_records_to_table("words_stage", records=buf, columns=("line", *COLUMNS))
+                stats["ok"] += len(buf)
+            if stats["ok"]:
+                r = await con.fetchrow(MERGE_SQL)
+                stats["inserted"], stats["updated"] = r["inserted"], r["updated"]
+                # CSV 内で重複した単語は後の行だけが数に入る
+                stats["unchanged"] = r["distinct_rows"] - r["inserted"] - r["updated"]
+            await finish(con, stats, prune, limit)
+    return stats
+
+async def load(pool, path: str, mode: str = LOAD_MODE, limit: int = 0, prune: bool = PRUNE) -> dict:
+    if mode == "row":
+        return await load_rows(pool, path, limit, prune)
+    try:
+        return await load_bulk(pool, path, limit, prune=prune)
+    except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        # COPY / マージで DB に弾かれた: どの行かを特定するため1行ずつやり直す（bulk はロールバック済み）
+        print(f"⚠️ bulk 投入に失敗したので1行ずつやり直します: {e!r}", file=sys.stderr)
+        return await load_rows(pool, path, limit, prune)
+
 async def main():
     if not DSN:
         print("❌ DATABASE_PUBLIC_URL / DATABASE_URL が未設定です。", file=sys.stderr)
@@ -86,48 +277,31 @@ async def main():
 
     print("DB =", DSN[:80] + "...")
     print("CSV =", CSV_PATH)
+    print("MODE =", LOAD_MODE)
 
     pool = await asyncpg.create_pool(DSN, min_size=1, max_size=5)
     async with pool.acquire() as con:
         await con.execute(SCHEMA_SQL)
 
-    ok = ng = 0
-    first_error = None
-    first_error_row = None
-
+    t0 = time.perf_counter()
     try:
-        with open(CSV_PATH, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for idx, row in enumerate(reader, start=1):
-                if LIMIT and idx > LIMIT:
-                    break
-
-                params = row_to_params(row)
-                word, jp = params[0], params[1]
-                if not word or not jp:  # NOT NULLカラムの欠落はスキップ
-                    ng += 1
-                    if first_error is None:
-                        first_error = ValueError("required column empty (word/jp)")
-                        first_error_row = (idx, dict(row))
-                    continue
-
-                try:
-                    async with pool.acquire() as con:
-                        await con.execute(UPSERT_SQL, *params)
-                    ok += 1
-                except Exception as e:
-                    ng += 1
-                    if first_error is None:
-                        first_error = e
-                        first_error_row = (idx, dict(row))
-
-                if idx % 1000 == 0:
-                    print(f"...progress: read={idx}, OK={ok}, NG={ng}")
+        stats = await load(pool, CSV_PATH, LOAD_MODE, LIMIT)
+
+        # 変更があったときだけ、起動中のBotに単語カタログの再読み込みを促す
+        if stats["version"] is not None:
+            async with pool.acquire() as con:
+                await con.execute("SELECT pg_notify($1, $2)", WORDS_CHANNEL, f"version={stats['version']}")
 
     finally:
         await pool.close()
 
-    print(f"Import done: OK={ok}, NG={ng}")
+    dt = time.perf_counter() - t0
+    ok, ng = stats["ok"], stats["ng"]
+    print(f"Import done: OK={ok}, NG={ng} ({stats['mode']}, {dt:.1f}s, {(ok + ng) / max(dt, 1e-9):,.0f} rows/s)")
+    print(f"  inserted={stats['inserted']}, updated={stats['updated']}, unchanged={stats['unchanged']}"
+          f", deleted={stats['deleted']} (not in CSV: {stats['missing']}{'' if PRUNE else ', WORDS_PRUNE=1 で削除'})")
+    print(f"  words version: {stats['version'] if stats['version'] is not None else '変更なし（据え置き）'}")
+    first_error, first_error_row = stats["first_error"], stats["first_error_row"]
     if first_error:
         print("---- First error detail ----", file=sys.stderr)
         print(f"Row idx: {first_error_row[0]}", file=sys.stderr)
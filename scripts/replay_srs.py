@@ -0,0 +1,143 @@
+# scripts/replay_srs.py  (study_logs から srs_state を再計算)
+# 使い方: python scripts/replay_srs.py
+#   SM-2 の定数を変えたときや、旧Bubbleの学習履歴を study_logs に取り込んだ後に実行する。
+#   ユーザー単位のチャンクで study_logs を読み、update_srs_batch で全カードを一斉に再生し、
+#   COPY → 一時テーブル → 一括マージで srs_state に書き戻す。
+#   既存の srs_state と食い違うカード（連続正解数か最後の結果がログの再生と合わない＝ログに無い解答で
+#   状態が作られている）は上書きせずに残し、skipped に数える。REPLAY_FORCE=1 ならそれも上書きする。
+import asyncio, os, sys, time
+from dotenv import load_dotenv
+import asyncpg
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from srs import update_srs_batch  # noqa: E402
+from srs_buffer import MERGE_SQL, FLUSH_COLUMNS  # noqa: E402
+
+load_dotenv()
+DSN = os.getenv("DATABASE_PUBLIC_URL") or os.getenv("DATABASE_URL")
+CHUNK_USERS = int(os.getenv("REPLAY_CHUNK_USERS") or 500)   # 1チャンクのユーザー数
+DRY_RUN = os.getenv("REPLAY_DRY_RUN") == "1"                # 1なら書き込まない
+FORCE = os.getenv("REPLAY_FORCE") == "1"                    # 1ならログで説明できないカードも上書きする
+
+USERS_SQL = """
+SELECT DISTINCT user_id FROM study_logs
+WHERE module='vocab' AND user_id > $1
+ORDER BY user_id
+LIMIT $2
+"""
+
+LOGS_SQL = """
+SELECT user_id, item_id, ts::date AS day, (result->>'quality')::int AS quality
+FROM study_logs
+WHERE module='vocab' AND user_id = ANY($1::text[])
+  AND item_id IS NOT NULL AND result ? 'quality'
+ORDER BY user_id, item_id, ts, log_id
+"""
+
+STATE_SQL = """
+SELECT user_id, word_id, consecutive_correct, last_result
+FROM srs_state
+WHERE user_id = ANY($1::text[])
+"""
+
+def explained(records, state):
+    """
+    再生結果のうち、今の srs_state をログで説明できるカード（状態が無い、または連続正解数と最後の結果が一致）だけを返す。
+    連続正解数と最後の結果は SM-2 の定数に依らないので、定数を変えたあとの再計算でも比べられる。
+    """
+    keep = []
+    for r in records:
+        cur = state.get((r[0], r[1]))
+        if cur is None or (cur["consecutive_correct"] == r[4] and cur["last_result"] == r[6]):
+            keep.append(r)
+    return keep
+
+def replay(rows):
+    """
+    (user_id, item_id) ごとに時系列順の解答を再生し、カード1枚につき1行を返す。
+    k 回目の解答を全カードで同時に処理するので、ループ回数は最長履歴の長さで済む。
+    """
+    n = len(rows)
+    users = np.array([r["user_id"] for r in rows], dtype=object)
+    items = np.fromiter((r["item_id"] for r in rows), dtype=np.int64, count=n)
+    q = np.fromiter((r["quality"] for r in rows), dtype=np.int64, count=n)
+    days = np.array([r["day"] for r in rows], dtype="datetime64[D]")
+
+    new_card = np.ones(n, dtype=bool)
+    new_card[1:] = (users[1:] != users[:-1]) | (items[1:] != items[:-1])
+    card = np.cumsum(new_card) - 1
+    starts = np.flatnonzero(new_card)
+    step = np.arange(n) - starts[card]
+    ncard = len(starts)
+
+    e = np.full(ncard, 2.5)
+    i = np.zeros(ncard)
+    c = np.zeros(ncard, dtype=np.int64)
+
+    order = np.argsort(step, kind="stable")
+    bounds = np.searchsorted(step[order], np.arange(step.max() + 2))
+    for k in range(len(bounds) - 1):
+        ev = order[bounds[k]:bounds[k + 1]]
+        idx = card[ev]
+        e[idx], i[idx], c[idx], _ = update_srs_batch(e[idx], i[idx], c[idx], q[ev])
+
+    last = np.r_[starts[1:], n] - 1
+    next_review = days[last] + i.astype(np.int64).astype("timedelta64[D]")
+    return list(zip(
+        users[starts].tolist(), items[starts].tolist(),
+        e.tolist(), i.astype(np.int64).tolist(), c.tolist(),
+        next_review.tolist(), q[last].tolist(),
+    ))
+
+async def write(con, records):
+    async with con.transaction():
+        await con.execute("""
+            CREATE TEMP TABLE srs_flush (
+              user_id TEXT, word_id INT, easiness NUMERIC, interval_days INT,
+              consecutive_correct INT, next_review DATE, last_result INT
+            ) ON COMMIT DROP
+        """)
+        await con.copy_records_to_table("srs_flush", records=records, columns=FLUSH_COLUMNS)
+        await con.execute(MERGE_SQL)
+
+async def main():
+    if not DSN:
+        print("❌ DATABASE_PUBLIC_URL / DATABASE_URL が未設定です。", file=sys.stderr)
+        sys.exit(1)
+
+    con = await asyncpg.connect(DSN)
+    n_users = n_logs = n_cards = n_skipped = 0
+    t0 = time.perf_counter()
+    try:
+        last_user = ""
+        while True:
+            users = [r["user_id"] for r in await con.fetch(USERS_SQL, last_user, CHUNK_USERS)]
+            if not users:
+                break
+            last_user = users[-1]
+
+            rows = await con.fetch(LOGS_SQL, users)
+            if rows:
+                records = replay(rows)
+                if not FORCE:
+                    state = {(r["user_id"], r["word_id"]): r for r in await con.fetch(STATE_SQL, users)}
+                    kept = explained(records, state)
+                    n_skipped += len(records) - len(kept)
+                    records = kept
+                if not DRY_RUN:
+                    await write(con, records)
+                n_logs += len(rows)
+                n_cards += len(records)
+            n_users += len(users)
+            print(f"...progress: users={n_users}, logs={n_logs}, cards={n_cards}, skipped={n_skipped}")
+    finally:
+        await con.close()
+
+    dt = time.perf_counter() - t0
+    rate = n_logs / dt if dt > 0 else 0
+    print(f"Replay done: users={n_users}, logs={n_logs}, cards={n_cards}, skipped={n_skipped}, "
+          f"{dt:.1f}s ({rate:,.0f} logs/s){' [dry-run]' if DRY_RUN else ''}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import base64
+import hashlib
+import hmac
+
+from config import SESSION_SECRET
+
+VERSION = 1
+MAC_BYTES = 8
+CUSTOM_ID_MAX = 100  # Discord の custom_id 上限
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _put_varint(buf: bytearray, n: int):
+    if n < 0:
+        raise ValueError("negative values are not supported")
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            buf.append(b | 0x80)
+        else:
+            buf.append(b)
+            return
+
+
+def _get_varint(data: bytes, pos: int):
+    n = shift = 0
+    while True:
+        if pos >= len(data) or shift > 140:
+            raise InvalidToken("truncated varint")
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _mac(namespace: str, action: str, body: bytes, user_id) -> bytes:
+    """namespace:action:payload:user の全体に対する HMAC（どの部分を差し替えても一致しない）"""
+    if not SESSION_SECRET:
+        raise RuntimeError("SESSION_SECRET is not set")
+    msg = b"\0".join((namespace.encode(), action.encode(), body, str(user_id).encode()))
+    return hmac.new(SESSION_SECRET.encode(), msg, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def encode(namespace: str, action: str, fields, user_id) -> str:
+    """
+    セッション状態（非負整数の列）を custom_id に詰める。
+    形式: "<namespace>:<action>:<base64url(version | varint... | HMAC)>"
+    HMAC は namespace・action・本体・user_id の全体で計算するので、他人のボタンや改ざんは decode で弾ける。
+    """
+    body = bytearray([VERSION])
+    for f in fields:
+        _put_varint(body, int(f))
+    token = base64.urlsafe_b64encode(bytes(body) + _mac(namespace, action, bytes(body), user_id)).rstrip(b"=").decode()
+    cid = f"{namespace}:{action}:{token}"
+    if len(cid) > CUSTOM_ID_MAX:
+        raise ValueError(f"custom_id too long ({len(cid)} > {CUSTOM_ID_MAX})")
+    return cid
+
+
+def decode(custom_id: str, user_id) -> tuple[str, str, list[int]]:
+    """encode の逆。署名・版・形式が合わなければ InvalidToken"""
+    try:
+        namespace, action, token = custom_id.split(":", 2)
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except Exception as e:
+        raise InvalidToken("malformed custom_id") from e
+    # 末尾の余りビットや余計な文字を変えても同じバイト列に戻るので、正規形（encode と同じ文字列）以外は拒否する
+    if base64.urlsafe_b64encode(raw).rstrip(b"=").decode() != token:
+        raise InvalidToken("non-canonical token")
+    if len(raw) < 1 + MAC_BYTES:
+        raise InvalidToken("token too short")
+
+    body, mac = raw[:-MAC_BYTES], raw[-MAC_BYTES:]
+    if not hmac.compare_digest(mac, _mac(namespace, action, body, user_id)):
+        raise InvalidToken("bad signature")
+    if body[0] != VERSION:
+        raise InvalidToken(f"unsupported version {body[0]}")
+
+    fields, pos = [], 1
+    while pos < len(body):
+        n, pos = _get_varint(body, pos)
+        fields.append(n)
+    return namespace, action, fields
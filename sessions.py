@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SEC = 180   # VocabSessionView の timeout と揃える
+SHARDS = 16
+SWEEP_INTERVAL_SEC = 30
+
+
+class _Entry:
+    __slots__ = ("value", "expires")
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+
+class SessionRegistry:
+    """
+    ユーザーID単位のセッション置き場。
+    シャード分割した dict にセッションを持ち、ユーザーごとの asyncio.Lock で
+    同一ユーザーの連打だけを直列化する（他ユーザーの操作は待たせない）。
+    最終操作から ttl 秒でセッションを捨てる。
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_SEC, shards: int = SHARDS, on_evict=None):
+        self.ttl = ttl
+        self.on_evict = on_evict  # (user_id, value) を受け取るコールバック
+        self._shards = [dict() for _ in range(shards)]
+        self._locks = [dict() for _ in range(shards)]
+        self._sweeper = None
+        self.evictions = 0
+
+    def _i(self, user_id: str) -> int:
+        return hash(user_id) % len(self._shards)
+
+    def get(self, user_id: str):
+        shard = self._shards[self._i(user_id)]
+        entry = shard.get(user_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.expires <= now:
+            self._evict(shard, user_id)
+            return None
+        entry.expires = now + self.ttl
+        return entry.value
+
+    def put(self, user_id: str, value):
+        self._shards[self._i(user_id)][user_id] = _Entry(value, time.monotonic() + self.ttl)
+
+    def pop(self, user_id: str):
+        entry = self._shards[self._i(user_id)].pop(user_id, None)
+        return None if entry is None else entry.value
+
+    def lock(self, user_id: str) -> asyncio.Lock:
+        locks = self._locks[self._i(user_id)]
+        lk = locks.get(user_id)
+        if lk is None:
+            lk = locks[user_id] = asyncio.Lock()
+        return lk
+
+    def _evict(self, shard, user_id):
+        entry = shard.pop(user_id, None)
+        if entry is None:
+            return
+        self.evictions += 1
+        if self.on_evict:
+            try:
+                self.on_evict(user_id, entry.value)
+            except Exception as e:
+                logger.warning(f"セッション破棄時の処理に失敗: {e}")
+
+    def sweep(self):
+        """期限切れセッションと、使われていないロックを掃除する"""
+        now = time.monotonic()
+        for shard, locks in zip(self._shards, self._locks):
+            for user_id in [u for u, e in shard.items() if e.expires <= now]:
+                self._evict(shard, user_id)
+            for user_id in [u for u, lk in locks.items() if not lk.locked() and u not in shard]:
+                locks.pop(user_id, None)
+
+    def stats(self) -> dict:
+        """セッション数・ロック数・おおよそのメモリ使用量（バイト）"""
+        sessions = sum(len(s) for s in self._shards)
+        locks = sum(len(lk) for lk in self._locks)
+        approx = sum(sys.getsizeof(s) for s in self._shards) + sum(sys.getsizeof(lk) for lk in self._locks)
+        for shard in self._shards:
+            for entry in shard.values():
+                approx += sys.getsizeof(entry) + sys.getsizeof(entry.value)
+        return {"sessions": sessions, "locks": locks, "evictions": self.evictions, "approx_bytes": approx}
+
+    async def _run_sweeper(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SEC)
+            self.sweep()
+
+    def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._run_sweeper())
+
+    def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
@@ -26,6 +26,15 @@ CREATE TABLE IF NOT EXISTS words (
   example_en TEXT,
   example_ja TEXT
 );
+-- scripts/load_words.py が入れる行内容のハッシュ（変わった行だけ更新する）
+ALTER TABLE words ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- カタログの版（name='words' など）。load_words.py が実際に行を変えたときだけ上げ、Bot は catalog.py で見比べて読み直す
+CREATE TABLE IF NOT EXISTS catalog_versions (
+  name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
 
 -- SRS（英単語）
 CREATE TABLE IF NOT EXISTS srs_state (
@@ -38,6 +47,46 @@ CREATE TABLE IF NOT EXISTS srs_state (
   last_result INT,
   PRIMARY KEY(user_id, word_id)
 );
+-- 復習期限の範囲検索（出題スケジューラ／苦手テスト）
+CREATE INDEX IF NOT EXISTS ix_srs_state_user_next ON srs_state(user_id, next_review);
+
+-- SM-2 更新（srs.update_srs と同じ計算をサーバー側で行う）
+-- 浮動小数は double precision で Python の float と同じ順序で計算する。
+-- round(double precision) は偶数丸めなので Python の round() と一致する。
+CREATE OR REPLACE FUNCTION srs_sm2(
+  p_easiness DOUBLE PRECISION,
+  p_interval DOUBLE PRECISION,
+  p_streak INT,
+  p_quality INT,
+  OUT easiness DOUBLE PRECISION,
+  OUT interval_days DOUBLE PRECISION,
+  OUT consecutive_correct INT,
+  OUT next_review DATE
+) LANGUAGE plpgsql STABLE AS $$
+DECLARE
+  d DOUBLE PRECISION := (5 - p_quality)::DOUBLE PRECISION;
+BEGIN
+  easiness := p_easiness + (0.1::DOUBLE PRECISION - d * (0.08::DOUBLE PRECISION + d * 0.02::DOUBLE PRECISION));
+  IF easiness < 1.3::DOUBLE PRECISION THEN
+    easiness := 1.3;
+  END IF;
+
+  consecutive_correct := COALESCE(p_streak, 0);
+  IF p_quality < 3 THEN
+    consecutive_correct := 0;
+    interval_days := 1;
+  ELSE
+    consecutive_correct := consecutive_correct + 1;
+    IF consecutive_correct = 1 THEN
+      interval_days := 1;
+    ELSE
+      interval_days := round(p_interval * easiness);
+    END IF;
+  END IF;
+
+  next_review := CURRENT_DATE + interval_days::INT;
+END
+$$;
 
 -- 英文解釈アイテム
 CREATE TABLE IF NOT EXISTS svocm_items (
@@ -49,6 +98,24 @@ CREATE TABLE IF NOT EXISTS svocm_items (
   source TEXT DEFAULT 'static',
   created_at TIMESTAMPTZ DEFAULT now()
 );
+-- 正解の S/V/O1/O2/C/M（svocm_grader.py）。{"s": "...", "v": "...", "o1": null, ..., "m": ["..."]}。NULL の問題は Dify で採点
+ALTER TABLE svocm_items ADD COLUMN IF NOT EXISTS gold JSONB;
+-- 一括投入（scripts/load_svocm.py）の重複判定: 正規化した英文の md5。手で入れた行は NULL のままでよい
+ALTER TABLE svocm_items ADD COLUMN IF NOT EXISTS sentence_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_svocm_items_sentence_hash ON svocm_items(sentence_hash);
+
+-- svocm_items が変わったら Bot のインデックス（svocm_index.py）に再読み込みさせる
+CREATE OR REPLACE FUNCTION notify_svocm_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('svocm_changed', TG_OP);
+  RETURN NULL;
+END
+$$;
+DROP TRIGGER IF EXISTS trg_svocm_items_changed ON svocm_items;
+CREATE TRIGGER trg_svocm_items_changed
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON svocm_items
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_svocm_changed();
 
 -- SRS（英文解釈）
 CREATE TABLE IF NOT EXISTS svocm_srs_state (
@@ -75,6 +142,13 @@ CREATE TABLE IF NOT EXISTS reading_items (
   source TEXT DEFAULT 'static',
   created_at TIMESTAMPTZ DEFAULT now()
 );
+-- 作り置きプール（source='pool'）の使用済み時刻。NULL のものが未使用
+ALTER TABLE reading_items ADD COLUMN IF NOT EXISTS consumed_at TIMESTAMPTZ;
+-- Dify 会話版で出題したときの conversation_id（採点ターンは解答だけを送る）
+ALTER TABLE reading_items ADD COLUMN IF NOT EXISTS conversation_id TEXT;
+CREATE INDEX IF NOT EXISTS ix_reading_items_pool
+  ON reading_items(skill_tag, level, item_id)
+  WHERE source = 'pool' AND consumed_at IS NULL;
 
 -- 学習ログ（全モジュール共通）
 CREATE TABLE IF NOT EXISTS study_logs (
@@ -86,6 +160,8 @@ CREATE TABLE IF NOT EXISTS study_logs (
   ts TIMESTAMPTZ DEFAULT now(),
   result JSONB                 -- {known: bool, score: int, choice: 'A', ...}
 );
+-- モジュール別のユーザー一覧（replay_srs.py のユーザー単位チャンク）
+CREATE INDEX IF NOT EXISTS ix_study_logs_module_user ON study_logs(module, user_id);
 
 -- セッションバッチ（復習用）
 CREATE TABLE IF NOT EXISTS session_batches (
@@ -94,4 +170,33 @@ CREATE TABLE IF NOT EXISTS session_batches (
   batch_id TEXT NOT NULL,
   created_at TIMESTAMPTZ DEFAULT now(),
   PRIMARY KEY(user_id, module, batch_id)
-);
\ No newline at end of file
+);
+
+-- Dify の結果キャッシュ（キーは正規化した inputs のハッシュ）
+CREATE TABLE IF NOT EXISTS dify_cache (
+  key TEXT PRIMARY KEY,
+  namespace TEXT NOT NULL,
+  result JSONB NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_dify_cache_expires ON dify_cache(expires_at);
+
+-- ジョブキュー（Dify を呼ぶ出題・採点。worker は FOR UPDATE SKIP LOCKED で1件ずつ確保する）
+CREATE TABLE IF NOT EXISTS jobs (
+  job_id BIGSERIAL PRIMARY KEY,
+  kind TEXT NOT NULL,            -- 'reading.generate' | 'reading.grade' | 'svocm.grade'
+  payload JSONB NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',  -- 'queued' | 'running' | 'done' | 'failed'
+  attempts INT NOT NULL DEFAULT 0,
+  max_attempts INT NOT NULL DEFAULT 5,
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_by TEXT,
+  locked_at TIMESTAMPTZ,
+  last_error TEXT,
+  result JSONB,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_queued ON jobs(run_after, job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS ix_jobs_running ON jobs(locked_at) WHERE status = 'running';
@@ -19,4 +19,68 @@ def update_srs(easiness, interval_days, consecutive_correct, q):
         i = 1 if c == 1 else round(i * e)
 
     next_review = datetime.date.today() + datetime.timedelta(days=int(i))
-    return float(e), float(i), int(c), next_review
\ No newline at end of file
+    return float(e), float(i), int(c), next_review
+
+def update_srs_batch(easiness, interval_days, consecutive_correct, q, today=None):
+    """
+    update_srs のベクトル版（NumPy）。各引数は同じ長さの配列。
+    戻り値は (easiness, interval_days, consecutive_correct, next_review) の配列で、
+    next_review は today（既定は今日）起点の datetime64[D]。
+    """
+    import numpy as np
+
+    e = np.asarray(easiness, dtype=np.float64)
+    i = np.asarray(interval_days, dtype=np.float64)
+    c = np.asarray(consecutive_correct, dtype=np.int64)
+    q = np.asarray(q, dtype=np.int64)
+
+    # SM-2 由来の更新（update_srs と同じ演算順）
+    d = (5 - q).astype(np.float64)
+    e = e + (0.1 - d * (0.08 + d * 0.02))
+    e = np.where(e < 1.3, 1.3, e)
+
+    failed = q < 3
+    c = np.where(failed, 0, c + 1)
+    # np.round は偶数丸めで Python の round と一致する
+    i = np.where(failed | (c == 1), 1.0, np.round(i * e))
+
+    if today is None:
+        today = datetime.date.today()
+    next_review = np.datetime64(today, "D") + i.astype(np.int64).astype("timedelta64[D]")
+    return e, i, c, next_review
+
+# 解答1件を1文で反映する（SM-2 はサーバー側の srs_sm2() で計算）。
+# ON CONFLICT の行ロック下で読み・計算・書きが完結するので、連打しても取りこぼさない。
+ANSWER_SQL = """
+INSERT INTO srs_state AS s (user_id, word_id, easiness, interval_days, consecutive_correct, next_review, last_result)
+SELECT $1, $2, f.easiness, f.interval_days::INT, f.consecutive_correct, f.next_review, $3
+FROM srs_sm2(2.5, 0, 0, $3) f
+ON CONFLICT (user_id, word_id) DO UPDATE
+SET (easiness, interval_days, consecutive_correct, next_review, last_result) = (
+  SELECT f.easiness, f.interval_days::INT, f.consecutive_correct, f.next_review, $3
+  FROM srs_sm2(COALESCE(s.easiness, 2.5)::DOUBLE PRECISION,
+               COALESCE(s.interval_days, 0)::DOUBLE PRECISION,
+               s.consecutive_correct, $3) f
+)
+"""
+
+async def apply_answer(con, user_id, word_id, q):
+    await con.execute(ANSWER_SQL, str(user_id), int(word_id), int(q))
+
+# 英文解釈（svocm_srs_state）も同じ SM-2 で1文更新し、次回復習日を返す
+SVOCM_ANSWER_SQL = """
+INSERT INTO svocm_srs_state AS s (user_id, item_id, easiness, interval_days, consecutive_correct, next_review, last_result)
+SELECT $1, $2, f.easiness, f.interval_days::INT, f.consecutive_correct, f.next_review, $3
+FROM srs_sm2(2.5, 0, 0, $3) f
+ON CONFLICT (user_id, item_id) DO UPDATE
+SET (easiness, interval_days, consecutive_correct, next_review, last_result) = (
+  SELECT f.easiness, f.interval_days::INT, f.consecutive_correct, f.next_review, $3
+  FROM srs_sm2(COALESCE(s.easiness, 2.5)::DOUBLE PRECISION,
+               COALESCE(s.interval_days, 0)::DOUBLE PRECISION,
+               s.consecutive_correct, $3) f
+)
+RETURNING s.next_review
+"""
+
+async def apply_svocm_answer(con, user_id, item_id, q):
+    return await con.fetchval(SVOCM_ANSWER_SQL, str(user_id), int(item_id), int(q))
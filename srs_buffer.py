@@ -0,0 +1,187 @@
+import asyncio
+import datetime
+import json
+import logging
+
+from config import SRS_WRITE_MODE
+from db import get_pool
+from srs import update_srs, apply_answer
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SEC = 30   # タイマーでのフラッシュ間隔
+MAX_PENDING = 200         # 未書き込みの解答がこれを超えたら即フラッシュ（クラッシュ時の損失上限）
+# これ以上の件数は COPY → 一時テーブル → 一括マージ。pending は「カード + ログ」で数えるので、
+# 上限でのフラッシュは MAX_PENDING / 2 件前後になる。それより小さくしておかないと COPY に届かない
+COPY_THRESHOLD = 50
+
+SEED_SQL = """
+SELECT word_id, easiness, interval_days, consecutive_correct
+FROM srs_state
+WHERE user_id=$1 AND word_id = ANY($2::int[])
+"""
+
+UPSERT_SQL = """
+INSERT INTO srs_state(user_id, word_id, easiness, interval_days, consecutive_correct, next_review, last_result)
+VALUES($1,$2,$3,$4,$5,$6,$7)
+ON CONFLICT (user_id, word_id) DO UPDATE
+SET easiness=$3, interval_days=$4, consecutive_correct=$5, next_review=$6, last_result=$7
+"""
+
+MERGE_SQL = """
+INSERT INTO srs_state(user_id, word_id, easiness, interval_days, consecutive_correct, next_review, last_result)
+SELECT user_id, word_id, easiness, interval_days, consecutive_correct, next_review, last_result
+FROM srs_flush
+ON CONFLICT (user_id, word_id) DO UPDATE
+SET easiness=EXCLUDED.easiness,
+    interval_days=EXCLUDED.interval_days,
+    consecutive_correct=EXCLUDED.consecutive_correct,
+    next_review=EXCLUDED.next_review,
+    last_result=EXCLUDED.last_result
+"""
+
+LOG_SQL = """
+INSERT INTO study_logs(user_id, module, item_id, batch_id, ts, result)
+VALUES($1, 'vocab', $2, $3, $4, $5::jsonb)
+"""
+
+FLUSH_COLUMNS = ["user_id", "word_id", "easiness", "interval_days", "consecutive_correct", "next_review", "last_result"]
+
+
+class SrsWriteBuffer:
+    """
+    英単語SRSの write-behind バッファ。
+    セッション開始時に1回の SELECT で状態を読み込み、解答ごとの更新はメモリ上で行う。
+    書き込みはセッション終了・タイマー・シャットダウン・未書き込み件数の上限で
+    まとめて1回（executemany か COPY マージ）に集約する。
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SEC, max_pending: int = MAX_PENDING,
+                 write_behind: bool = SRS_WRITE_MODE != "direct"):
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._state = {}    # (user_id, word_id) -> [easiness, interval_days, consecutive_correct]
+        self._dirty = {}    # (user_id, word_id) -> (e, i, c, next_review, last_result)
+        self._logs = []     # study_logs 行（SRS履歴の再計算に使う）
+        self._lock = asyncio.Lock()
+        self._timer = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty) + len(self._logs)
+
+    async def seed(self, user_id: str, word_ids):
+        """セッションで出題する語の現在状態を1往復で読み込む"""
+        if not self.write_behind:
+            return
+        word_ids = [int(w) for w in word_ids]
+        pool = await get_pool()
+        async with pool.acquire() as con:
+            rows = await con.fetch(SEED_SQL, user_id, word_ids)
+        found = {r["word_id"]: r for r in rows}
+        for wid in word_ids:
+            if (user_id, wid) in self._state:
+                continue  # メモリ上の状態（未書き込みを含む）の方が新しい
+            r = found.get(wid)
+            if r:
+                self._state[(user_id, wid)] = [r["easiness"], r["interval_days"], r["consecutive_correct"]]
+            else:
+                self._state[(user_id, wid)] = [2.5, 0, 0]
+
+    def is_seeded(self, user_id: str, word_id: int) -> bool:
+        return (user_id, int(word_id)) in self._state
+
+    async def record(self, user_id: str, word_id: int, quality: int, batch_id: str | None = None,
+                     flush: bool = True):
+        """
+        解答1件をメモリ上の状態に反映する。
+        シードされていない語（セッション外の解答）や direct モードでは、
+        サーバー側SM-2の1文でその場で確定する。
+        flush=False なら上限到達時のフラッシュを呼び出し側（flush_if_full）に任せる。
+        """
+        key = (user_id, int(word_id))
+        self._logs.append((
+            user_id, int(word_id), batch_id,
+            datetime.datetime.now(datetime.timezone.utc),
+            json.dumps({"quality": int(quality)}),
+        ))
+        if key not in self._state:
+            pool = await get_pool()
+            async with pool.acquire() as con:
+                await apply_answer(con, user_id, word_id, quality)
+            return
+
+        e, i, c = self._state[key]
+        e, i, c, next_review = update_srs(e, i, c, quality)
+        self._state[key] = [e, i, c]
+        self._dirty[key] = (e, int(i), c, next_review, int(quality))
+
+        if flush:
+            await self.flush_if_full()
+
+    async def flush_if_full(self):
+        if self.pending >= self.max_pending:
+            await self.flush()
+
+    async def end_session(self, user_id: str):
+        """
+        セッション終了：そのユーザーの分を書き込み、メモリから外す。
+        解答はもう返してあるので、書き込みの失敗は呼び出し元に投げずログに残す（行は戻してあり次回に再試行）
+        """
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"❌ SRS フラッシュ失敗（再試行します）: {e}")
+        finally:
+            for key in [k for k in self._state if k[0] == user_id]:
+                self._state.pop(key, None)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._dirty and not self._logs:
+                return
+            dirty, self._dirty = self._dirty, {}
+            logs, self._logs = self._logs, []
+            rows = [(u, w, *v) for (u, w), v in dirty.items()]
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as con:
+                    async with con.transaction():
+                        if logs:
+                            await con.executemany(LOG_SQL, logs)
+                        if len(rows) >= COPY_THRESHOLD:
+                            await con.execute("""
+                                CREATE TEMP TABLE srs_flush (
+                                  user_id TEXT, word_id INT, easiness NUMERIC, interval_days INT,
+                                  consecutive_correct INT, next_review DATE, last_result INT
+                                ) ON COMMIT DROP
+                            """)
+                            await con.copy_records_to_table("srs_flush", records=rows, columns=FLUSH_COLUMNS)
+                            await con.execute(MERGE_SQL)
+                        elif rows:
+                            await con.executemany(UPSERT_SQL, rows)
+            except Exception:
+                # 失敗分は戻して次回に再試行（新しい更新があればそちらを優先）
+                for k, v in dirty.items():
+                    self._dirty.setdefault(k, v)
+                self._logs[:0] = logs
+                raise
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ SRS フラッシュ失敗（再試行します）: {e}")
+
+    def start(self):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._run_timer())
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
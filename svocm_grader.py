@@ -0,0 +1,87 @@
+import functools
+import re
+import unicodedata
+
+# SVOCM のローカル採点。svocm_items.gold（正解の S/V/O1/O2/C/M）があれば Dify を使わずにここで採点する。
+# gold の形: {"s": "The boy", "v": "gave", "o1": "his mother", "o2": "a flower", "c": null, "m": ["yesterday"]}
+#   ・値は文字列か文字列のリスト（M が複数あるときなど。リストはつなげて1つの枠として比べる）
+#   ・空・null・キー無しは「その枠は無い」
+
+SLOTS = ("s", "v", "o1", "o2", "c", "m")
+SLOT_LABELS = {"s": "S", "v": "V", "o1": "O1", "o2": "O2", "c": "C", "m": "M"}
+SLOT_WEIGHTS = {"s": 1.0, "v": 1.0, "o1": 1.0, "o2": 1.0, "c": 1.0, "m": 0.5}   # M は区切り方の揺れが大きいので軽め
+PASS_F1 = 0.8            # この一致度以上の枠は正解（✅）として表示する
+ARTICLES = frozenset(("a", "an", "the"))
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    return str(value)
+
+
+def _normalize(text: str) -> tuple:
+    """大文字小文字・全角半角・句読点・冠詞・空白の揺れを除いた語の並び"""
+    text = _NON_WORD.sub(" ", unicodedata.normalize("NFKC", text).lower())
+    return tuple(t for t in text.split() if t not in ARTICLES)
+
+
+# 正解側は同じ文字列が何度も来るのでキャッシュする（解答側は毎回正規化する）
+_gold_tokens = functools.lru_cache(maxsize=8192)(_normalize)
+
+
+def overlap_f1(gold: tuple, answer: tuple) -> float:
+    """語の重なり（多重集合）の F1。両方空なら 1.0"""
+    if gold == answer:
+        return 1.0
+    if not gold or not answer:
+        return 0.0
+    rest = list(gold)
+    common = 0
+    for t in answer:
+        if t in rest:
+            rest.remove(t)
+            common += 1
+    if common == 0:
+        return 0.0
+    return 2 * common / (len(gold) + len(answer))
+
+
+def has_gold(gold) -> bool:
+    return isinstance(gold, dict) and any(_text(gold.get(k)).strip() for k in SLOTS)
+
+
+def grade(gold: dict, answers: dict) -> dict:
+    """
+    枠ごとに F1 を出し、正解・解答のどちらかがある枠の重み付き平均を score（0〜100）にする。
+    戻り値は {"score", "slots": {slot: f1}, "feedback"}（feedback は Embed にそのまま出せる文）
+    """
+    slots = {}
+    total = weight = 0.0
+    lines = []
+    for k in SLOTS:
+        g_raw = _text(gold.get(k))
+        a_raw = _text(answers.get(k))
+        g = _gold_tokens(g_raw)
+        a = _normalize(a_raw)
+        if not g and not a:
+            continue
+        f1 = overlap_f1(g, a)
+        slots[k] = round(f1, 3)
+        w = SLOT_WEIGHTS[k]
+        total += w * f1
+        weight += w
+        label = SLOT_LABELS[k]
+        if f1 >= PASS_F1:
+            lines.append(f"✅ {label}: {g_raw or '（なし）'}")
+        elif not g:
+            lines.append(f"❌ {label}: この文に {label} はありません（あなたの解答: {a_raw.strip()}）")
+        else:
+            lines.append(f"❌ {label}: 正解は「{g_raw}」（あなたの解答: {a_raw.strip() or '未入力'}）")
+
+    score = round(100 * total / weight) if weight else 0
+    feedback = f"**{score} 点**\n" + "\n".join(lines)
+    return {"score": score, "slots": slots, "feedback": feedback, "grader": "local"}
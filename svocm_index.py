@@ -0,0 +1,273 @@
+import array
+import asyncio
+import datetime
+import heapq
+import json
+import logging
+import random
+import time
+
+from catalog import add_listener
+
+logger = logging.getLogger(__name__)
+
+# svocm_items の文トリガーが NOTIFY するチャンネル名（sql/schema.sql）
+SVOCM_CHANNEL = "svocm_changed"
+USER_STATE_TTL_SEC = 600   # 学習者の SRS 状態を読み直す間隔（他プロセスでの採点を拾うため）
+UNSEEN_PROBES = 8          # 未学習の問題をランダムに探す回数（外れ続けたら全件から未学習を作る）
+
+LOAD_SQL = """
+SELECT item_id, sentence_en, pattern, level, gold
+FROM svocm_items
+ORDER BY item_id
+"""
+
+USER_SQL = "SELECT item_id, next_review FROM svocm_srs_state WHERE user_id=$1"
+
+
+class SvocmIndex:
+    """
+    svocm_items のプロセス内キャッシュ。item_id を (pattern, level) ごとの array('i') に振り分けておき、
+    出題時の抽出を DB に触れず O(1) で行う。pattern / level の片方・両方を問わないバケツ（None）も持つ。
+    """
+
+    __slots__ = ("item_ids", "sentences", "patterns", "levels", "golds", "version", "_pos_by_id", "_buckets", "_lock")
+
+    def __init__(self):
+        self.item_ids = array.array("i")
+        self.sentences = []
+        self.patterns = []
+        self.levels = []
+        self.golds = []      # 正解の S/V/O1/O2/C/M（dict）。無い問題は None（採点は Dify に回す）
+        self._pos_by_id = {}
+        self._buckets = {}   # (pattern|None, level|None) -> array('i') of item_id
+        self.version = 0     # replace のたびに増える（学習者ごとのヒープの組み直し判定に使う）
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def loaded(self) -> bool:
+        """一度でも読み込んだか（0件のインデックスも読み込み済みとして扱う）"""
+        return self.version > 0
+
+    def replace(self, rows):
+        """行（Record / dict）から組み直して差し替える"""
+        item_ids = array.array("i")
+        sentences, patterns, levels, golds = [], [], [], []
+        buckets = {}
+        for r in rows:
+            iid, p, lv = r["item_id"], r["pattern"], r["level"]
+            item_ids.append(iid)
+            sentences.append(r["sentence_en"])
+            patterns.append(p)
+            levels.append(lv)
+            gold = r.get("gold")
+            golds.append(json.loads(gold) if isinstance(gold, str) else gold)
+            for key in ((p, lv), (p, None), (None, lv), (None, None)):
+                b = buckets.get(key)
+                if b is None:
+                    b = buckets[key] = array.array("i")
+                b.append(iid)
+
+        # 参照の差し替えだけで済ませ、読み手が中途半端な状態を見ないようにする
+        self.sentences = sentences
+        self.patterns = patterns
+        self.levels = levels
+        self.golds = golds
+        self._buckets = buckets
+        self._pos_by_id = {iid: i for i, iid in enumerate(item_ids)}
+        self.item_ids = item_ids
+        self.version += 1
+
+    async def load(self, pool):
+        """DBから全件読み込む（起動時 / 更新通知時）"""
+        async with self._lock:
+            async with pool.acquire() as con:
+                rows = await con.fetch(LOAD_SQL)
+            self.replace(rows)
+        logger.info(f"✅ SVOCM インデックス読み込み完了: {len(self)}件 / {len(self._buckets)}バケツ")
+
+    def get(self, item_id: int) -> dict | None:
+        i = self._pos_by_id.get(item_id)
+        if i is None:
+            return None
+        return {
+            "item_id": self.item_ids[i],
+            "sentence_en": self.sentences[i],
+            "pattern": self.patterns[i],
+            "level": self.levels[i],
+            "gold": self.golds[i],
+        }
+
+    def key(self, item_id: int) -> tuple | None:
+        """(pattern, level)。インデックスに無い（削除された）問題は None"""
+        i = self._pos_by_id.get(item_id)
+        return None if i is None else (self.patterns[i], self.levels[i])
+
+    def bucket(self, pattern: int | None = None, level: int | None = None) -> array.array:
+        return self._buckets.get((pattern, level), array.array("i"))
+
+    def sizes(self) -> dict:
+        """pattern ごとの件数（pattern=None の全体を除く）"""
+        return {p: len(b) for (p, lv), b in self._buckets.items() if p is not None and lv is None}
+
+
+class _UserState:
+    """
+    学習者1人分の SRS 状態。next_review が正で、heaps は (pattern, level) ごとの (復習日, item_id) の最小ヒープ。
+    ヒープの古い要素は消さずに残し、取り出すときに next_review と食い違うものを捨てる。
+    """
+    __slots__ = ("loaded_at", "day", "next_review", "heaps", "version", "exhausted")
+
+    def __init__(self, next_review: dict, index: SvocmIndex):
+        self.loaded_at = time.monotonic()
+        self.day = datetime.date.today()
+        self.next_review = next_review   # item_id -> date（出題済み・採点済みの問題）
+        self.rebuild(index)
+
+    def rebuild(self, index: SvocmIndex):
+        heaps = {}
+        for iid, d in self.next_review.items():
+            key = index.key(iid)
+            if key is not None:
+                heaps.setdefault(key, []).append((d, iid))
+        for h in heaps.values():
+            heapq.heapify(h)
+        self.heaps = heaps
+        self.version = index.version
+        self.exhausted = set()   # 未学習が残っていない (pattern, level)。問題が増えたら（version が変わったら）やり直す
+
+    def set(self, index: SvocmIndex, item_id: int, d: datetime.date):
+        self.next_review[item_id] = d
+        key = index.key(item_id)
+        if key is None:
+            return
+        h = self.heaps.setdefault(key, [])
+        heapq.heappush(h, (d, item_id))
+        if len(h) > 2 * len(self.next_review) + 64:
+            self.rebuild(index)   # 古い要素が溜まりすぎたら組み直す
+
+    def earliest(self, pattern, level) -> tuple | None:
+        """条件に合う問題のうち復習日が最も早い (復習日, item_id)"""
+        best = None
+        nr = self.next_review
+        for (p, lv), h in self.heaps.items():
+            if (pattern is not None and p != pattern) or (level is not None and lv != level):
+                continue
+            while h and nr.get(h[0][1]) != h[0][0]:
+                heapq.heappop(h)
+            if h and (best is None or h[0] < best):
+                best = h[0]
+        return best
+
+
+class SvocmSelector:
+    """
+    SVOCM の出題選び。学習者ごとの svocm_srs_state を1回の SELECT で読んでメモリに持ち、
+    「今日が期限の復習」→「未学習」→（全部学習済みなら）「復習日が最も近いもの」の順に選ぶ。
+    出した問題は明日まで期限外として扱い、続けて同じ問題が出ないようにする。
+    """
+
+    def __init__(self, index: SvocmIndex, ttl: float = USER_STATE_TTL_SEC):
+        self.index = index
+        self.ttl = ttl
+        self._users = {}   # user_id -> _UserState
+        self.picks = {"due": 0, "unseen": 0, "review_ahead": 0, "empty": 0}
+
+    async def _state(self, user_id: str, pool) -> _UserState:
+        st = self._users.get(user_id)
+        if st is not None and time.monotonic() - st.loaded_at < self.ttl and st.day == datetime.date.today():
+            return st
+        async with pool.acquire() as con:
+            rows = await con.fetch(USER_SQL, user_id)
+        # 復習日が未設定の行は「学習済み・期限なし」として扱う
+        far = datetime.date.max
+        st = _UserState({r["item_id"]: r["next_review"] or far for r in rows}, self.index)
+        self._users[user_id] = st
+        return st
+
+    def record(self, user_id: str, item_id: int, next_review: datetime.date):
+        """採点で決まった次回復習日を反映する（読み込み前なら次回の SELECT で拾う）"""
+        st = self._users.get(user_id)
+        if st is not None:
+            st.set(self.index, int(item_id), next_review)
+
+    def forget(self, user_id: str):
+        self._users.pop(user_id, None)
+
+    async def pick(self, user_id: str, pool, pattern: int | None = None, level: int | None = None) -> dict | None:
+        st = await self._state(user_id, pool)
+        today = datetime.date.today()
+        index = self.index
+        if st.version != index.version:
+            st.rebuild(index)
+
+        # 1) 今日が期限の復習（期限が古いものから）
+        first = st.earliest(pattern, level)
+        if first is not None and first[0] <= today:
+            item_id = first[1]
+            kind = "due"
+        else:
+            item_id = self._unseen(st, pattern, level)
+            kind = "unseen"
+            if item_id is None:
+                # 2) 全部学習済み → 復習日が最も近いものを前倒しで
+                item_id = first[1] if first is not None else None
+                kind = "review_ahead"
+        if item_id is None:
+            self.picks["empty"] += 1
+            return None
+        self.picks[kind] += 1
+        st.set(index, item_id, today + datetime.timedelta(days=1))
+        return index.get(item_id)
+
+    def _unseen(self, st: _UserState, pattern, level) -> int | None:
+        if (pattern, level) in st.exhausted:
+            return None
+        bucket = self.index.bucket(pattern, level)
+        n = len(bucket)
+        if n == 0:
+            return None
+        seen = st.next_review
+        for _ in range(UNSEEN_PROBES):
+            iid = bucket[random.randrange(n)]
+            if iid not in seen:
+                return iid
+        # ほとんど学習済みのバケツ: 残りから選ぶ（ここだけ O(バケツの件数)）
+        rest = [iid for iid in bucket if iid not in seen]
+        if not rest:
+            st.exhausted.add((pattern, level))
+            return None
+        return random.choice(rest)
+
+    def stats(self) -> dict:
+        return {"items": len(self.index), "patterns": self.index.sizes(), "users": len(self._users), **self.picks}
+
+
+_index = None
+
+
+async def get_svocm_index(pool=None) -> SvocmIndex:
+    """プロセス共通のインデックスを返す。pool を渡すと未読み込み時にロードする。"""
+    global _index
+    if _index is None:
+        _index = SvocmIndex()
+    if pool is not None and not _index.loaded:
+        await _index.load(pool)
+    return _index
+
+
+async def listen_for_changes(pool):
+    """
+    svocm_changed の NOTIFY を購読し、受信したらインデックスを再読み込みする。
+    words の購読と同じ専用接続（catalog.add_listener）に相乗りし、張り直しもそちらに任せる。
+    """
+    index = await get_svocm_index()
+
+    def _on_notify(con, pid, channel, payload):
+        logger.info(f"🔄 svocm_items 更新通知を受信 ({payload or '-'})")
+        asyncio.get_running_loop().create_task(index.load(pool))
+
+    await add_listener(SVOCM_CHANNEL, _on_notify, lambda: index.load(pool))
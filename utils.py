@@ -10,3 +10,7 @@ def main_menu_view():
 def info_embed(title: str, desc: str) -> discord.Embed:
     e = discord.Embed(title=title, description=desc, color=0x2b90d9)
     return e
+
+def resolve_channel(bot, channel_id: int):
+    """ジョブ等で ID だけ持っているチャンネルを送信先にする（キャッシュに無ければ REST 用の部分オブジェクト）"""
+    return bot.get_channel(channel_id) or bot.get_partial_messageable(channel_id)